@@ -1,23 +1,157 @@
-import customtkinter as ctk
-import pandas as pd
-from pywinauto.application import Application
-from pywinauto.keyboard import send_keys
-from pywinauto import findwindows, timings
-import win32gui
-import win32con
+from __future__ import annotations
+
 import time
 import logging
-from datetime import datetime
+import argparse
+import signal
+from datetime import datetime, timedelta
 import os
+import sys
 import traceback
 import threading
-import requests
-from typing import Optional, Tuple
-import tkinter.messagebox as messagebox
-from PIL import Image, ImageDraw
-from dotenv import load_dotenv
+import queue
+import json
+import re
+import hashlib
+import importlib
+import unicodedata
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class StartupTimer:
+    """Tempo de cada fase da inicialização (imports, interface, janela exibida)
+    e dos módulos carregados sob demanda depois dela. Módulo carregado dentro
+    de uma fase já está no tempo dela: aparece só como detalhe da fase."""
 
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self._ultima = self.inicio
+        self.fases: List[Tuple[str, float]] = []
+        # (nome, segundos, índice da fase em andamento no carregamento)
+        self.modulos: List[Tuple[str, float, int]] = []
+        # Chamado a cada módulo carregado sob demanda (nome, segundos)
+        self.ao_carregar: Optional[Callable[[str, float], None]] = None
+
+    def marcar(self, fase: str):
+        """Fecha a fase atual (tempo desde a marca anterior)."""
+        agora = time.perf_counter()
+        self.fases.append((fase, agora - self._ultima))
+        self._ultima = agora
+
+    def registrar(self, nome: str, segundos: float):
+        self.modulos.append((nome, segundos, len(self.fases)))
+        if self.ao_carregar is not None:
+            self.ao_carregar(nome, segundos)
+
+    @property
+    def sob_demanda(self) -> List[Tuple[str, float]]:
+        """Módulos carregados depois da última fase (fora do total da janela)."""
+        return [(nome, segundos) for nome, segundos, fase in self.modulos if fase >= len(self.fases)]
+
+    def summary(self) -> List[str]:
+        resumo = []
+        for indice, (fase, segundos) in enumerate(self.fases):
+            resumo.append(f"{fase}: {segundos * 1000:.0f} ms")
+            resumo += [f"    ↳ inclui {nome}: {tempo * 1000:.0f} ms"
+                       for nome, tempo, fase_modulo in self.modulos if fase_modulo == indice]
+        resumo.append(f"Total até a janela: {(self._ultima - self.inicio) * 1000:.0f} ms")
+        resumo += [f"{nome} (sob demanda): {segundos * 1000:.0f} ms" for nome, segundos in self.sob_demanda]
+        return resumo
+
+
+STARTUP = StartupTimer()
+
+
+class LazyModule:
+    """Módulo (ou atributo de módulo) importado no primeiro uso, ex.: pd.read_excel.
+    Mantém pesos como pandas e pywinauto fora da abertura da janela."""
+
+    def __init__(self, nome: str, atributo: Optional[str] = None):
+        self._nome = nome
+        self._atributo = atributo
+        self._alvo = None
+        self._lock = threading.Lock()
+
+    def _carregar(self):
+        if self._alvo is None:
+            # Pré-carga em segundo plano e primeiro uso podem coincidir
+            with self._lock:
+                if self._alvo is None:
+                    inicio = time.perf_counter()
+                    alvo = importlib.import_module(self._nome)
+                    if self._atributo:
+                        alvo = getattr(alvo, self._atributo)
+                    self._alvo = alvo
+                    STARTUP.registrar(self._nome, time.perf_counter() - inicio)
+        return self._alvo
+
+    @property
+    def carregado(self) -> bool:
+        return self._alvo is not None
+
+    def __getattr__(self, nome):
+        return getattr(self._carregar(), nome)
+
+    def __call__(self, *args, **kwargs):
+        return self._carregar()(*args, **kwargs)
+
+
+STARTUP.marcar("imports da biblioteca padrão")
+
+from dotenv import load_dotenv
 load_dotenv()
+STARTUP.marcar("dotenv")
+
+# Tk só carrega com a janela: --headless e DomBot_Sim.py não pagam o import
+ctk = LazyModule("customtkinter")
+messagebox = LazyModule("tkinter.messagebox")
+# Carregados sob demanda: pandas ao escolher a planilha, pywinauto/pywin32 ao
+# Iniciar (fora do Windows só o backend simulado de DomBot_Sim.py funciona),
+# requests ao notificar e PIL ao desenhar a logo
+pd = LazyModule("pandas")
+Application = LazyModule("pywinauto.application", "Application")
+send_keys = LazyModule("pywinauto.keyboard", "send_keys")
+findwindows = LazyModule("pywinauto.findwindows")
+timings = LazyModule("pywinauto.timings")
+win32gui = LazyModule("win32gui")
+win32con = LazyModule("win32con")
+win32process = LazyModule("win32process")
+requests = LazyModule("requests")
+Image = LazyModule("PIL.Image")
+ImageDraw = LazyModule("PIL.ImageDraw")
+
+
+def configurar_logs_arquivo(logs_dir: str) -> Tuple[logging.Logger, logging.Logger]:
+    """Loggers de sucesso/erro por dia em logs/ (interface e --headless)"""
+    data_atual = datetime.now().strftime("%Y-%m-%d")
+
+    # Logger de sucesso
+    success_logger = logging.getLogger('SuccessLog')
+    success_logger.setLevel(logging.INFO)
+    if not success_logger.handlers:
+        success_handler = logging.FileHandler(
+            os.path.join(logs_dir, f'success_{data_atual}.log'),
+            encoding='utf-8', delay=True
+        )
+        success_handler.setFormatter(
+            logging.Formatter('%(asctime)s - %(message)s', '%Y-%m-%d %H:%M:%S')
+        )
+        success_logger.addHandler(success_handler)
+
+    # Logger de erro
+    error_logger = logging.getLogger('ErrorLog')
+    error_logger.setLevel(logging.ERROR)
+    if not error_logger.handlers:
+        error_handler = logging.FileHandler(
+            os.path.join(logs_dir, f'error_{data_atual}.log'),
+            encoding='utf-8', delay=True
+        )
+        error_handler.setFormatter(
+            logging.Formatter('%(asctime)s - %(message)s', '%Y-%m-%d %H:%M:%S')
+        )
+        error_logger.addHandler(error_handler)
+    return success_logger, error_logger
 
 
 # Handler de log separado da classe principal
@@ -27,8 +161,145 @@ class GUILogHandler(logging.Handler):
         self.gui = gui
 
     def emit(self, record):
-        msg = self.format(record)
-        self.gui.window.after(0, lambda: self.gui.adicionar_log(msg, record.levelno))
+        # adicionar_log só enfileira: seguro a partir da thread de automação
+        self.gui.adicionar_log(self.format(record), record.levelno)
+
+
+class LogQueue:
+    """Fila de logs entre as threads e o loop do Tk, drenada em lotes.
+
+    Toda linha vai para o arquivo de histórico; na tela, linhas "aguardando"
+    repetidas em sequência (iguais a menos de números) viram uma só; a contagem
+    "↳ repetida Nx" sai na próxima linha diferente, após PENDENTE_S sem
+    repetição nova (drenagem periódica) ou no close()."""
+
+    COALESCER = re.compile(r'aguardando', re.IGNORECASE)
+    _NUMEROS = re.compile(r'\d+(?:[.,]\d+)?')
+    # Segundos sem repetição nova até exibir a contagem pendente
+    PENDENTE_S = 1.0
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._fila = queue.SimpleQueue()
+        self._file = None
+        # Assinatura da última linha "aguardando" exibida e repetições ocultas
+        self._chave = None
+        self._repetidas = 0
+        self._ultima_repeticao = 0.0
+
+    def put(self, texto: str, tag: str, mensagem: str = ""):
+        self._fila.put((texto, tag, mensagem or texto))
+
+    def _contagem(self, exibir: List[Tuple[str, str]]):
+        if self._repetidas:
+            exibir.append((f"    ↳ repetida {self._repetidas}x\n", "info"))
+            self._repetidas = 0
+
+    def drain(self, limite: int = 500, final: bool = False) -> List[Tuple[str, str]]:
+        """Retira até limite linhas, grava todas no histórico e devolve as
+        linhas (texto, tag) a exibir, com as repetições agrupadas.
+        final: exibe a contagem pendente mesmo dentro do PENDENTE_S."""
+        exibir = []
+        historico = []
+        agora = time.monotonic()
+        for _ in range(limite):
+            try:
+                texto, tag, mensagem = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            historico.append(texto)
+            chave = self._NUMEROS.sub('#', mensagem) if self.COALESCER.search(mensagem) else None
+            if chave is not None and chave == self._chave:
+                self._repetidas += 1
+                self._ultima_repeticao = agora
+                continue
+            self._contagem(exibir)
+            self._chave = chave
+            exibir.append((texto, tag))
+        # Espera parada ou encerrada: a contagem não fica presa até a próxima linha
+        # (a chave continua, então novas repetições voltam a ser agrupadas)
+        if final or agora - self._ultima_repeticao >= self.PENDENTE_S:
+            self._contagem(exibir)
+        if historico and self.path:
+            try:
+                if self._file is None:
+                    self._file = open(self.path, 'a', encoding='utf-8')
+                self._file.write("".join(historico))
+                self._file.flush()
+            except Exception:
+                pass
+        return exibir
+
+    def close(self) -> List[Tuple[str, str]]:
+        """Drena o que falta (com a contagem pendente) e fecha o histórico;
+        devolve as últimas linhas a exibir."""
+        exibir = self.drain(limite=1_000_000, final=True)
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+        return exibir
+
+
+class WorkbookCache:
+    """Planilha lida uma vez e compartilhada por preview, validação, diário e
+    execução. A chave é (caminho, tamanho, mtime): só relê se o arquivo mudar.
+    O DataFrame devolvido é compartilhado e não deve ser modificado."""
+
+    def __init__(self, reader: Optional[Callable[[str], pd.DataFrame]] = None):
+        self.reader = reader or ler_planilha
+        self._lock = threading.Lock()
+        self._chave: Optional[tuple] = None
+        self._df: Optional[pd.DataFrame] = None
+        self.leituras = 0
+        self.acertos = 0
+
+    @staticmethod
+    def chave(path: str) -> tuple:
+        info = os.stat(path)
+        return os.path.abspath(path), info.st_size, info.st_mtime_ns
+
+    def get(self, path: str) -> pd.DataFrame:
+        chave = self.chave(path)
+        with self._lock:
+            if chave != self._chave:
+                self._df = self.reader(path)
+                self._chave = chave
+                self.leituras += 1
+            else:
+                self.acertos += 1
+            return self._df
+
+
+class UIStateModel:
+    """Estado exibido na tela (progresso, status e cards).
+
+    A thread de automação só faz atribuições simples, sem locks nem chamadas
+    ao Tk; o loop do Tk desenha em taxa fixa e várias atualizações entre dois
+    quadros resultam em um único redesenho com os valores mais recentes."""
+
+    CAMPOS = ('progresso', 'status', 'indicador', 'total', 'sucesso', 'erros', 'empresa', 'em_execucao')
+
+    def __init__(self):
+        self.progresso = 0.0
+        self.status = "Aguardando início..."
+        self.indicador = 'aguardando'
+        self.total = 0
+        self.sucesso = 0
+        self.erros = 0
+        self.empresa = "-"
+        self.em_execucao = False
+        self.versao = 0
+
+    def update(self, **campos):
+        for nome, valor in campos.items():
+            setattr(self, nome, valor)
+        self.versao += 1
+
+    def valores(self) -> Dict[str, object]:
+        return {nome: getattr(self, nome) for nome in self.CAMPOS}
 
 
 class AutomacaoGUI:
@@ -44,9 +315,16 @@ class AutomacaoGUI:
         'destaque': '#1ABC9C',
         'processando': '#9B59B6',
     }
+    # Linhas mantidas no widget de logs (histórico completo fica em logs/sessao_*.log)
+    LOG_MAX_LINHAS = 2000
+    # Intervalo (ms) entre descargas da fila de logs no widget
+    LOG_INTERVALO_MS = 100
+    # Intervalo (ms) entre quadros do estado da tela (5 Hz)
+    UI_INTERVALO_MS = 200
 
     def __init__(self):
-        # Configuração do tema
+        STARTUP.marcar("definições do módulo")
+        # Configuração do tema (primeiro uso carrega o customtkinter)
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("green")
 
@@ -61,6 +339,10 @@ class AutomacaoGUI:
         self.pausa_solicitada = False
         self.thread_automacao = None
 
+        # Diário de linhas (retomada após falha)
+        self.journal = None
+        self.retomar = False
+
         # Estatísticas
         self.stats = {
             'processados': 0,
@@ -70,8 +352,14 @@ class AutomacaoGUI:
             'tempo_inicio': None
         }
 
-        # DataFrame carregado
+        # DataFrame carregado (planilha lida uma vez por versão do arquivo)
         self.df_carregado = None
+        self.planilhas = WorkbookCache(ler_planilha)
+        # Linhas reprovadas na validação (índice -> motivo), puladas na execução
+        self.linhas_invalidas: Dict[object, str] = {}
+        # Preview paginado: posição da primeira linha exibida e motivos de invalidez
+        self.preview_inicio = 0
+        self.preview_motivos: Optional[pd.Series] = None
 
         # Configurar ícone
         self.set_window_icon()
@@ -84,9 +372,25 @@ class AutomacaoGUI:
         # Configurar logging para arquivos
         self.setup_file_logging()
 
+        # Estado da tela: escrito pela automação, desenhado pelo loop do Tk
+        self.ui = UIStateModel()
+        self._ui_versao = -1
+        self._ui_desenhado: Dict[str, object] = {}
+
+        # Fila de logs da tela (drenada pelo loop do Tk) com histórico em disco
+        self.log_queue = LogQueue(os.path.join(
+            self.logs_dir, f"sessao_{datetime.now().strftime('%Y-%m-%d')}.log"))
+
+        # Notificações do Discord: gravadas em logs/outbox/ e enviadas em segundo plano
+        self.outbox = NotificacaoOutbox(os.path.join(self.logs_dir, "outbox"), log=self.adicionar_log)
+
         # Variáveis da interface
         self.arquivo_excel = ctk.StringVar()
         self.linha_inicial = ctk.StringVar(value="2")
+        self.pasta_pdf = ctk.StringVar(value=os.getenv("DOMBOT_PASTA_PDF", ""))
+        self.forcar_regeracao = ctk.BooleanVar(value=False)
+        self.agrupar_empresas = ctk.BooleanVar(value=True)
+        self.sessao_persistente = ctk.BooleanVar(value=False)
         self.status_var = ctk.StringVar(value="Aguardando início...")
 
         # Variáveis de controle (mantidas para compatibilidade com DominioAutomation)
@@ -107,36 +411,52 @@ class AutomacaoGUI:
         self.logger.addHandler(self.gui_handler)
 
         self.criar_interface()
+        STARTUP.marcar("interface")
+        self.window.after(self.LOG_INTERVALO_MS, self.drenar_logs)
+        self.window.after(self.UI_INTERVALO_MS, self.renderizar_estado)
+        # Logo (PIL) e relatório de inicialização só depois da janela na tela
+        self.window.after(1, self.janela_exibida)
+
+    def janela_exibida(self):
+        """Primeiro ciclo do loop do Tk: fecha a medição e carrega o que pode esperar"""
+        STARTUP.marcar("janela exibida")
+        self.adicionar_log("Inicialização:", logging.INFO, "info")
+        for linha_resumo in STARTUP.summary():
+            self.adicionar_log(f"  {linha_resumo}", logging.INFO, "info")
+        STARTUP.ao_carregar = lambda nome, segundos: self.adicionar_log(
+            f"📦 {nome} carregado em {segundos * 1000:.0f} ms", logging.INFO, "info")
+        self.carregar_logo()
+        self.outbox.iniciar()
 
     def setup_file_logging(self):
         """Configura o logging para arquivos"""
-        data_atual = datetime.now().strftime("%Y-%m-%d")
+        self.success_logger, self.error_logger = configurar_logs_arquivo(self.logs_dir)
 
-        # Logger de sucesso
-        self.success_logger = logging.getLogger('SuccessLog')
-        self.success_logger.setLevel(logging.INFO)
-        if not self.success_logger.handlers:
-            success_handler = logging.FileHandler(
-                os.path.join(self.logs_dir, f'success_{data_atual}.log'),
-                encoding='utf-8'
-            )
-            success_handler.setFormatter(
-                logging.Formatter('%(asctime)s - %(message)s', '%Y-%m-%d %H:%M:%S')
-            )
-            self.success_logger.addHandler(success_handler)
-
-        # Logger de erro
-        self.error_logger = logging.getLogger('ErrorLog')
-        self.error_logger.setLevel(logging.ERROR)
-        if not self.error_logger.handlers:
-            error_handler = logging.FileHandler(
-                os.path.join(self.logs_dir, f'error_{data_atual}.log'),
-                encoding='utf-8'
-            )
-            error_handler.setFormatter(
-                logging.Formatter('%(asctime)s - %(message)s', '%Y-%m-%d %H:%M:%S')
-            )
-            self.error_logger.addHandler(error_handler)
+    def carregar_logo(self):
+        """Troca o ícone provisório pela logo com fundo branco circular"""
+        logo_path = os.path.join(os.path.dirname(__file__), "assets", "DomBot_New.png")
+        if not os.path.exists(logo_path):
+            return
+        try:
+            size = 66
+            circle_size = 44
+            # Criar canvas transparente no tamanho total
+            bg = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+            # Criar círculo branco de 44px centralizado
+            circle_mask = Image.new("L", (circle_size, circle_size), 0)
+            ImageDraw.Draw(circle_mask).ellipse((0, 0, circle_size - 1, circle_size - 1), fill=255)
+            circle = Image.new("RGBA", (circle_size, circle_size), (255, 255, 255, 255))
+            circle_offset = (size - circle_size) // 2
+            bg.paste(circle, (circle_offset, circle_offset), circle_mask)
+            # Colar a logo no tamanho total por cima
+            original = Image.open(logo_path).convert("RGBA")
+            original = original.resize((size, size), Image.LANCZOS)
+            bg.paste(original, (0, 0), original)
+            logo_image = ctk.CTkImage(light_image=bg, dark_image=bg, size=(size, size))
+            self.logo_frame.destroy()
+            ctk.CTkLabel(self.header_frame, image=logo_image, text="").grid(row=0, column=0, padx=10, pady=8)
+        except Exception as e:
+            print(f"Erro ao carregar logo: {e}")
 
     def set_window_icon(self):
         """Configura o ícone da janela"""
@@ -175,31 +495,13 @@ class AutomacaoGUI:
         header_frame.grid(row=0, column=0, sticky="ew", pady=(0, 6))
         header_frame.grid_columnconfigure(1, weight=1)
 
-        # Ícone/Logo com fundo branco circular
-        logo_path = os.path.join(os.path.dirname(__file__), "assets", "DomBot_New.png")
-        if os.path.exists(logo_path):
-            size = 66
-            circle_size = 44
-            # Criar canvas transparente no tamanho total
-            bg = Image.new("RGBA", (size, size), (0, 0, 0, 0))
-            # Criar círculo branco de 44px centralizado
-            circle_mask = Image.new("L", (circle_size, circle_size), 0)
-            ImageDraw.Draw(circle_mask).ellipse((0, 0, circle_size - 1, circle_size - 1), fill=255)
-            circle = Image.new("RGBA", (circle_size, circle_size), (255, 255, 255, 255))
-            circle_offset = (size - circle_size) // 2
-            bg.paste(circle, (circle_offset, circle_offset), circle_mask)
-            # Colar a logo no tamanho total por cima
-            original = Image.open(logo_path).convert("RGBA")
-            original = original.resize((size, size), Image.LANCZOS)
-            bg.paste(original, (0, 0), original)
-            logo_image = ctk.CTkImage(light_image=bg, dark_image=bg, size=(size, size))
-            ctk.CTkLabel(header_frame, image=logo_image, text="").grid(row=0, column=0, padx=10, pady=8)
-        else:
-            logo_frame = ctk.CTkFrame(header_frame, fg_color=self.CORES['destaque'],
+        # Ícone provisório; a logo (PIL) é desenhada depois da janela exibida
+        self.header_frame = header_frame
+        self.logo_frame = ctk.CTkFrame(header_frame, fg_color=self.CORES['destaque'],
                                        width=44, height=44, corner_radius=22)
-            logo_frame.grid(row=0, column=0, padx=10, pady=8)
-            logo_frame.grid_propagate(False)
-            ctk.CTkLabel(logo_frame, text="🤖", font=("Segoe UI Emoji", 18)).place(relx=0.5, rely=0.5, anchor="center")
+        self.logo_frame.grid(row=0, column=0, padx=10, pady=8)
+        self.logo_frame.grid_propagate(False)
+        ctk.CTkLabel(self.logo_frame, text="🤖", font=("Segoe UI Emoji", 18)).place(relx=0.5, rely=0.5, anchor="center")
 
         # Título
         ctk.CTkLabel(
@@ -293,6 +595,38 @@ class AutomacaoGUI:
         )
         self.btn_parar.grid(row=0, column=7, padx=(3, 0))
 
+        # Opções de saída
+        opcoes_frame = ctk.CTkFrame(config_frame, fg_color="transparent")
+        opcoes_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=(0, 8))
+        opcoes_frame.grid_columnconfigure(1, weight=1)
+
+        ctk.CTkLabel(
+            opcoes_frame, text="📂", font=ctk.CTkFont(size=14)
+        ).grid(row=0, column=0, padx=(0, 5))
+
+        ctk.CTkEntry(
+            opcoes_frame,
+            textvariable=self.pasta_pdf,
+            placeholder_text="Pasta GMS onde o Domínio grava os PDFs (vazio = não pula PDFs existentes)",
+            height=28,
+            font=ctk.CTkFont(size=11)
+        ).grid(row=0, column=1, sticky="ew", padx=(0, 8))
+
+        ctk.CTkCheckBox(
+            opcoes_frame, text="Forçar regeração", variable=self.forcar_regeracao,
+            font=ctk.CTkFont(size=11), checkbox_width=18, checkbox_height=18
+        ).grid(row=0, column=2, padx=(0, 15))
+
+        ctk.CTkCheckBox(
+            opcoes_frame, text="Agrupar por empresa", variable=self.agrupar_empresas,
+            font=ctk.CTkFont(size=11), checkbox_width=18, checkbox_height=18
+        ).grid(row=0, column=3, padx=(0, 15))
+
+        ctk.CTkCheckBox(
+            opcoes_frame, text="Sessão persistente", variable=self.sessao_persistente,
+            font=ctk.CTkFont(size=11), checkbox_width=18, checkbox_height=18
+        ).grid(row=0, column=4)
+
     def criar_painel_estatisticas(self, parent):
         """Cria o painel de estatísticas"""
         stats_frame = ctk.CTkFrame(parent, fg_color=self.CORES['fundo_card'], corner_radius=8)
@@ -422,11 +756,58 @@ class AutomacaoGUI:
             fg_color=self.CORES['fundo_escuro'], corner_radius=6
         )
         self.preview_text.grid(row=1, column=0, sticky="nsew", padx=3, pady=(0, 3))
+        self.preview_text._textbox.tag_config("invalida", foreground=self.CORES['erro'])
+
+        # Navegação por páginas
+        nav_frame = ctk.CTkFrame(parent, fg_color="transparent")
+        nav_frame.grid(row=2, column=0, sticky="ew", padx=3, pady=(0, 3))
+
+        for texto, comando in (("◀", lambda: self.mostrar_pagina(self.preview_inicio - self.PREVIEW_PAGINA)),
+                               ("▶", lambda: self.mostrar_pagina(self.preview_inicio + self.PREVIEW_PAGINA))):
+            ctk.CTkButton(
+                nav_frame, text=texto, command=comando,
+                width=30, height=24, font=ctk.CTkFont(size=10),
+                fg_color="#34495E", hover_color="#2C3E50"
+            ).pack(side="left", padx=(0, 4))
+
+        self.preview_ir_para = ctk.StringVar()
+        entry_ir = ctk.CTkEntry(
+            nav_frame, textvariable=self.preview_ir_para, width=60, height=24,
+            font=ctk.CTkFont(size=10), placeholder_text="Linha"
+        )
+        entry_ir.pack(side="left", padx=(8, 4))
+        entry_ir.bind("<Return>", lambda _event: self.ir_para_linha())
+
+        ctk.CTkButton(
+            nav_frame, text="Ir", command=self.ir_para_linha,
+            width=36, height=24, font=ctk.CTkFont(size=10),
+            fg_color="#34495E", hover_color="#2C3E50"
+        ).pack(side="left")
+
+        ctk.CTkButton(
+            nav_frame, text="⚠ Próxima inválida", command=self.proxima_invalida,
+            width=120, height=24, font=ctk.CTkFont(size=10),
+            fg_color="#34495E", hover_color="#2C3E50"
+        ).pack(side="left", padx=8)
+
+        self.preview_pagina_label = ctk.CTkLabel(
+            nav_frame, text="", font=ctk.CTkFont(size=10), text_color="#95A5A6"
+        )
+        self.preview_pagina_label.pack(side="right")
 
     def selecionar_arquivo(self):
         """Abre diálogo para selecionar arquivo Excel"""
+        if not pd.carregado:
+            # pandas carrega em segundo plano enquanto o usuário escolhe o arquivo
+            threading.Thread(target=lambda: pd.DataFrame, daemon=True).start()
         filename = ctk.filedialog.askopenfilename(
-            filetypes=[("Excel files", "*.xlsx *.xls")],
+            filetypes=[
+                ("Listas de trabalho", " ".join(f"*{ext}" for ext in FORMATOS_PLANILHA)),
+                ("Excel files", "*.xlsx *.xls *.xlsm"),
+                ("CSV", "*.csv *.txt"),
+                ("Parquet", "*.parquet"),
+                ("JSON", "*.json *.jsonl"),
+            ],
             title="Selecione o arquivo Excel"
         )
         if filename:
@@ -440,7 +821,7 @@ class AutomacaoGUI:
             return
 
         try:
-            self.df_carregado = pd.read_excel(self.arquivo_excel.get())
+            self.df_carregado = self.planilhas.get(self.arquivo_excel.get())
             total_linhas = len(self.df_carregado)
 
             # Atualizar info
@@ -449,24 +830,11 @@ class AutomacaoGUI:
             )
 
             # Atualizar estatística de total
-            self.total_label.configure(text=str(total_linhas))
+            self.ui.update(total=total_linhas)
 
-            # Mostrar preview
-            self.preview_text.delete("1.0", "end")
-
-            # Cabeçalho
-            header = " | ".join([f"{col:^15}" for col in self.df_carregado.columns[:6]])
-            self.preview_text.insert("end", f"{'─' * len(header)}\n")
-            self.preview_text.insert("end", f"{header}\n")
-            self.preview_text.insert("end", f"{'─' * len(header)}\n")
-
-            # Dados (primeiras 50 linhas)
-            for idx, row in self.df_carregado.head(50).iterrows():
-                row_text = " | ".join([f"{str(val)[:15]:^15}" for val in row.values[:6]])
-                self.preview_text.insert("end", f"{row_text}\n")
-
-            if total_linhas > 50:
-                self.preview_text.insert("end", f"\n... e mais {total_linhas - 50} linhas\n")
+            # Validação por coluna (uma vez por carga) e primeira página do preview
+            self.preview_motivos = validar_linhas(self.df_carregado)
+            self.mostrar_pagina(0)
 
             # Validar colunas necessárias
             colunas_necessarias = ['Nº', 'Periodo', 'Salvar Como']
@@ -480,6 +848,77 @@ class AutomacaoGUI:
         except Exception as e:
             self.adicionar_log(f"Erro ao carregar preview: {str(e)}", logging.ERROR, "erro")
 
+    # Linhas por página do preview
+    PREVIEW_PAGINA = 100
+
+    def mostrar_pagina(self, inicio: int):
+        """Formata e exibe só a página que começa na posição inicio"""
+        df = self.df_carregado
+        if df is None:
+            return
+        total = len(df)
+        inicio = max(0, min(inicio, max(0, total - 1)))
+        inicio -= inicio % self.PREVIEW_PAGINA
+        fim = min(total, inicio + self.PREVIEW_PAGINA)
+        self.preview_inicio = inicio
+
+        header = f"{'Linha':>6} | " + " | ".join([f"{str(col)[:15]:^15}" for col in df.columns[:6]])
+        separador = '─' * len(header)
+        args = [f"{separador}\n{header}\n{separador}\n", ""]
+        motivos = self.preview_motivos.iloc[inicio:fim].tolist() if self.preview_motivos is not None else []
+        for texto, motivo in zip(formatar_linhas(df, inicio, fim), motivos or [""] * (fim - inicio)):
+            if motivo:
+                args += [f"{texto}  ⚠ {motivo}\n", "invalida"]
+            else:
+                args += [f"{texto}\n", ""]
+
+        textbox = self.preview_text._textbox
+        textbox.delete("1.0", "end")
+        textbox.insert("end", *args)
+
+        invalidas = int((self.preview_motivos != "").sum()) if self.preview_motivos is not None else 0
+        self.preview_pagina_label.configure(
+            text=f"Linhas {inicio + 2}–{fim + 1} de {total + 1} | {invalidas} inválidas")
+
+    def ir_para_linha(self):
+        """Mostra a página da linha do Excel informada (padrão: linha inicial)"""
+        valor = self.preview_ir_para.get().strip() or self.linha_inicial.get()
+        try:
+            linha = int(valor)
+        except ValueError:
+            return
+        self.mostrar_pagina(linha - 2)
+
+    def proxima_invalida(self):
+        """Mostra a página da próxima linha inválida depois da página atual"""
+        if self.preview_motivos is None:
+            return
+        posicoes = (self.preview_motivos != "").to_numpy().nonzero()[0]
+        seguintes = posicoes[posicoes >= self.preview_inicio + self.PREVIEW_PAGINA]
+        if len(seguintes) == 0:
+            seguintes = posicoes
+        if len(seguintes):
+            self.mostrar_pagina(int(seguintes[0]))
+
+    def drenar_logs(self):
+        """Descarrega a fila de logs no widget em um único insert por lote e
+        descarta as linhas mais antigas acima de LOG_MAX_LINHAS"""
+        try:
+            linhas = self.log_queue.drain()
+            if linhas:
+                textbox = self.log_text._textbox
+                args = []
+                for texto, tag in linhas:
+                    args += [texto, tag]
+                textbox.insert("end", *args)
+                excesso = int(textbox.index("end-1c").split(".")[0]) - self.LOG_MAX_LINHAS
+                if excesso > 0:
+                    textbox.delete("1.0", f"{excesso + 1}.0")
+                textbox.see("end")
+        except Exception:
+            pass
+        self.window.after(self.LOG_INTERVALO_MS, self.drenar_logs)
+
     def limpar_logs(self):
         """Limpa a área de logs"""
         self.log_text.delete("1.0", "end")
@@ -494,26 +933,68 @@ class AutomacaoGUI:
                 initialfilename=f"logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
             )
             if filename:
+                # Histórico completo da sessão (a tela guarda só as últimas linhas)
+                self.log_queue.drain(limite=1_000_000)
+                with open(self.log_queue.path, 'r', encoding='utf-8') as origem:
+                    historico = origem.read()
                 with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(self.log_text.get("1.0", "end"))
+                    f.write(historico)
                 self.adicionar_log(f"Logs exportados para: {filename}", logging.INFO, "sucesso")
         except Exception as e:
             self.adicionar_log(f"Erro ao exportar logs: {str(e)}", logging.ERROR, "erro")
 
     def atualizar_progresso(self, atual, total):
-        """Atualiza a barra de progresso"""
+        """Atualiza a barra de progresso (desenhada no próximo quadro)"""
         porcentagem = atual / total if total > 0 else 0
-        self.progress_bar.set(porcentagem)
-        self.progress_label.configure(text=f"{porcentagem * 100:.1f}%")
-        self.status_var.set(f"Processando: {atual}/{total}")
-        self.window.update_idletasks()
-
-    def atualizar_estatisticas(self):
-        """Atualiza os cards de estatísticas"""
-        self.sucesso_label.configure(text=str(self.linhas_processadas))
-        self.erros_label.configure(text=str(self.linhas_com_erro))
+        self.total_linhas = total
+        self.ui.update(progresso=porcentagem, total=total, status=f"Processando: {atual}/{total}")
+
+    def atualizar_estatisticas(self, execucao: ExecucaoLote):
+        """Atualiza os cards de estatísticas (desenhados no próximo quadro)"""
+        self.linhas_processadas = execucao.linhas_processadas
+        self.linhas_com_erro = execucao.linhas_com_erro
+        self.linhas_puladas = execucao.linhas_puladas
+        self.erros_detalhados = execucao.erros_detalhados
+        self.ui.update(sucesso=self.linhas_processadas, erros=self.linhas_com_erro)
         self.stats['processados'] = self.linhas_processadas + self.linhas_com_erro
 
+    def renderizar_estado(self):
+        """Desenha o UIStateModel a cada UI_INTERVALO_MS, só nos widgets que mudaram"""
+        try:
+            if self.ui.versao != self._ui_versao:
+                self._ui_versao = self.ui.versao
+                valores = self.ui.valores()
+                mudou = {nome: valor for nome, valor in valores.items()
+                         if nome not in self._ui_desenhado or self._ui_desenhado[nome] != valor}
+                self._ui_desenhado = valores
+                if 'progresso' in mudou:
+                    self.progress_bar.set(mudou['progresso'])
+                    self.progress_label.configure(text=f"{mudou['progresso'] * 100:.1f}%")
+                if 'status' in mudou:
+                    self.status_var.set(mudou['status'])
+                if 'indicador' in mudou:
+                    self._desenhar_indicador(mudou['indicador'])
+                if 'total' in mudou:
+                    self.total_label.configure(text=str(mudou['total']))
+                if 'sucesso' in mudou:
+                    self.sucesso_label.configure(text=str(mudou['sucesso']))
+                if 'erros' in mudou:
+                    self.erros_label.configure(text=str(mudou['erros']))
+                if 'empresa' in mudou:
+                    self.empresa_label.configure(text=str(mudou['empresa'])[:20])
+                if 'em_execucao' in mudou:
+                    if mudou['em_execucao']:
+                        self.btn_iniciar.configure(state="disabled")
+                        self.btn_pausar.configure(state="normal")
+                        self.btn_parar.configure(state="normal")
+                    else:
+                        self.btn_iniciar.configure(state="normal")
+                        self.btn_pausar.configure(state="disabled", text="⏸ Pausar")
+                        self.btn_parar.configure(state="disabled")
+        except Exception:
+            pass
+        self.window.after(self.UI_INTERVALO_MS, self.renderizar_estado)
+
     def atualizar_tempo(self):
         """Atualiza o tempo decorrido"""
         if self.stats['tempo_inicio'] and self.executando:
@@ -524,7 +1005,10 @@ class AutomacaoGUI:
             self.window.after(1000, self.atualizar_tempo)
 
     def atualizar_status_indicator(self, status):
-        """Atualiza o indicador de status visual"""
+        """Atualiza o indicador de status visual (desenhado no próximo quadro)"""
+        self.ui.update(indicador=status)
+
+    def _desenhar_indicador(self, status):
         cores = {
             'aguardando': '#7F8C8D',
             'executando': self.CORES['sucesso'],
@@ -535,7 +1019,7 @@ class AutomacaoGUI:
         self.status_indicator.configure(fg_color=cores.get(status, '#7F8C8D'))
 
     def adicionar_log(self, mensagem, level=logging.INFO, tag=None):
-        """Adiciona mensagem ao log visual com cores"""
+        """Enfileira mensagem para o log visual com cores (qualquer thread)"""
         try:
             timestamp = datetime.now().strftime('%H:%M:%S')
 
@@ -560,11 +1044,8 @@ class AutomacaoGUI:
             }
             prefixo = prefixos.get(tag, "•")
 
-            # Inserir mensagem
-            self.log_text.insert("end", f"[{timestamp}] {prefixo} ", tag)
-            self.log_text.insert("end", f"{mensagem}\n", tag)
-            self.log_text.see("end")
-            self.window.update_idletasks()
+            # O loop do Tk insere em lote (drenar_logs)
+            self.log_queue.put(f"[{timestamp}] {prefixo} {mensagem}\n", tag, mensagem)
         except Exception:
             pass
 
@@ -585,7 +1066,7 @@ class AutomacaoGUI:
 
         # Validar se o arquivo pode ser lido
         try:
-            df = pd.read_excel(self.arquivo_excel.get())
+            df = self.planilhas.get(self.arquivo_excel.get())
             if len(df) == 0:
                 return False, "Arquivo Excel está vazio"
 
@@ -617,40 +1098,111 @@ class AutomacaoGUI:
             messagebox.showerror("Erro de Validação", mensagem)
             return
 
+        # Veredito por linha antes de iniciar
+        if not self.confirmar_validacao():
+            return
+
+        # Diário da planilha: oferecer retomada se já houver linhas registradas
+        if not self.preparar_journal():
+            return
+
         # Resetar estatísticas
         self.linhas_processadas = 0
         self.linhas_com_erro = 0
         self.linhas_puladas = 0
         self.erros_detalhados = []
         self.stats = {'processados': 0, 'sucesso': 0, 'erros': 0, 'puladas': 0, 'tempo_inicio': datetime.now()}
-        self.sucesso_label.configure(text="0")
-        self.erros_label.configure(text="0")
+        self.ui.update(sucesso=0, erros=0)
 
         self.thread_automacao = threading.Thread(target=self.iniciar_automacao)
         self.thread_automacao.daemon = True
         self.thread_automacao.start()
 
         # Atualizar interface
-        self.btn_iniciar.configure(state="disabled")
-        self.btn_pausar.configure(state="normal")
-        self.btn_parar.configure(state="normal")
-        self.atualizar_status_indicator('executando')
+        self.ui.update(em_execucao=True, indicador='executando')
 
         # Iniciar timer
         self.atualizar_tempo()
 
+    def confirmar_validacao(self) -> bool:
+        """Valida todas as linhas a processar e mostra o veredito; com linhas
+        inválidas pergunta se deve iniciar pulando-as. False = cancelado."""
+        df = self.planilhas.get(self.arquivo_excel.get())
+        if df is self.df_carregado and self.preview_motivos is not None:
+            motivos = self.preview_motivos  # já calculado no preview
+        else:
+            motivos = validar_linhas(df)
+        self.linhas_invalidas = motivos[motivos != ""].to_dict()
+        motivos = motivos.iloc[max(0, int(self.linha_inicial.get()) - 2):]
+        invalidas = motivos[motivos != ""]
+        if invalidas.empty:
+            self.adicionar_log(f"Validação: {len(motivos)} linhas OK", logging.INFO, "sucesso")
+            return True
+
+        self.adicionar_log(f"Validação: {len(invalidas)} de {len(motivos)} linhas inválidas", logging.WARNING, "aviso")
+        for indice, motivo in invalidas.items():
+            self.adicionar_log(f"  Linha {indice + 2}: {motivo}", logging.WARNING, "aviso")
+        exemplos = "\n".join(f"Linha {indice + 2}: {motivo}" for indice, motivo in invalidas.head(10).items())
+        if len(invalidas) > 10:
+            exemplos += f"\n... e mais {len(invalidas) - 10}"
+        return messagebox.askyesno(
+            "Linhas inválidas",
+            f"{len(invalidas)} de {len(motivos)} linhas não passaram na validação:\n\n{exemplos}\n\n"
+            f"Iniciar pulando essas linhas?"
+        )
+
+    def preparar_journal(self) -> bool:
+        """Abre o diário da planilha e pergunta se deve retomar. False = cancelado."""
+        self.retomar = False
+        try:
+            self.journal = RowJournal.for_workbook(self.logs_dir, self.arquivo_excel.get())
+        except Exception as e:
+            self.journal = None
+            self.adicionar_log(f"Diário de execução indisponível: {str(e)}", logging.WARNING, "aviso")
+            return True
+
+        if not self.journal.estados:
+            return True
+
+        # Mesmas chaves que a execução grava: uma por período das linhas válidas
+        df = self.planilhas.get(self.arquivo_excel.get())
+        validas = df[~df.index.isin(list(self.linhas_invalidas))]
+        contagem = self.journal.counts(RowJournal.row_key(row) for _, row in expandir_periodos(validas).iterrows())
+        if not contagem[RowJournal.OK] and not contagem[RowJournal.FALHA]:
+            return True
+
+        resposta = messagebox.askyesnocancel(
+            "Retomar execução",
+            f"Esta planilha já foi processada anteriormente:\n\n"
+            f"✅ Concluídas: {contagem[RowJournal.OK]}\n"
+            f"❌ Com falha: {contagem[RowJournal.FALHA]}\n"
+            f"⏳ Pendentes: {contagem['pendente']}\n\n"
+            f"Sim: retomar (processa apenas pendentes e com falha, desde o início da planilha)\n"
+            f"Não: processar tudo a partir da linha inicial"
+        )
+        if resposta is None:
+            self.journal.close()
+            self.journal = None
+            return False
+        self.retomar = resposta
+        return True
+
+    def pasta_saida(self) -> str:
+        """Pasta onde o Domínio grava os PDFs ('' = não informada)."""
+        return self.pasta_pdf.get().strip()
+
     def pausar_automacao(self):
         """Pausa/retoma a automação"""
         if self.executando:
             self.pausa_solicitada = not self.pausa_solicitada
             if self.pausa_solicitada:
                 self.btn_pausar.configure(text="▶  Retomar")
-                self.status_var.set("Pausado")
+                self.ui.update(status="Pausado")
                 self.atualizar_status_indicator('pausado')
                 self.adicionar_log("Automação pausada", logging.INFO, "aviso")
             else:
                 self.btn_pausar.configure(text="⏸  Pausar")
-                self.status_var.set("Em execução...")
+                self.ui.update(status="Em execução...")
                 self.atualizar_status_indicator('executando')
                 self.adicionar_log("Automação retomada", logging.INFO, "info")
 
@@ -660,7 +1212,7 @@ class AutomacaoGUI:
             self.executando = False
             self.pausa_solicitada = False
             self.adicionar_log("Solicitação de parada enviada. Aguardando conclusão...", logging.INFO, "aviso")
-            self.status_var.set("Interrompendo...")
+            self.ui.update(status="Interrompendo...")
             self.atualizar_status_indicator('erro')
 
     def ao_fechar(self):
@@ -670,289 +1222,1461 @@ class AutomacaoGUI:
                                    "Existe uma automação em execução. Deseja realmente sair?"):
                 self.executando = False
                 self.pausa_solicitada = False
+                self.outbox.parar()
+                self.window.after(1000, self.log_queue.close)
                 self.window.after(1000, self.window.destroy)
         else:
+            self.outbox.parar()
+            self.log_queue.close()
             self.window.destroy()
 
     def iniciar_automacao(self):
-        """Método principal de automação"""
-        linha_inicial = int(self.linha_inicial.get())
-
+        """Método principal de automação: roda a ExecucaoLote com os callbacks da tela"""
+        self.ui.update(status="Em execução...")
+        self.executando = True
+        execucao = ExecucaoLote(
+            self.arquivo_excel.get(), self, self.logger, self.logs_dir, self.pasta_saida(),
+            linha_inicial=int(self.linha_inicial.get()), retomar=self.retomar, journal=self.journal,
+            linhas_invalidas=self.linhas_invalidas, forcar_regeracao=self.forcar_regeracao.get(),
+            agrupar_empresas=self.agrupar_empresas.get(), sessao_persistente=self.sessao_persistente.get(),
+            planilhas=self.planilhas, outbox=self.outbox, log=self.adicionar_log,
+            ao_progresso=self.atualizar_progresso, ao_estatisticas=self.atualizar_estatisticas,
+            ao_empresa=lambda numero: self.ui.update(empresa=numero))
         try:
-            self.adicionar_log("Iniciando automação...", logging.INFO, "processando")
-            self.status_var.set("Em execução...")
-            self.executando = True
+            resultado = execucao.executar()
+            if resultado == ExecucaoLote.CONCLUIDA:
+                self.ui.update(status="Processamento concluído", progresso=1.0, indicador='concluido')
+                execucao.notificar_resumo()
+            elif resultado == ExecucaoLote.ERRO:
+                self.ui.update(status="Erro no processamento", indicador='erro')
+        finally:
+            # O diário é fechado pela execução
+            self.journal = None
+            self.executando = False
+            self.pausa_solicitada = False
+            self.ui.update(em_execucao=False)
 
-            # Carregar Excel
-            df = pd.read_excel(self.arquivo_excel.get())
+    def executar(self):
+        self.window.mainloop()
 
-            # Ajustar linha inicial para índice do DataFrame (linha 2 = índice 1)
-            inicio_indice = linha_inicial - 2
-            df_processar = df.iloc[inicio_indice:]
+class Clock:
+    """Relógio real. O simulador (DomBot_Sim.py) usa um relógio virtual com a mesma interface."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, condition: threading.Condition, predicate: Callable[[], bool], timeout: float) -> bool:
+        """Espera predicate() em condition (já adquirida) por até timeout segundos."""
+        return condition.wait_for(predicate, timeout)
+
+
+REAL_CLOCK = Clock()
+
+
+# Palavras-chave que identificam diálogos de erro/aviso (#32770) do Domínio
+ERROR_DIALOG_KEYWORDS = ("erro", "aviso", "atenção", "alerta", "warning", "error", "informação")
+
+# Regras de classificação de diálogos (editáveis sem nova versão do bot)
+DIALOG_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regras_dialogos.json")
+
+# Regras padrão, usadas quando regras_dialogos.json não existe ou é inválido
+DEFAULT_DIALOG_RULES = [
+    {"nome": "gravacao_nao_critica",
+     "mensagem": "erro na gravação do relatório|nome do caminho inválido|caminho inv[aá]lido|caracteres não permitidos",
+     "acao": "continuar", "teclas": ["{ENTER}"], "fundo": True},
+    {"nome": "sem_dados",
+     "mensagem": "sem dados para emitir|nenhum registro encontrado|não há dados|registro não encontrado",
+     "acao": "abortar", "teclas": ["{ENTER}", "{ESC}", "{ESC}", "{ESC}", "{ESC}"]},
+    {"nome": "erro_lexico", "titulo": "léxico", "acao": "continuar", "teclas": ["{ESC}", "{ESC}", "{ESC}"]},
+    {"nome": "erro_aviso", "titulo": "^(erro|aviso)$", "acao": "abortar", "teclas": ["OK"]},
+    {"nome": "generico", "acao": "continuar", "teclas": ["OK"]},
+]
+
+
+class DialogRule(NamedTuple):
+    """Regra: padrões (regex, sem diferenciar maiúsculas) de título e mensagem,
+    ação e teclas enviadas ao diálogo ("OK" = clicar no botão OK).
+    fundo: diálogo benigno, fechado pelo vigia assim que aparece."""
+    nome: str
+    titulo: str
+    mensagem: str
+    acao: str
+    teclas: Tuple[str, ...]
+    fundo: bool = False
+
+
+class DialogRules:
+    """Classificador de diálogos compilado em uma única regex.
+
+    Cada regra vira uma alternativa com lookaheads sobre "título\\nmensagem";
+    a regex testa as alternativas em ordem, então a primeira regra que casa
+    vence, com uma só chamada a match() por diálogo."""
+
+    CONTINUAR = "continuar"
+    ABORTAR = "abortar"
+    REPETIR = "repetir"
+    ESCALAR = "escalar"
+    ACOES = (CONTINUAR, ABORTAR, REPETIR, ESCALAR)
+
+    FALLBACK = DialogRule("padrao", "", "", CONTINUAR, ("OK",))
+
+    def __init__(self, rules: Iterable[dict], origem: str = "padrão"):
+        self.origem = origem
+        self.rules: List[DialogRule] = []
+        for indice, rule in enumerate(rules):
+            if not isinstance(rule, dict):
+                raise ValueError(f"Regra {indice + 1}: esperado um objeto, veio {type(rule).__name__}")
+            nome = str(rule.get("nome") or f"regra_{indice + 1}")
+            acao = str(rule.get("acao", self.CONTINUAR)).lower()
+            if acao not in self.ACOES:
+                raise ValueError(f"Regra '{nome}': ação inválida '{acao}'")
+            titulo = self._padrao_simples(nome, rule.get("titulo"))
+            mensagem = self._padrao_simples(nome, rule.get("mensagem"))
+            self.rules.append(DialogRule(nome, titulo, mensagem, acao, tuple(rule.get("teclas", ("OK",))),
+                                         bool(rule.get("fundo", False)) and acao == self.CONTINUAR))
+
+        alternativas = []
+        for indice, rule in enumerate(self.rules):
+            partes = []
+            if rule.titulo:
+                # Sem DOTALL no título: '.' não atravessa para a linha da mensagem
+                partes.append(f"(?=[^\\n]*?(?-s:{rule.titulo}))")
+            if rule.mensagem:
+                partes.append(f"(?=[^\\n]*\\n.*?(?:{rule.mensagem}))")
+            alternativas.append(f"(?P<_regra{indice}>{''.join(partes)})")
+        try:
+            self._matcher = re.compile("|".join(alternativas), re.IGNORECASE | re.MULTILINE | re.DOTALL) \
+                if alternativas else None
+        except re.error as e:
+            raise ValueError(f"Regras não combinam em uma regex ({e})")
+
+        # nome -> [ocorrências, segundos tratando]; atualizados pelo vigia e pelo fluxo
+        self.hits: Dict[str, List[float]] = {}
+        self.classificacoes = 0
+        self.tempo_classificacao = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _padrao_simples(nome: str, padrao) -> str:
+        """Valida o padrão e o deixa seguro para entrar na regex combinada.
+
+        Grupos viram não capturantes (o número/nome deles mudaria na combinação)
+        e flags globais iniciais como (?i) viram flags locais (?i:...).
+        Referências a grupos (\\1, (?P=nome)) não têm como sobreviver: são recusadas."""
+        if padrao is None:
+            return ""
+        if not isinstance(padrao, str):
+            raise ValueError(f"Regra '{nome}': padrão deve ser texto, veio {type(padrao).__name__}")
+        try:
+            compilado = re.compile(padrao)
+        except re.error as e:
+            raise ValueError(f"Regra '{nome}': padrão inválido '{padrao}' ({e})")
+        if compilado.groups and re.search(r"\\[1-9]|\\g<|\(\?P=|\(\?\(", padrao):
+            raise ValueError(f"Regra '{nome}': referências a grupos não são suportadas em '{padrao}'")
+
+        flags = re.match(r"\(\?([aiLmsux]+)\)", padrao)
+        i = flags.end() if flags else 0
+        saida = []
+        em_classe = False
+        while i < len(padrao):
+            c = padrao[i]
+            if c == "\\":
+                saida.append(padrao[i:i + 2])
+                i += 2
+                continue
+            if em_classe:
+                em_classe = c != "]"
+            elif c == "[":
+                # ']' logo após '[' ou '[^' é literal
+                fim = i + 1 + (padrao[i + 1:i + 2] == "^")
+                if padrao[fim:fim + 1] == "]":
+                    fim += 1
+                saida.append(padrao[i:fim])
+                i = fim
+                em_classe = True
+                continue
+            elif c == "(" and padrao[i + 1:i + 2] != "?":
+                saida.append("(?:")
+                i += 1
+                continue
+            elif padrao.startswith("(?P<", i):
+                saida.append("(?:")
+                i = padrao.index(">", i) + 1
+                continue
+            saida.append(c)
+            i += 1
+        seguro = "".join(saida)
+        if flags:
+            seguro = f"(?{flags.group(1)}:{seguro})"
+        try:
+            if re.compile(seguro).groups:
+                raise re.error("grupo capturante restante")
+        except re.error as e:
+            raise ValueError(f"Regra '{nome}': padrão não suportado '{padrao}' ({e})")
+        return seguro
+
+    @classmethod
+    def load(cls, path: str = DIALOG_RULES_FILE,
+             log: Optional[Callable[[str], None]] = None) -> "DialogRules":
+        """Carrega as regras do arquivo JSON; regras padrão se ausente ou inválido."""
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return cls(json.load(f), origem=path)
+            except (OSError, ValueError, TypeError, re.error) as e:
+                if log:
+                    log(f"⚠️ Regras de diálogo inválidas ({str(e)}), usando padrão")
+        return cls(DEFAULT_DIALOG_RULES)
+
+    def classify(self, title: str, message: str) -> DialogRule:
+        inicio = time.perf_counter()
+        texto = f"{title or ''}\n{(message or '').replace(chr(10), ' ')}"
+        encontrado = self._matcher.match(texto) if self._matcher else None
+        rule = self.FALLBACK
+        if encontrado:
+            # Só a alternativa que casou tem grupo definido ('' por ser de largura zero)
+            for nome, valor in encontrado.groupdict().items():
+                if valor is not None and nome.startswith("_regra"):
+                    rule = self.rules[int(nome[6:])]
+                    break
+        with self._lock:
+            self.classificacoes += 1
+            self.tempo_classificacao += time.perf_counter() - inicio
+        return rule
+
+    def record(self, rule: DialogRule, seconds: float):
+        with self._lock:
+            hit = self.hits.setdefault(rule.nome, [0, 0.0])
+            hit[0] += 1
+            hit[1] += seconds
+
+    def summary(self) -> List[str]:
+        with self._lock:
+            hits = {nome: list(hit) for nome, hit in self.hits.items()}
+        resumo = [f"{nome}: {int(qtd)}x, {tempo:.1f}s tratando"
+                  for nome, (qtd, tempo) in sorted(hits.items(), key=lambda item: item[1][0], reverse=True)]
+        if self.classificacoes:
+            resumo.append(f"Classificação: {self.classificacoes} diálogos em "
+                          f"{self.tempo_classificacao * 1000:.2f} ms")
+        return resumo
+
+
+class WindowInfo(NamedTuple):
+    """Janela de nível superior visível no momento da enumeração."""
+    hwnd: int
+    title: str
+    class_name: str
+
+
+def normalize_title(title: str) -> str:
+    """Normaliza título para comparação (sem espaços nas bordas, minúsculo)."""
+    return (title or "").strip().lower()
+
+
+def enumerate_top_windows() -> List[WindowInfo]:
+    """Enumera as janelas visíveis de nível superior em uma única passagem EnumWindows."""
+    windows = []
+
+    def callback(hwnd, _):
+        if win32gui.IsWindowVisible(hwnd):
+            try:
+                windows.append(WindowInfo(hwnd, win32gui.GetWindowText(hwnd), win32gui.GetClassName(hwnd)))
+            except Exception:
+                pass
+        return True
 
-            self.total_linhas = len(df_processar)
-            self.adicionar_log(f"Arquivo carregado: {self.total_linhas} linhas para processar", logging.INFO, "info")
-            self.adicionar_log(f"Iniciando da linha {linha_inicial} (índice {inicio_indice})", logging.INFO, "info")
-            self.total_label.configure(text=str(self.total_linhas))
+    win32gui.EnumWindows(callback, None)
+    return windows
 
-            # Resetar barra de progresso
-            self.progress_bar.set(0)
 
-            # Iniciar automação
-            automacao = DominioAutomation(self.logger, self)
+def find_child_window(hwnd: int, class_name: str, title: str) -> bool:
+    """Verifica se a janela possui um filho direto com classe/título via FindWindowEx."""
+    return bool(win32gui.FindWindowEx(hwnd, 0, class_name, title))
 
-            # Conectar ao Domínio
-            if not automacao.connect_to_dominio():
-                self.adicionar_log("Não foi possível conectar ao Domínio", logging.ERROR, "erro")
-                return
 
-            # Processar linhas
-            for idx, (original_index, row) in enumerate(df_processar.iterrows()):
-                # Verificar se deve parar
-                if not self.executando:
-                    self.adicionar_log("Automação interrompida pelo usuário", logging.INFO, "aviso")
-                    break
+def find_top_windows(class_name: str, title: Optional[str] = None, process_id: int = 0) -> List[int]:
+    """Janelas visíveis de nível superior com a classe (e título exato) via FindWindowEx,
+    opcionalmente só do processo informado."""
+    handles = []
+    hwnd = 0
+    while True:
+        try:
+            hwnd = win32gui.FindWindowEx(0, hwnd, class_name, title)
+        except Exception:
+            break
+        if not hwnd:
+            break
+        if not win32gui.IsWindowVisible(hwnd):
+            continue
+        if process_id and win32process.GetWindowThreadProcessId(hwnd)[1] != process_id:
+            continue
+        handles.append(hwnd)
+    return handles
+
+
+def find_descendant(parent: int, class_name: str, title: Optional[str] = None,
+                    control_id: Optional[int] = None) -> Optional[int]:
+    """Primeiro descendente visível com a classe e título/ID de controle (EnumChildWindows).
+
+    O título é comparado sem '&' (acelerador), como o nome exposto pela UIA."""
+    found = []
+
+    def callback(hwnd, _):
+        if found or not win32gui.IsWindowVisible(hwnd) or win32gui.GetClassName(hwnd) != class_name:
+            return True
+        if control_id is not None and win32gui.GetDlgCtrlID(hwnd) != control_id:
+            return True
+        if title is not None and win32gui.GetWindowText(hwnd).replace("&", "") != title:
+            return True
+        found.append(hwnd)
+        return True
 
-                # Verificar pausa
-                while self.pausa_solicitada and self.executando:
-                    time.sleep(0.5)
+    try:
+        win32gui.EnumChildWindows(parent, callback, None)
+    except Exception:
+        pass
+    return found[0] if found else None
+
+
+class WindowSnapshot:
+    """Foto das janelas de nível superior, indexada por classe e título normalizado.
+
+    Todos os predicados de detecção consultam a mesma foto, de modo que um tick de
+    polling custa uma única enumeração. As consultas a filhos (FindWindowEx) são
+    memorizadas durante a vida da foto."""
+
+    def __init__(self, windows: Iterable[WindowInfo],
+                 child_finder: Optional[Callable[[int, str, str], bool]] = None,
+                 taken_at: Optional[float] = None):
+        self.windows = list(windows)
+        self.taken_at = time.time() if taken_at is None else taken_at
+        self._child_finder = child_finder
+        self._child_cache: Dict[Tuple[int, str, str], bool] = {}
+        self._by_class: Dict[str, List[WindowInfo]] = {}
+        self._by_title: Dict[str, List[WindowInfo]] = {}
+        for window in self.windows:
+            self._by_class.setdefault(window.class_name, []).append(window)
+            self._by_title.setdefault(normalize_title(window.title), []).append(window)
+
+    def __len__(self):
+        return len(self.windows)
+
+    def of_class(self, class_name: str) -> List[WindowInfo]:
+        return self._by_class.get(class_name, [])
+
+    def find(self, title: str, class_name: str) -> Optional[WindowInfo]:
+        """Janela com título exato (normalizado) e classe."""
+        for window in self._by_title.get(normalize_title(title), []):
+            if window.class_name == class_name:
+                return window
+        return None
+
+    def find_partial(self, title_part: str, class_name: str) -> Optional[WindowInfo]:
+        """Janela da classe cujo título contém title_part (sem diferenciar maiúsculas)."""
+        part = normalize_title(title_part)
+        for window in self.of_class(class_name):
+            if part in normalize_title(window.title):
+                return window
+        return None
+
+    def find_error_dialog(self, keywords: Iterable[str] = ERROR_DIALOG_KEYWORDS,
+                          exclude: Iterable[int] = ()) -> Optional[WindowInfo]:
+        """Primeiro #32770 cujo título contém alguma das palavras-chave de erro
+        (exclude: hwnds já em tratamento pelo vigia de diálogos)."""
+        for window in self.of_class("#32770"):
+            if window.hwnd in exclude:
+                continue
+            title = normalize_title(window.title)
+            if title and any(kw in title for kw in keywords):
+                return window
+        return None
+
+    def has_child(self, hwnd: int, class_name: str, title: str) -> bool:
+        key = (hwnd, class_name, title)
+        if key not in self._child_cache:
+            try:
+                self._child_cache[key] = bool(self._child_finder and self._child_finder(hwnd, class_name, title))
+            except Exception:
+                self._child_cache[key] = False
+        return self._child_cache[key]
 
-                if not self.executando:
-                    break
+    def find_with_child(self, class_name: str, child_class: str, child_title: str) -> Optional[WindowInfo]:
+        """Janela da classe que contém um filho com a classe/título informados."""
+        for window in self.of_class(class_name):
+            if self.has_child(window.hwnd, child_class, child_title):
+                return window
+        return None
 
-                # Atualizar progresso
-                self.atualizar_progresso(idx + 1, self.total_linhas)
 
-                linha_excel = original_index + 2  # +2 porque: +1 para base 1, +1 para cabeçalho
+# Títulos (normalizados) cujas aparições devem acordar as esperas imediatamente
+WATCHED_WINDOW_TITLES = ("taxa gms", "salvar em pdf", "troca de empresas",
+                         "gerenciador de relatórios", "avisos de vencimento")
 
-                # Atualizar empresa no card
-                empresa_num = str(int(row['Nº']))
-                self.empresa_label.configure(text=empresa_num[:20])
 
-                try:
-                    self.adicionar_log(f"Processando linha {linha_excel} - Empresa {row['Nº']} - {row.get('EMPRESAS', 'N/A')}", logging.INFO, "processando")
+class WindowEvent(NamedTuple):
+    """Evento de janela: kind é 'create', 'show', 'hide', 'destroy' ou 'name'."""
+    kind: str
+    hwnd: int
+    title: str
+    class_name: str
+    timestamp: float
 
-                    success = automacao.processar_linha(row, original_index, linha_excel)
 
-                    if success:
-                        self.linhas_processadas += 1
-                        self.success_logger.info(f"Linha {linha_excel} - Empresa {row['Nº']} - processada com sucesso")
-                        self.adicionar_log(f"Linha {linha_excel} processada com sucesso", logging.INFO, "sucesso")
-                    else:
-                        self.linhas_com_erro += 1
-                        self.error_logger.error(f"Linha {linha_excel} - Empresa {row['Nº']} - erro no processamento")
-                        self.adicionar_log(f"Erro na linha {linha_excel}", logging.ERROR, "erro")
-                        self.erros_detalhados.append({
-                            'empresa': row.get('EMPRESAS', 'N/A'),
-                            'numero': row['Nº'],
-                            'motivo': 'Erro no processamento'
-                        })
+def is_relevant_event(event: WindowEvent) -> bool:
+    """Eventos que podem mudar o resultado de uma espera da automação."""
+    if event.kind in ("destroy", "hide"):
+        return True
+    if event.class_name == "#32770":
+        return True
+    title = normalize_title(event.title)
+    return any(watched in title for watched in WATCHED_WINDOW_TITLES)
 
-                    self.atualizar_estatisticas()
 
-                except Exception as e:
-                    self.linhas_com_erro += 1
-                    erro_msg = f"Linha {linha_excel} - Erro: {str(e)}"
-                    self.error_logger.error(erro_msg)
-                    self.adicionar_log(erro_msg, logging.ERROR, "erro")
-                    self.erros_detalhados.append({
-                        'empresa': row.get('EMPRESAS', 'N/A'),
-                        'numero': row['Nº'],
-                        'motivo': str(e)[:80]
-                    })
-                    self.atualizar_estatisticas()
-
-            # Finalização
-            if self.executando:
-                self.status_var.set("Processamento concluído")
-                self.progress_bar.set(1.0)
-                self.progress_label.configure(text="100%")
-                self.atualizar_status_indicator('concluido')
-                self.adicionar_log("Automação concluída!", logging.INFO, "sucesso")
-                self.adicionar_log(f"Resumo: {self.linhas_processadas} processadas, {self.linhas_com_erro} com erro, {self.linhas_puladas} puladas", logging.INFO, "info")
-
-                # Enviar notificação ao Discord via webhook
-                try:
-                    diretorio_pdfs = os.path.dirname(os.path.abspath(self.arquivo_excel.get()))
-                    mensagem = (
-                        f"📋 **Emissão de Taxa GMS Finalizada**\n\n"
-                        f"📊 **Quantidade emitida:** {self.linhas_processadas}\n"
-                        f"❌ **Com erro:** {self.linhas_com_erro}\n"
-                        f"⏭️ **Puladas:** {self.linhas_puladas}\n"
-                        f"📂 **Diretório dos PDFs:** `{diretorio_pdfs}`\n\n"
-                        f"✅ Emissão finalizada com sucesso!\n\n"
-                        f"<@&1299044385899548752>"
-                    )
-                    if self.erros_detalhados:
-                        tabela = "```\n"
-                        tabela += f"{'Nº':<6} {'Empresa':<35} {'Motivo'}\n"
-                        tabela += "-" * 80 + "\n"
-                        for erro in self.erros_detalhados:
-                            num = str(erro['numero'])[:5]
-                            empresa = str(erro['empresa'])[:34]
-                            motivo = str(erro['motivo'])[:38]
-                            tabela += f"{num:<6} {empresa:<35} {motivo}\n"
-                        tabela += "```"
-                        mensagem += f"\n\n❌ **Empresas com erro:**\n{tabela}"
-                    webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
-                    requests.post(webhook_url, json={"content": mensagem}, timeout=10)
-                    self.adicionar_log("Notificação enviada ao Discord", logging.INFO, "sucesso")
-                except Exception as e:
-                    self.adicionar_log(f"Erro ao enviar notificação ao Discord: {str(e)}", logging.WARNING, "aviso")
+class WindowEventSource:
+    """Fonte abstrata de eventos de janela.
 
-        except Exception as e:
-            erro_msg = f"Erro crítico: {str(e)}"
-            self.error_logger.error(erro_msg)
-            self.adicionar_log(erro_msg, logging.ERROR, "erro")
-            self.status_var.set("Erro no processamento")
-            self.atualizar_status_indicator('erro')
-        finally:
-            self.executando = False
-            self.pausa_solicitada = False
-            self.btn_iniciar.configure(state="normal")
-            self.btn_pausar.configure(state="disabled", text="⏸ Pausar")
-            self.btn_parar.configure(state="disabled")
+    start() recebe a função publish do barramento e retorna True se a fonte ficou
+    ativa. Implementações: WinEventHookSource (Windows) e SyntheticEventSource
+    (feed sintético, usado em testes e simulações)."""
 
-    def executar(self):
-        self.window.mainloop()
+    def start(self, publish: Callable[[WindowEvent], None]) -> bool:
+        raise NotImplementedError
 
-class DominioAutomation:
-    def __init__(self, logger, gui):
-        timings.Timings.window_find_timeout = 20
-        self.app = None
-        self.main_window = None
-        self.logger = logger
-        self.gui = gui
+    def stop(self):
+        pass
 
-    def log(self, message):
-        self.logger.info(message)
 
-    def should_stop(self) -> bool:
-        """Verifica se deve parar a execução"""
-        return not self.gui.executando
+class SyntheticEventSource(WindowEventSource):
+    """Fonte alimentada manualmente via emit(); funciona em qualquer plataforma."""
 
-    def check_pause(self):
-        """Verifica e aguarda se pausado"""
-        while self.gui.pausa_solicitada and self.gui.executando:
-            time.sleep(0.5)
+    def __init__(self, clock: Optional["Clock"] = None):
+        self.clock = clock or REAL_CLOCK
+        self._publish = None
 
-    def smart_sleep(self, seconds: float):
-        """Sleep interruptível que verifica pausa/parada"""
-        interval = 0.15
-        elapsed = 0.0
-        while elapsed < seconds:
-            if self.should_stop():
-                return False
-            self.check_pause()
-            if self.should_stop():
-                return False
-            sleep_time = min(interval, seconds - elapsed)
-            time.sleep(sleep_time)
-            elapsed += sleep_time
+    def start(self, publish: Callable[[WindowEvent], None]) -> bool:
+        self._publish = publish
         return True
 
-    def wait_for_condition(self, condition_fn, timeout: float = 30, poll_interval: float = 0.15, description: str = "") -> bool:
-        """Polls condition_fn() até retornar True, ou timeout.
-        Retorna True se condição foi atendida, False se timeout ou stop."""
-        start = time.time()
-        while time.time() - start < timeout:
-            if self.should_stop():
-                return False
-            self.check_pause()
-            try:
-                if condition_fn():
-                    if description:
-                        self.log(f"{description} - concluido em {time.time() - start:.1f}s")
-                    return True
-            except Exception:
-                pass
-            time.sleep(poll_interval)
-        if description:
-            self.log(f"{description} - timeout apos {timeout}s")
-        return False
+    def stop(self):
+        self._publish = None
+
+    def emit(self, kind: str, hwnd: int = 0, title: str = "", class_name: str = ""):
+        if self._publish:
+            self._publish(WindowEvent(kind, hwnd, title, class_name, self.clock.time()))
+
+
+class WinEventHookSource(WindowEventSource):
+    """Eventos via SetWinEventHook (create/show/hide/destroy/name-change).
+
+    Os hooks rodam fora de contexto em uma thread própria com loop de mensagens,
+    filtrados pelo processo do Domínio quando process_id é informado."""
+
+    EVENT_OBJECT_CREATE = 0x8000
+    EVENT_OBJECT_DESTROY = 0x8001
+    EVENT_OBJECT_SHOW = 0x8002
+    EVENT_OBJECT_HIDE = 0x8003
+    EVENT_OBJECT_NAMECHANGE = 0x800C
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WINEVENT_SKIPOWNPROCESS = 0x0002
+    OBJID_WINDOW = 0
+    CHILDID_SELF = 0
+    GA_ROOT = 2
+    WM_QUIT = 0x0012
+
+    KINDS = {
+        EVENT_OBJECT_CREATE: "create",
+        EVENT_OBJECT_DESTROY: "destroy",
+        EVENT_OBJECT_SHOW: "show",
+        EVENT_OBJECT_HIDE: "hide",
+        EVENT_OBJECT_NAMECHANGE: "name",
+    }
 
-    def _window_exists(self, title: str, class_name: str) -> bool:
-        """Verifica se janela com título/classe existe via win32gui (rápido)."""
+    def __init__(self, process_id: int = 0):
+        self.process_id = process_id
+        self._publish = None
+        self._thread = None
+        self._thread_id = None
+        self._ready = threading.Event()
+        self._ok = False
+
+    def start(self, publish: Callable[[WindowEvent], None]) -> bool:
+        if os.name != 'nt':
+            return False
+        self._publish = publish
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="WinEventHook", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self._ok
+
+    def stop(self):
+        if self._thread_id is not None:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+        if self._thread is not None:
+            self._thread.join(2)
+        self._thread = None
+        self._thread_id = None
+        self._publish = None
+
+    def _run(self):
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.GetAncestor.restype = wintypes.HWND
+
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+
+        def callback(_hook, event, hwnd, id_object, id_child, _thread, _ms):
+            if id_object != self.OBJID_WINDOW or id_child != self.CHILDID_SELF or not hwnd:
+                return
+            kind = self.KINDS.get(event)
+            publish = self._publish
+            if kind is None or publish is None:
+                return
+            title = class_name = ""
+            if kind != "destroy":
+                try:
+                    # Apenas janelas de nível superior interessam às esperas
+                    if user32.GetAncestor(hwnd, self.GA_ROOT) != hwnd:
+                        return
+                    title = win32gui.GetWindowText(hwnd)
+                    class_name = win32gui.GetClassName(hwnd)
+                except Exception:
+                    return
+            try:
+                publish(WindowEvent(kind, hwnd, title, class_name, time.time()))
+            except Exception:
+                pass
+
+        # Mantém a referência do callback viva enquanto os hooks existirem
+        self._proc = WinEventProc(callback)
+        flags = self.WINEVENT_OUTOFCONTEXT | self.WINEVENT_SKIPOWNPROCESS
+        hooks = [
+            user32.SetWinEventHook(self.EVENT_OBJECT_CREATE, self.EVENT_OBJECT_HIDE, 0,
+                                   self._proc, self.process_id, 0, flags),
+            user32.SetWinEventHook(self.EVENT_OBJECT_NAMECHANGE, self.EVENT_OBJECT_NAMECHANGE, 0,
+                                   self._proc, self.process_id, 0, flags),
+        ]
+        self._ok = all(hooks)
+        self._thread_id = kernel32.GetCurrentThreadId()
+        self._ready.set()
+        if not self._ok:
+            for hook in hooks:
+                if hook:
+                    user32.UnhookWinEvent(hook)
+            return
+
+        msg = wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+        for hook in hooks:
+            user32.UnhookWinEvent(hook)
+
+
+class WindowEventBus:
+    """Barramento de eventos de janela.
+
+    Repassa todo evento aos assinantes e incrementa a geração a cada evento
+    relevante, acordando quem está em wait_for_event(). Sem fonte ativa, as
+    esperas caem no polling normal."""
+
+    def __init__(self, source: Optional[WindowEventSource] = None,
+                 relevant: Callable[[WindowEvent], bool] = is_relevant_event,
+                 clock: Optional["Clock"] = None):
+        self.source = source
+        self.relevant = relevant
+        self.clock = clock or REAL_CLOCK
+        self.active = False
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._subscribers: Dict[int, Tuple[Callable[[WindowEvent], None], Optional[Callable[[WindowEvent], bool]]]] = {}
+        self._next_token = 1
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def start(self, source: Optional[WindowEventSource] = None) -> bool:
+        if source is not None:
+            self.source = source
+        if self.active or self.source is None:
+            return self.active
         try:
-            result = [False]
-            def callback(hwnd, _):
-                if win32gui.IsWindowVisible(hwnd):
-                    try:
-                        if (win32gui.GetWindowText(hwnd) == title and
-                                win32gui.GetClassName(hwnd) == class_name):
-                            result[0] = True
-                            return False
-                    except Exception:
-                        pass
-                return True
-            win32gui.EnumWindows(callback, None)
-            return result[0]
+            self.active = bool(self.source.start(self.publish))
         except Exception:
-            return False
+            self.active = False
+        return self.active
 
-    def _save_dialog_exists(self) -> bool:
-        """Verifica se a janela de salvamento existe procurando pelo elemento 'Salvar em:' (AutomationId 1091)."""
+    def stop(self):
+        if self.source is not None and self.active:
+            try:
+                self.source.stop()
+            except Exception:
+                pass
+        self.active = False
+        with self._cond:
+            self._cond.notify_all()
+
+    def subscribe(self, callback: Callable[[WindowEvent], None],
+                  predicate: Optional[Callable[[WindowEvent], bool]] = None) -> int:
+        with self._cond:
+            token = self._next_token
+            self._next_token += 1
+            self._subscribers[token] = (callback, predicate)
+        return token
+
+    def unsubscribe(self, token: int):
+        with self._cond:
+            self._subscribers.pop(token, None)
+
+    def publish(self, event: WindowEvent):
+        with self._cond:
+            subscribers = list(self._subscribers.values())
+        for callback, predicate in subscribers:
+            try:
+                if predicate is None or predicate(event):
+                    callback(event)
+            except Exception:
+                pass
+        if self.relevant is None or self.relevant(event):
+            with self._cond:
+                self._generation += 1
+                self._cond.notify_all()
+
+    def wait_for_event(self, since: int, timeout: float) -> bool:
+        """Bloqueia até chegar evento relevante após a geração since, ou timeout."""
+        with self._cond:
+            return self.clock.wait(self._cond, lambda: self._generation != since, timeout)
+
+
+class Span:
+    """Passo cronometrado de uma linha.
+
+    sleep = sleeps fixos, wait = espera por condição/evento, act = o restante
+    (trabalho ativo de UI). outcome: 'ok', 'falha' (retornou sem concluir) ou 'erro'."""
+
+    __slots__ = ("step", "linha", "empresa", "start", "end", "sleep", "wait", "outcome", "depth")
+
+    def __init__(self, step: str, linha, empresa, depth: int, start: float):
+        self.step = step
+        self.linha = linha
+        self.empresa = empresa
+        self.depth = depth
+        self.start = start
+        self.end = None
+        self.sleep = 0.0
+        self.wait = 0.0
+        self.outcome = "falha"
+
+    def ok(self):
+        self.outcome = "ok"
+
+    @property
+    def duration(self) -> float:
+        return ((self.end or self.start) - self.start)
+
+    @property
+    def act(self) -> float:
+        return max(0.0, self.duration - self.sleep - self.wait)
+
+
+class SpanTracer:
+    """Rastreia os passos de cada linha em spans e grava um trace JSONL compacto
+    (append-only, uma linha por span) para a execução atual."""
+
+    def __init__(self, path: Optional[str] = None, clock: Optional["Clock"] = None,
+                 keep_durations: bool = False):
+        self.path = path
+        self.clock = clock or REAL_CLOCK
+        # Durações individuais por passo (percentis no benchmark)
+        self.durations: Optional[Dict[str, List[float]]] = {} if keep_durations else None
+        self._file = None
+        self._stack: List[Span] = []
+        self.linha = None
+        self.empresa = None
+        # step -> [quantidade, total, sleep, wait, falhas]
+        self.totais: Dict[str, List[float]] = {}
+
+    def set_row(self, linha, empresa):
+        self.linha = linha
+        self.empresa = empresa
+
+    @contextmanager
+    def span(self, step: str):
+        span = Span(step, self.linha, self.empresa, len(self._stack), self.clock.time())
+        self._stack.append(span)
         try:
-            result = [False]
-            def callback(hwnd, _):
-                if win32gui.IsWindowVisible(hwnd):
-                    try:
-                        if win32gui.GetClassName(hwnd) == "#32770":
-                            child = win32gui.FindWindowEx(hwnd, 0, "Static", "Salvar em:")
-                            if child:
-                                result[0] = True
-                                return False
-                    except Exception:
-                        pass
-                return True
-            win32gui.EnumWindows(callback, None)
-            return result[0]
+            yield span
         except Exception:
-            return False
+            span.outcome = "erro"
+            raise
+        finally:
+            span.end = self.clock.time()
+            if span in self._stack:
+                self._stack.remove(span)
+            self._record(span)
+
+    def add_sleep(self, seconds: float):
+        for span in self._stack:
+            span.sleep += seconds
+
+    def add_wait(self, seconds: float):
+        for span in self._stack:
+            span.wait += seconds
+
+    def _record(self, span: Span):
+        total = self.totais.setdefault(span.step, [0, 0.0, 0.0, 0.0, 0])
+        total[0] += 1
+        total[1] += span.duration
+        total[2] += span.sleep
+        total[3] += span.wait
+        if span.outcome != "ok":
+            total[4] += 1
+        if self.durations is not None:
+            self.durations.setdefault(span.step, []).append(span.duration)
+        if not self.path:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+            self._file.write(json.dumps({
+                "s": span.step, "l": span.linha, "e": span.empresa, "d": span.depth,
+                "t0": round(span.start, 3), "t1": round(span.end, 3), "o": span.outcome,
+                "sl": round(span.sleep, 3), "wt": round(span.wait, 3), "ac": round(span.act, 3),
+            }, ensure_ascii=False, separators=(',', ':')) + "\n")
+        except Exception:
+            pass
 
-    def _window_exists_partial(self, title_part: str, class_name: str) -> bool:
-        """Verifica se janela com título parcial/classe existe via win32gui (rápido)."""
+    def summary(self, top: int = 5) -> List[str]:
+        """Linhas de resumo com os passos que mais consumiram tempo."""
+        linhas = self.totais.get("linha")
+        passos = sorted(((step, t) for step, t in self.totais.items() if step != "linha"),
+                        key=lambda item: item[1][1], reverse=True)
+        resumo = []
+        if linhas and linhas[0]:
+            resumo.append(f"Tempo médio por linha: {linhas[1] / linhas[0]:.1f}s ({int(linhas[0])} linhas)")
+        for step, (qtd, total, sleep, wait, falhas) in passos[:top]:
+            act = max(0.0, total - sleep - wait)
+            resumo.append(
+                f"{step}: {total:.1f}s em {int(qtd)}x (média {total / qtd:.2f}s | "
+                f"sleep {sleep:.1f}s, espera {wait:.1f}s, ação {act:.1f}s, falhas {int(falhas)})"
+            )
+        return resumo
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+
+class RowJournal:
+    """Diário append-only (JSONL) do estado de cada linha, por planilha.
+
+    Chave da linha: (Nº, Periodo, Salvar Como). Cada mudança de estado
+    (iniciada/ok/falha) é gravada com fsync, então sobrevive a um crash do bot
+    ou do Domínio; a última entrada de cada chave vence na leitura."""
+
+    INICIADA = "iniciada"
+    OK = "ok"
+    FALHA = "falha"
+
+    def __init__(self, path: str, workbook_hash: str = ""):
+        self.path = path
+        self.workbook_hash = workbook_hash
+        # chave -> {"st", "l", "m", "t"} (última entrada)
+        self.estados: Dict[str, dict] = {}
+        self._file = None
+        self._truncated = False
+        self._load()
+
+    @classmethod
+    def for_workbook(cls, logs_dir: str, excel_path: str) -> "RowJournal":
+        workbook_hash = cls.hash_file(excel_path)
+        return cls(os.path.join(logs_dir, f"journal_{workbook_hash[:16]}.jsonl"), workbook_hash)
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for bloco in iter(lambda: f.read(1 << 20), b""):
+                digest.update(bloco)
+        return digest.hexdigest()
+
+    @staticmethod
+    def row_key(row) -> str:
+        numero = row.get('Nº', '')
         try:
-            result = [False]
-            def callback(hwnd, _):
-                if win32gui.IsWindowVisible(hwnd):
-                    try:
-                        if (title_part in win32gui.GetWindowText(hwnd) and
-                                win32gui.GetClassName(hwnd) == class_name):
-                            result[0] = True
-                            return False
-                    except Exception:
-                        pass
-                return True
-            win32gui.EnumWindows(callback, None)
-            return result[0]
+            numero = str(int(numero))
+        except (TypeError, ValueError):
+            numero = str(numero).strip()
+        return f"{numero}|{str(row.get('Periodo', '')).strip()}|{str(row.get('Salvar Como', '')).strip()}"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for linha in f:
+                self._truncated = not linha.endswith("\n")
+                try:
+                    entrada = json.loads(linha)
+                except ValueError:
+                    continue  # última linha truncada por um crash
+                self.estados[entrada["k"]] = entrada
+
+    def status(self, key: str) -> Optional[str]:
+        entrada = self.estados.get(key)
+        return entrada["st"] if entrada else None
+
+    def is_done(self, key: str) -> bool:
+        return self.status(key) == self.OK
+
+    def counts(self, keys: Iterable[str]) -> Dict[str, int]:
+        """Contagem ok/falha/pendente (iniciada sem desfecho conta como pendente)."""
+        contagem = {self.OK: 0, self.FALHA: 0, "pendente": 0}
+        for key in keys:
+            status = self.status(key)
+            contagem[status if status in (self.OK, self.FALHA) else "pendente"] += 1
+        return contagem
+
+    def record(self, key: str, status: str, linha: Optional[int] = None, motivo: str = ""):
+        entrada = {"k": key, "st": status, "l": linha, "m": motivo,
+                   "t": datetime.now().isoformat(timespec='seconds')}
+        self.estados[key] = entrada
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+                if self._truncated:
+                    self._file.write("\n")
+                    self._truncated = False
+            self._file.write(json.dumps(entrada, ensure_ascii=False, separators=(',', ':')) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
         except Exception:
+            pass
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+
+class OutputIndex:
+    """Índice em memória da pasta de PDFs (nome -> tamanho, mtime).
+
+    Montado com um único os.scandir antes do processamento, em vez de um
+    os.path.exists por linha na unidade de rede."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.arquivos: Dict[str, Tuple[int, float]] = {}
+
+    @staticmethod
+    def _key(nome: str) -> str:
+        nome = str(nome).strip()
+        if not nome.lower().endswith(".pdf"):
+            nome += ".pdf"
+        return nome.lower()  # sistema de arquivos do Windows não diferencia maiúsculas
+
+    def scan(self) -> int:
+        self.arquivos = {}
+        with os.scandir(self.folder) as entradas:
+            for entrada in entradas:
+                if entrada.is_file() and entrada.name.lower().endswith(".pdf"):
+                    info = entrada.stat()
+                    self.arquivos[entrada.name.lower()] = (info.st_size, info.st_mtime)
+        return len(self.arquivos)
+
+    def exists(self, nome: str) -> bool:
+        """PDF presente e não vazio."""
+        info = self.arquivos.get(self._key(nome))
+        return bool(info and info[0] > 0)
+
+    def add(self, nome: str):
+        """Registra um PDF gerado nesta execução (linhas repetidas na planilha)."""
+        self.arquivos[self._key(nome)] = (1, time.time())
+
+
+PERIODO_RE = re.compile(r"(\d{1,2})/(\d{4})")
+INTERVALO_RE = re.compile(r"\d\s*(?:-|–|—|\ba\b|até)\s*\d")
+MODELO_NOME_RE = re.compile(r"\{(periodo|mm|aaaa)\}", re.IGNORECASE)
+
+
+def expandir_periodo(valor) -> list:
+    """Lista de períodos de uma célula: '01/2025-12/2025', '01/2025 a 03/2025'
+    ou '01/2025; 04/2025'. Valor simples é devolvido como está."""
+    texto = str(valor).strip()
+    encontrados = PERIODO_RE.findall(texto)
+    if len(encontrados) == 2 and INTERVALO_RE.search(texto):
+        (mes_ini, ano_ini), (mes_fim, ano_fim) = encontrados
+        inicio = int(ano_ini) * 12 + int(mes_ini) - 1
+        fim = int(ano_fim) * 12 + int(mes_fim) - 1
+        if fim < inicio:
+            raise ValueError(f"Intervalo de períodos invertido: {texto}")
+        return [f"{i % 12 + 1:02d}/{i // 12}" for i in range(inicio, fim + 1)]
+    if len(encontrados) > 1:
+        return [f"{int(mes):02d}/{ano}" for mes, ano in encontrados]
+    return [valor]
+
+
+def nome_pdf_periodo(modelo: str, periodo, em_lote: bool) -> str:
+    """Nome do PDF para um período: preenche {periodo} (MMAAAA), {mm} e {aaaa};
+    sem marcadores, linhas expandidas recebem o sufixo -MMAAAA."""
+    encontrado = PERIODO_RE.search(str(periodo))
+    if not encontrado:
+        return modelo
+    mm, aaaa = f"{int(encontrado.group(1)):02d}", encontrado.group(2)
+    valores = {"periodo": mm + aaaa, "mm": mm, "aaaa": aaaa}
+    if MODELO_NOME_RE.search(modelo):
+        return MODELO_NOME_RE.sub(lambda m: valores[m.group(1).lower()], modelo)
+    if em_lote:
+        return f"{modelo}-{mm}{aaaa}"
+    return modelo
+
+
+def expandir_periodos(df: pd.DataFrame) -> pd.DataFrame:
+    """Uma linha por período (índice original repetido, para relatar a linha do Excel)."""
+    lotes = df['Periodo'].map(expandir_periodo)
+    tamanhos = lotes.map(len)
+    modelos = df['Salvar Como'].astype(str)
+    if not ((tamanhos > 1) | modelos.str.contains(r"\{(?:periodo|mm|aaaa)\}", case=False)).any():
+        return df
+    expandido = df.assign(Periodo=lotes, _lote=tamanhos).explode('Periodo')
+    expandido['Salvar Como'] = [
+        nome_pdf_periodo(str(modelo), periodo, lote > 1)
+        for modelo, periodo, lote in zip(expandido['Salvar Como'], expandido['Periodo'], expandido['_lote'])
+    ]
+    return expandido.drop(columns='_lote')
+
+
+def agendar_por_empresa(df: pd.DataFrame) -> pd.DataFrame:
+    """Ordena a fila por Nº (ordenação estável) mantendo o índice original,
+    para que linhas da mesma empresa rodem seguidas e dispensem o F8."""
+    numeros = pd.to_numeric(df['Nº'], errors='coerce')
+    # Posicional: o índice pode se repetir após expandir_periodos
+    return df.iloc[numeros.to_numpy().argsort(kind='stable')]
+
+
+# Caracteres e nomes que o Windows não aceita em nomes de arquivo
+NOME_PROIBIDO_RE = re.compile(r'[<>:"/\\|?*\x00-\x1f]|[. ]$|^(?:CON|PRN|AUX|NUL|COM\d|LPT\d)(?:\.|$)', re.IGNORECASE)
+
+
+def normalizar_planilha(df: pd.DataFrame) -> pd.DataFrame:
+    """Cópia com Nº, Periodo e Salvar Como no formato digitado pelo bot: Nº
+    inteiro em texto ('105.0' → '105'), Periodo em MM/AAAA (datas do Excel,
+    números MMAAAA e meses sem zero convertidos; intervalos e listas mantidos)
+    e Salvar Como sem espaços nas pontas. O que não dá para converter fica
+    como está, para validar_linhas apontar."""
+    df = df.copy()
+    if 'Nº' in df.columns:
+        numeros = pd.to_numeric(df['Nº'], errors='coerce')
+        inteiros = numeros.notna() & (numeros % 1 == 0)
+        texto = numeros.where(inteiros).astype('Int64').astype(str)
+        df['Nº'] = df['Nº'].astype(object).mask(inteiros, texto)
+    if 'Periodo' in df.columns:
+        periodo = df['Periodo']
+        texto = periodo.astype(object).where(periodo.notna(), "").astype(str).str.strip()
+        numeros = pd.to_numeric(periodo, errors='coerce')
+        mmaaaa = numeros.notna() & (numeros % 1 == 0) & numeros.between(10000, 129999)
+        if mmaaaa.any():
+            digitos = numeros[mmaaaa].astype('int64').astype(str).str.zfill(6)
+            texto = texto.mask(mmaaaa, digitos.str[:2] + "/" + digitos.str[2:])
+        datas = periodo.map(lambda valor: isinstance(valor, datetime))
+        if datas.any():
+            texto = texto.mask(datas, pd.to_datetime(periodo[datas]).dt.strftime("%m/%Y"))
+        texto = texto.str.replace(r"(?<!\d)(\d)/(\d{4})", r"0\1/\2", regex=True)
+        df['Periodo'] = texto
+    if 'Salvar Como' in df.columns:
+        df['Salvar Como'] = df['Salvar Como'].astype(object).where(df['Salvar Como'].notna(), "").astype(str).str.strip()
+    return df
+
+
+# Formatos de lista de trabalho aceitos (extensão -> descrição)
+FORMATOS_PLANILHA = {
+    ".xlsx": "Excel", ".xls": "Excel", ".xlsm": "Excel",
+    ".csv": "CSV", ".txt": "CSV",
+    ".parquet": "Parquet",
+    ".json": "JSON", ".jsonl": "JSON Lines",
+}
+
+# Cabeçalhos alternativos (sem acento, minúsculos, só letras/dígitos) -> coluna do bot
+COLUNAS_ALIASES = {
+    "n": "Nº", "no": "Nº", "numero": "Nº", "nempresa": "Nº", "codigo": "Nº",
+    "periodo": "Periodo", "competencia": "Periodo",
+    "salvarcomo": "Salvar Como", "arquivo": "Salvar Como", "nomearquivo": "Salvar Como", "nomepdf": "Salvar Como",
+}
+
+
+def mapear_colunas(df: pd.DataFrame) -> pd.DataFrame:
+    """Renomeia cabeçalhos equivalentes ('numero', 'salvar_como', 'Período'...)
+    para Nº, Periodo e Salvar Como; colunas já corretas ficam como estão."""
+    renomear = {}
+    for coluna in df.columns:
+        if coluna in ('Nº', 'Periodo', 'Salvar Como'):
+            continue
+        chave = unicodedata.normalize('NFKD', str(coluna)).encode('ascii', 'ignore').decode().lower()
+        destino = COLUNAS_ALIASES.get(re.sub(r'[^a-z0-9]', '', chave))
+        if destino and destino not in df.columns and destino not in renomear.values():
+            renomear[coluna] = destino
+    return df.rename(columns=renomear) if renomear else df
+
+
+def ler_tabela(path: str) -> pd.DataFrame:
+    """Lê a lista de trabalho conforme a extensão: Excel, CSV (separador ; ou ,),
+    Parquet, JSON (lista de objetos ou {"linhas": [...]}) ou JSON Lines.
+    Texto é lido como texto (Periodo '01/2025' não vira data nem número)."""
+    extensao = os.path.splitext(path)[1].lower()
+    if extensao in (".csv", ".txt"):
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            cabecalho = f.readline()
+        separador = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+        return pd.read_csv(path, sep=separador, dtype=str, encoding='utf-8-sig', skipinitialspace=True)
+    if extensao == ".parquet":
+        return pd.read_parquet(path)
+    if extensao == ".jsonl":
+        # Em blocos: não monta o documento inteiro em memória de uma vez
+        with pd.read_json(path, lines=True, dtype=False, chunksize=10000) as blocos:
+            return pd.concat(blocos, ignore_index=True)
+    if extensao == ".json":
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            dados = json.load(f)
+        if isinstance(dados, dict):
+            dados = dados.get("linhas", [])
+        return pd.DataFrame.from_records(dados)
+    return pd.read_excel(path)
+
+
+def ler_planilha(path: str) -> pd.DataFrame:
+    """Lê, mapeia colunas e normaliza a lista de trabalho (leitor padrão do
+    WorkbookCache da interface); todos os formatos passam pela mesma validação."""
+    return normalizar_planilha(mapear_colunas(ler_tabela(path)))
+
+
+def validar_linhas(df: pd.DataFrame) -> pd.Series:
+    """Veredito de cada linha da planilha normalizada ('' = válida, senão os
+    motivos), calculado por coluna: Nº, Periodo (mês válido, intervalo não
+    invertido), Salvar Como (vazio ou com caracteres proibidos no Windows) e
+    repetições de (Nº, Periodo) ou de nome do PDF depois de expandir os
+    períodos. A primeira ocorrência vale; as seguintes são marcadas."""
+    base = df.reset_index(drop=True)
+    posicoes = base.index
+    motivos = pd.Series("", index=posicoes)
+
+    def marcar(mascara, motivo):
+        nonlocal motivos
+        motivos = motivos.mask(mascara, motivos + motivo + "; ")
+
+    if 'Nº' in base.columns:
+        numeros = pd.to_numeric(base['Nº'], errors='coerce')
+        marcar(~(numeros.notna() & (numeros % 1 == 0)), "Nº inválido")
+
+    if 'Periodo' in base.columns:
+        texto = base['Periodo'].astype(str)
+        partes = texto.str.extractall(PERIODO_RE.pattern)
+        mes = pd.to_numeric(partes[0])
+        sequencia = pd.to_numeric(partes[1]) * 12 + mes - 1
+        por_linha = sequencia.groupby(level=0)
+        quantidade = por_linha.size().reindex(posicoes, fill_value=0)
+        meses_ok = mes.between(1, 12).groupby(level=0).all().reindex(posicoes, fill_value=False)
+        simples_ok = (quantidade != 1) | texto.str.fullmatch(r"\d{2}/\d{4}")
+        marcar(~(meses_ok & simples_ok), "Período inválido")
+        invertido = (texto.str.contains(INTERVALO_RE.pattern) & (quantidade == 2)
+                     & (por_linha.last().reindex(posicoes) < por_linha.first().reindex(posicoes)))
+        marcar(invertido & meses_ok, "Intervalo de períodos invertido")
+
+    if 'Salvar Como' in base.columns:
+        nome = base['Salvar Como'].astype(str)
+        marcar(nome == "", "Salvar Como vazio")
+        marcar(nome.str.contains(NOME_PROIBIDO_RE.pattern, flags=re.IGNORECASE),
+               "Salvar Como com caracteres não permitidos")
+
+    colunas = {'Nº', 'Periodo', 'Salvar Como'}
+    if colunas.issubset(base.columns):
+        expandido = expandir_periodos(base[motivos == ""][list(colunas)])
+        linhas_excel = pd.Series(df.index, index=posicoes) + 2
+        for chave, rotulo in (
+            (expandido['Nº'].astype(str) + "|" + expandido['Periodo'].astype(str), "(Nº, Periodo) repetido"),
+            (expandido['Salvar Como'].str.lower(), "nome do PDF repetido"),
+        ):
+            origem = pd.Series(expandido.index, index=expandido.index)
+            primeira = origem.groupby(chave.to_numpy()).transform('first')
+            repetida = chave.duplicated().to_numpy() & (primeira != origem).to_numpy()
+            if repetida.any():
+                primeira = primeira[repetida].groupby(level=0).first()
+                marcar(primeira.reindex(posicoes).notna(),
+                       f"{rotulo} da linha " + linhas_excel.reindex(primeira.reindex(posicoes)).fillna(0)
+                       .astype(int).astype(str).set_axis(posicoes))
+
+    return pd.Series(motivos.str.rstrip("; ").to_numpy(), index=df.index)
+
+
+def formatar_linhas(df: pd.DataFrame, inicio: int, fim: int, colunas: int = 6, largura: int = 15) -> List[str]:
+    """Linhas de texto do preview para as posições [inicio, fim), formatadas
+    coluna a coluna; a primeira coluna é o número da linha no Excel."""
+    janela = df.iloc[inicio:fim, :colunas]
+    texto = pd.Series(range(inicio + 2, inicio + 2 + len(janela))).astype(str).str.rjust(6)
+    for coluna in janela.columns:
+        celulas = janela[coluna].astype(object).where(janela[coluna].notna(), "").astype(str)
+        texto = texto.str.cat(celulas.str.slice(0, largura).str.center(largura).to_numpy(), sep=" | ")
+    return texto.tolist()
+
+
+class KeystrokeEngine:
+    """Envia teclas e aguarda uma sonda de prontidão antes da próxima tecla.
+
+    O timeout de cada envio é o antigo sleep fixo daquele passo: no pior caso o
+    ritmo é o mesmo de antes, e quando a sonda confirma antes o resto é economizado.
+    Sondas: janela esperada (acorda por evento), controle focado e, por padrão,
+    UI respondendo + foco mudou (TAB) + atraso mínimo por tecla do driver."""
+
+    # Tempo mínimo para a tecla chegar à fila do Domínio antes de sondar
+    SETTLE = 0.05
+    POLL = 0.03
+    # Uma tecla do formato do send_keys: modificadores + {NOME} ou caractere
+    TECLA_RE = re.compile(r"[+^%]*(\{[^}]+\}|.)")
+
+    def __init__(self, automation):
+        self.automation = automation
+        self.saved = 0.0
+        self.sent = 0
+        self.timeouts = 0
+
+    def send(self, keys: str, timeout: float, ready: Optional[Callable[[], bool]] = None,
+             event_driven: bool = False) -> bool:
+        """Envia keys e aguarda ready() (padrão: UI ociosa) por até timeout segundos.
+        Retorna False apenas se a execução foi interrompida."""
+        auto = self.automation
+        if auto.should_stop():
             return False
+        foco_antes = auto.driver.focused_handle() if ready is None and "{TAB}" in keys.upper() else 0
+        inicio = auto.clock.time()
+        # O tempo da própria chamada de envio fica como ação no span
+        auto.driver.send_keys(keys)
+        self.sent += 1
+        auto.invalidate_snapshot()
+        auto._sleep(min(self.SETTLE, timeout))
+        confirmed = auto.wait_for_condition(
+            ready or self._pronto(keys, inicio, foco_antes),
+            timeout=max(0.0, timeout - self.SETTLE),
+            poll_interval=self.POLL,
+            wake_on_events=event_driven
+        )
+        if auto.should_stop():
+            return False
+        if confirmed:
+            self.saved += max(0.0, timeout - (auto.clock.time() - inicio))
+        else:
+            self.timeouts += 1
+        return True
 
-    def _any_error_dialog_visible(self) -> bool:
-        """Verifica se há diálogo de erro visível via win32gui (rápido)."""
-        error_keywords = ("erro", "aviso", "atenção", "alerta", "warning", "error", "informação")
+    def _pronto(self, keys: str, inicio: float, foco_antes: int) -> Callable[[], bool]:
+        """Sonda padrão. A UI respondendo não prova que a tecla foi processada
+        (SendInput chega de forma assíncrona): TAB exige o foco em outro controle
+        e toda tecla cumpre o atraso mínimo do driver (0 quando input_idle é exato)."""
+        auto = self.automation
+        minimo = auto.driver.key_delay * len(self.TECLA_RE.findall(keys))
+
+        def pronto() -> bool:
+            if auto.clock.time() - inicio < minimo or not auto._input_idle():
+                return False
+            return not foco_antes or auto.driver.focused_handle() not in (0, foco_antes)
+        return pronto
+
+    def send_until_window(self, keys: str, title: str, class_name: str, timeout: float,
+                          partial: bool = False) -> bool:
+        """Envia keys e aguarda a janela esperada aparecer."""
+        auto = self.automation
+        if partial:
+            return self.send(keys, timeout, lambda: auto._window_exists_partial(title, class_name), event_driven=True)
+        return self.send(keys, timeout, lambda: auto._window_exists(title, class_name), event_driven=True)
+
+    def send_until_focus(self, keys: str, class_name: str, timeout: float) -> bool:
+        """Envia keys e aguarda o foco do Domínio estar em um controle da classe."""
+        return self.send(keys, timeout, lambda: self.automation.driver.focused_class() == class_name)
+
+    def send_sequence(self, keys: Iterable[str], timeout: float) -> bool:
+        """Envia cada tecla aguardando a UI ociosa entre elas."""
+        for key in keys:
+            if not self.send(key, timeout):
+                return False
+        return True
+
+
+class UIDriver:
+    """Acesso à UI do Domínio usado por DominioAutomation.
+
+    Win32UIDriver fala com o Domínio real (win32gui + pywinauto). O Domínio
+    simulado de DomBot_Sim.py implementa a mesma interface, com relógio virtual,
+    para medir o fluxo fora do Windows. Janelas são identificadas pelo hwnd."""
+
+    clock: Clock = REAL_CLOCK
+    # False: o vigia de diálogos trata os eventos inline em vez de usar thread
+    concurrent: bool = True
+    # Atraso mínimo por tecla antes de dar a tecla por processada (s); 0 quando
+    # input_idle() observa de fato o processamento da entrada
+    key_delay: float = 0.0
+
+    def find_main_window(self, log: Callable[[str], None]) -> Optional[int]:
+        raise NotImplementedError
+
+    def connect(self, handle: int):
+        """Associa o driver à janela principal (levanta exceção se falhar)."""
+        raise NotImplementedError
+
+    def is_connected(self) -> bool:
+        raise NotImplementedError
+
+    @property
+    def main_handle(self) -> Optional[int]:
+        raise NotImplementedError
+
+    def create_event_source(self) -> Optional[WindowEventSource]:
+        return None
+
+    def enumerate_windows(self) -> List[WindowInfo]:
+        raise NotImplementedError
+
+    def has_child(self, hwnd: int, class_name: str, title: str) -> bool:
+        raise NotImplementedError
+
+    def restore_main(self) -> bool:
+        """Restaura a janela principal se minimizada; retorna True se restaurou."""
+        raise NotImplementedError
+
+    def bring_to_front(self):
+        raise NotImplementedError
+
+    def is_foreground(self) -> bool:
+        raise NotImplementedError
+
+    def focus_main(self):
+        raise NotImplementedError
+
+    def send_keys(self, keys: str):
+        raise NotImplementedError
+
+    def focused_class(self) -> str:
+        return ""
+
+    def input_idle(self) -> bool:
+        return False
+
+    def focused_handle(self) -> int:
+        """hwnd do controle com foco no Domínio (0 se indisponível)."""
+        return 0
+
+    def find_window(self, title: str, class_name: str) -> Optional[int]:
+        """Janela da aplicação com título/classe, ou None."""
+        raise NotImplementedError
+
+    def find_window_with_control(self, class_name: str, auto_id: str, control_class: str) -> Optional[int]:
+        """Primeira janela da classe que contém o controle auto_id/classe, ou None."""
+        raise NotImplementedError
+
+    def window_visible(self, hwnd: int) -> bool:
+        raise NotImplementedError
+
+    def focus_window(self, hwnd: int):
+        raise NotImplementedError
+
+    def click_button(self, hwnd: int, auto_id: Optional[str] = None, title: Optional[str] = None) -> bool:
+        """Clica no botão da janela; retorna False se o botão não existe."""
+        raise NotImplementedError
+
+    def set_edit_text(self, hwnd: int, auto_id: str, text: str):
+        raise NotImplementedError
+
+    def dialog_text(self, hwnd: int) -> str:
+        """Título do diálogo seguido dos textos Static."""
+        raise NotImplementedError
+
+    def window_title(self, hwnd: int) -> str:
+        raise NotImplementedError
+
+    def post_dismiss(self, hwnd: int) -> bool:
+        """Fecha o diálogo sem usar o teclado (pode ser chamado de outra thread)."""
+        raise NotImplementedError
+
+    def owns_window(self, hwnd: int) -> bool:
+        """A janela pertence ao processo do Domínio (e não a outro programa)."""
+        return True
+
+    def lookup_stats(self) -> Dict[str, int]:
+        """Contadores de localização de janelas/controles (vazio se não houver)."""
+        return {}
+
+
+class LocatorCache:
+    """Localizadores resolvidos uma vez por sessão (chave -> hwnd e wrapper).
+
+    Cada acesso revalida a entrada com uma checagem barata (IsWindow); a busca
+    cara (árvore UIA) só roda de novo quando a janela/controle morreu."""
+
+    def __init__(self, is_valid: Callable[[tuple, int], bool]):
+        self.is_valid = is_valid
+        self._entries: Dict[tuple, Tuple[int, object]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get(self, key: tuple, resolve: Callable[[], Optional[object]]) -> Optional[object]:
+        """Wrapper em cache para key, ou resolve() (wrapper com .handle, ou None)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self.is_valid(key, entry[0]):
+                self.hits += 1
+                return entry[1]
+            self.stale += 1
+            del self._entries[key]
+        self.misses += 1
+        wrapper = resolve()
+        handle = getattr(wrapper, "handle", None) if wrapper is not None else None
+        if handle:
+            # Elementos sem hwnd não têm revalidação barata; não entram no cache
+            self._entries[key] = (handle, wrapper)
+        return wrapper
+
+    def invalidate(self, key: Optional[tuple] = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+class WindowHandle(NamedTuple):
+    """Janela localizada pelo caminho rápido (só o hwnd, sem wrapper UIA)."""
+    handle: int
+
+
+class Win32UIDriver(UIDriver):
+    """Driver do Domínio real: win32gui para consultas rápidas, pywinauto (UIA) para controles."""
+
+    # Classes nativas do Domínio: a resposta do Win32 (inclusive "não existe") é definitiva
+    WIN32_CLASSES = frozenset({"FNWND3190", "#32770", "Button", "Edit", "Static"})
+    # input_idle() só prova que a UI responde: ~o ritmo por tecla do próprio send_keys
+    key_delay = 0.05
+
+    def __init__(self):
+        timings.Timings.window_find_timeout = 20
+        self.app = None
+        self.main_window = None
+        self.process_id = 0
+        self.locators = LocatorCache(self._locator_valid)
+        # "tipo/backend" -> consultas atendidas (win32 = FindWindowEx/EnumChildWindows)
+        self.lookups: Dict[str, int] = {}
+
+    def _lookup(self, kind: str, class_name: str, fast: Callable[[], Optional[int]],
+                slow: Callable[[], Optional[object]], wrap: bool = False):
+        """Caminho rápido Win32 para classes nativas; UIA só para as demais
+        ou quando o Win32 falha. wrap=True devolve wrapper UIA (via handle)."""
+        if class_name in self.WIN32_CLASSES:
+            try:
+                hwnd = fast()
+            except Exception:
+                hwnd = None
+            else:
+                self.lookups[f"{kind}/win32"] = self.lookups.get(f"{kind}/win32", 0) + 1
+                if not hwnd:
+                    return None
+                if not wrap:
+                    return WindowHandle(hwnd)
+                return self._resolve(self.app.window(handle=hwnd))
+        self.lookups[f"{kind}/uia"] = self.lookups.get(f"{kind}/uia", 0) + 1
+        return self._resolve(slow())
+
+    def _locator_valid(self, key: tuple, hwnd: int) -> bool:
+        if not win32gui.IsWindow(hwnd):
+            return False
+        if key[0] == "janela":
+            return bool(win32gui.IsWindowVisible(hwnd))
+        if key[0] == "controle":
+            # Controle continua filho da mesma janela (hwnd não foi reciclado)
+            return bool(win32gui.IsChild(key[1], hwnd))
+        return True
+
+    @staticmethod
+    def _resolve(spec):
+        """wrapper_object() do spec, ou None se não existe.
+
+        exists() primeiro: wrapper_object() sozinho esperaria window_find_timeout."""
+        if spec is None:
+            return None
         try:
-            result = [False]
-            def callback(hwnd, _):
-                if win32gui.IsWindowVisible(hwnd):
-                    try:
-                        cls = win32gui.GetClassName(hwnd)
-                        if cls == "#32770":
-                            title = win32gui.GetWindowText(hwnd).lower()
-                            for kw in error_keywords:
-                                if kw in title:
-                                    result[0] = True
-                                    return False
-                    except Exception:
-                        pass
-                return True
-            win32gui.EnumWindows(callback, None)
-            return result[0]
+            return spec.wrapper_object() if spec.exists() else None
         except Exception:
-            return False
+            return None
 
-    def _is_connection_alive(self) -> bool:
+    def _control(self, hwnd: int, class_name: str, auto_id: Optional[str] = None, title: Optional[str] = None):
+        criteria = {"class_name": class_name}
+        if auto_id is not None:
+            criteria["auto_id"] = auto_id
+        if title is not None:
+            criteria["title"] = title
+        control_id = int(auto_id) if auto_id is not None and auto_id.isdigit() else None
+        native = class_name if auto_id is None or control_id is not None else ""
+        return self.locators.get(
+            ("controle", hwnd, class_name, auto_id, title),
+            lambda: self._lookup(
+                "controle", native,
+                lambda: find_descendant(hwnd, class_name, title=title, control_id=control_id),
+                lambda: self.app.window(handle=hwnd).child_window(**criteria),
+                wrap=True))
+
+    def find_main_window(self, log: Callable[[str], None]) -> Optional[int]:
+        # Procurar por qualquer janela que contenha "Domínio Folha" no título
+        log("🔍 Procurando janela do Domínio Folha...")
+
+        # Listar todas as janelas abertas para debug
+        try:
+            all_windows = findwindows.find_windows()
+            log(f"📋 Total de janelas abertas: {len(all_windows)}")
+
+            # Tentar encontrar janelas com "Domínio" no título
+            for hwnd in all_windows:
+                try:
+                    title = win32gui.GetWindowText(hwnd)
+                    if "Domínio" in title and title:
+                        log(f"🪟 Janela encontrada: '{title}'")
+                        if "Folha" in title:
+                            log(f"✅ Janela do Domínio Folha localizada!")
+                            return hwnd
+                except Exception:
+                    continue
+        except Exception as e:
+            log(f"⚠️ Erro ao listar janelas: {str(e)}")
+
+        # Fallback: tentar o método original com regex
+        windows = findwindows.find_windows(title_re=".*Domínio Folha.*")
+        if windows:
+            log(f"✅ Janela do Domínio encontrada via regex (total: {len(windows)})")
+            return windows[0]
+        return None
+
+    def connect(self, handle: int):
+        self.app = Application(backend="uia").connect(handle=handle)
+        self.main_window = self.app.window(handle=handle)
+        self.process_id = win32process.GetWindowThreadProcessId(handle)[1]
+        self.locators.invalidate()
+
+    def is_connected(self) -> bool:
         """Verifica se a conexão pywinauto ainda é válida."""
         if self.app is None or self.main_window is None:
             return False
@@ -965,42 +2689,585 @@ class DominioAutomation:
         except Exception:
             return False
 
-    def find_dominio_window(self) -> Optional[int]:
-        """Encontra a janela do Domínio Folha"""
+    @property
+    def main_handle(self) -> Optional[int]:
+        return self.main_window.handle if self.main_window is not None else None
+
+    def create_event_source(self) -> Optional[WindowEventSource]:
         try:
-            # Procurar por qualquer janela que contenha "Domínio Folha" no título
-            self.log("🔍 Procurando janela do Domínio Folha...")
+            _, process_id = win32process.GetWindowThreadProcessId(self.main_handle)
+        except Exception:
+            process_id = 0
+        return WinEventHookSource(process_id)
 
-            # Listar todas as janelas abertas para debug
-            try:
-                all_windows = findwindows.find_windows()
-                self.log(f"📋 Total de janelas abertas: {len(all_windows)}")
+    def enumerate_windows(self) -> List[WindowInfo]:
+        return enumerate_top_windows()
 
-                # Tentar encontrar janelas com "Domínio" no título
-                for hwnd in all_windows:
-                    try:
-                        title = win32gui.GetWindowText(hwnd)
-                        if "Domínio" in title and title:
-                            self.log(f"🪟 Janela encontrada: '{title}'")
-                            if "Folha" in title:
-                                self.log(f"✅ Janela do Domínio Folha localizada!")
-                                return hwnd
-                    except Exception:
-                        continue
-            except Exception as e:
-                self.log(f"⚠️ Erro ao listar janelas: {str(e)}")
+    def has_child(self, hwnd: int, class_name: str, title: str) -> bool:
+        return find_child_window(hwnd, class_name, title)
 
-            # Fallback: tentar o método original com regex
-            windows = findwindows.find_windows(title_re=".*Domínio Folha.*")
-            if windows:
-                self.log(f"✅ Janela do Domínio encontrada via regex (total: {len(windows)})")
-                return windows[0]
+    def restore_main(self) -> bool:
+        handle = self.main_handle
+        if win32gui.IsIconic(handle):
+            win32gui.ShowWindow(handle, win32con.SW_RESTORE)
+            return True
+        return False
+
+    def bring_to_front(self):
+        win32gui.SetForegroundWindow(self.main_handle)
 
-            self.log("❌ Nenhuma janela do Domínio Folha encontrada")
+    def is_foreground(self) -> bool:
+        try:
+            return win32gui.GetForegroundWindow() == self.main_handle
+        except Exception:
+            return False
+
+    def focus_main(self):
+        self.main_window.set_focus()
+
+    def send_keys(self, keys: str):
+        send_keys(keys)
+
+    def focused_class(self) -> str:
+        """Classe do controle com foco na thread de UI do Domínio ('' se indisponível)."""
+        try:
+            hwnd = self.focused_handle()
+            return win32gui.GetClassName(hwnd) if hwnd else ""
+        except Exception:
+            return ""
+
+    def focused_handle(self) -> int:
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class GUITHREADINFO(ctypes.Structure):
+                _fields_ = [("cbSize", wintypes.DWORD), ("flags", wintypes.DWORD),
+                            ("hwndActive", wintypes.HWND), ("hwndFocus", wintypes.HWND),
+                            ("hwndCapture", wintypes.HWND), ("hwndMenuOwner", wintypes.HWND),
+                            ("hwndMoveSize", wintypes.HWND), ("hwndCaret", wintypes.HWND),
+                            ("rcCaret", wintypes.RECT)]
+
+            thread_id, _ = win32process.GetWindowThreadProcessId(self.main_handle)
+            info = GUITHREADINFO(cbSize=ctypes.sizeof(GUITHREADINFO))
+            if not ctypes.windll.user32.GetGUIThreadInfo(thread_id, ctypes.byref(info)):
+                return 0
+            return info.hwndFocus or 0
+        except Exception:
+            return 0
+
+    def input_idle(self) -> bool:
+        """A thread de UI do Domínio responde (não está travada processando algo).
+
+        WM_NULL via SendMessageTimeout volta assim que a thread bombeia mensagens:
+        mensagens enviadas são despachadas antes da entrada enfileirada, e teclas do
+        SendInput chegam de forma assíncrona, então isto não prova que a tecla já
+        foi processada; o KeystrokeEngine soma key_delay por tecla e a mudança de foco.
+        (WaitForInputIdle não serve aqui: só espera uma vez por processo.)"""
+        try:
+            win32gui.SendMessageTimeout(self.main_handle, win32con.WM_NULL, 0, 0, win32con.SMTO_ABORTIFHUNG, 100)
+            return True
+        except Exception:
+            return False
+
+    def find_window(self, title: str, class_name: str) -> Optional[int]:
+        def fast():
+            # Janelas do Domínio são de nível superior (owned) ou filhas MDI da principal
+            top = find_top_windows(class_name, title, self.process_id)
+            return top[0] if top else find_descendant(self.main_handle, class_name, title=title)
+
+        window = self.locators.get(
+            ("janela", title, class_name),
+            lambda: self._lookup("janela", class_name, fast,
+                                 lambda: self.main_window.child_window(title=title, class_name=class_name)))
+        return window.handle if window is not None else None
+
+    def find_window_with_control(self, class_name: str, auto_id: str, control_class: str) -> Optional[int]:
+        def fast():
+            for hwnd in find_top_windows(class_name, process_id=self.process_id):
+                if find_descendant(hwnd, control_class, control_id=int(auto_id)):
+                    return hwnd
+            return None
+
+        def slow():
+            window = self.main_window.child_window(class_name=class_name, found_index=0)
+            if window.child_window(auto_id=auto_id, class_name=control_class).exists():
+                return window
             return None
+
+        native = class_name if control_class in self.WIN32_CLASSES and auto_id.isdigit() else ""
+        window = self.locators.get(("janela_com_controle", class_name, auto_id, control_class),
+                                   lambda: self._lookup("janela", native, fast, slow))
+        return window.handle if window is not None else None
+
+    def window_visible(self, hwnd: int) -> bool:
+        return bool(win32gui.IsWindow(hwnd) and win32gui.IsWindowVisible(hwnd))
+
+    def focus_window(self, hwnd: int):
+        try:
+            self.app.window(handle=hwnd).set_focus()
+        except Exception:
+            win32gui.SetForegroundWindow(hwnd)
+
+    def click_button(self, hwnd: int, auto_id: Optional[str] = None, title: Optional[str] = None) -> bool:
+        button = self._control(hwnd, "Button", auto_id=auto_id, title=title)
+        if button is None:
+            return False
+        button.click_input()
+        return True
+
+    def set_edit_text(self, hwnd: int, auto_id: str, text: str):
+        edit = self._control(hwnd, "Edit", auto_id=auto_id)
+        if edit is None:
+            raise RuntimeError(f"Campo Edit {auto_id} não encontrado")
+        edit.set_text(text)
+
+    def dialog_text(self, hwnd: int) -> str:
+        # Win32 (também usado pela thread do vigia, onde UIA/COM não está inicializado)
+        textos = []
+
+        def callback(child, _):
+            if win32gui.GetClassName(child) == "Static":
+                texto = win32gui.GetWindowText(child)
+                if texto:
+                    textos.append(texto)
+            return True
+
+        message = win32gui.GetWindowText(hwnd)
+        try:
+            win32gui.EnumChildWindows(hwnd, callback, None)
+        except Exception:
+            pass
+        return " ".join([message] + textos)
+
+    def window_title(self, hwnd: int) -> str:
+        return win32gui.GetWindowText(hwnd)
+
+    def owns_window(self, hwnd: int) -> bool:
+        try:
+            return bool(self.process_id) and win32process.GetWindowThreadProcessId(hwnd)[1] == self.process_id
+        except Exception:
+            return False
+
+    def post_dismiss(self, hwnd: int) -> bool:
+        """Clique em OK via WM_COMMAND/BN_CLICKED (ou WM_CLOSE) postado ao diálogo."""
+        try:
+            button = find_descendant(hwnd, "Button", title="OK") or find_descendant(hwnd, "Button",
+                                                                                  control_id=win32con.IDOK)
+            if button:
+                control_id = win32gui.GetDlgCtrlID(button)
+                win32gui.PostMessage(hwnd, win32con.WM_COMMAND, (win32con.BN_CLICKED << 16) | control_id, button)
+            else:
+                win32gui.PostMessage(hwnd, win32con.WM_CLOSE, 0, 0)
+            return True
+        except Exception:
+            return False
+
+    def lookup_stats(self) -> Dict[str, int]:
+        stats = {"cache": self.locators.hits, "revalidadas": self.locators.stale}
+        stats.update(sorted(self.lookups.items()))
+        return stats
+
+
+def dialogo_tem_texto(title: str, message: str) -> bool:
+    """dialog_text já trouxe os Static (e não só o título)? Logo após a criação
+    do #32770 eles ainda podem não existir."""
+    message = (message or "").strip()
+    return bool(message) and message != (title or "").strip()
+
+
+class DialogWatcher:
+    """Vigia de diálogos em paralelo ao fluxo principal.
+
+    Cada #32770 de erro/aviso do processo do Domínio é classificado pelas regras
+    assim que aparece com texto: regras marcadas "fundo" (lista de diálogos
+    sabidamente benignos) fecham o diálogo na hora (PostMessage, sem disputar
+    o teclado com o fluxo); abortar/escalar viram um evento que encerra a
+    espera em andamento. Sem threads (simulador), o tratamento é feito no
+    próprio evento."""
+
+    # Varredura periódica para quando os eventos de janela não estão ativos (s)
+    SWEEP_INTERVAL = 0.5
+    # Prazo para um diálogo fechado em segundo plano sumir; depois volta ao fluxo principal (s)
+    GRACE = 2.0
+
+    def __init__(self, automation: "DominioAutomation", threaded: bool = True):
+        self.auto = automation
+        self.threaded = threaded
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._token: Optional[int] = None
+        # hwnd -> instante em que o vigia mandou fechar o diálogo
+        self.handled: Dict[int, float] = {}
+        # Fechados em segundo plano que não sumiram no prazo: ficam com o fluxo principal
+        self.desistidos: Set[int] = set()
+        # Diálogo de aborto pendente para o fluxo principal: (hwnd, título, regra)
+        self.abort: Optional[Tuple[int, str, DialogRule]] = None
+        self.dispensados = 0
+        self.abortos = 0
+
+    def start(self):
+        if self._token is not None:
+            return
+        self._token = self.auto.event_bus.subscribe(
+            self._on_event, lambda event: event.kind == "destroy" or event.class_name == "#32770")
+        if self.threaded:
+            self._thread = threading.Thread(target=self._run, name="DialogWatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._token is not None:
+            self.auto.event_bus.unsubscribe(self._token)
+            self._token = None
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _on_event(self, event: WindowEvent):
+        if event.kind == "destroy":
+            self.handled.pop(event.hwnd, None)
+            self.desistidos.discard(event.hwnd)
+        elif event.kind in ("create", "show", "name"):
+            if self.threaded:
+                self._queue.put(event.hwnd)
+            else:
+                self.inspect(event.hwnd)
+
+    def _run(self):
+        while True:
+            try:
+                hwnd = self._queue.get(timeout=self.SWEEP_INTERVAL)
+            except queue.Empty:
+                self.sweep()
+                continue
+            if hwnd is None:
+                return
+            self.inspect(hwnd)
+
+    def sweep(self):
+        self.prune()
+        try:
+            for window in self.auto.window_source():
+                if window.class_name == "#32770":
+                    self.inspect(window.hwnd, window.title)
+        except Exception:
+            pass
+
+    def prune(self):
+        """Esquece diálogos que já sumiram e devolve ao fluxo principal os que
+        continuam visíveis depois de GRACE (o PostMessage não os fechou)."""
+        agora = self.auto.clock.time()
+        for hwnd in list(self.handled) + list(self.desistidos):
+            try:
+                visivel = self.auto.driver.window_visible(hwnd)
+            except Exception:
+                visivel = False
+            if not visivel:
+                self.handled.pop(hwnd, None)
+                self.desistidos.discard(hwnd)
+                continue
+            inicio = self.handled.get(hwnd)
+            if inicio is not None and agora - inicio > self.GRACE:
+                self.handled.pop(hwnd, None)
+                self.desistidos.add(hwnd)
+                self.auto.log(f"⚠️ Diálogo {hwnd} não fechou em segundo plano, fica para o fluxo principal")
+
+    def em_tratamento(self) -> Set[int]:
+        """hwnds que o fluxo principal deve ignorar (o vigia ainda está fechando)."""
+        self.prune()
+        return set(self.handled)
+
+    def inspect(self, hwnd: int, title: Optional[str] = None):
+        """Classifica o diálogo e o fecha (benigno) ou sinaliza aborto ao fluxo."""
+        if hwnd in self.handled or hwnd in self.desistidos or (self.abort and self.abort[0] == hwnd):
+            return
+        driver = self.auto.driver
+        try:
+            if not driver.owns_window(hwnd):
+                return
+            title = title if title is not None else driver.window_title(hwnd)
+            if not title or not any(kw in normalize_title(title) for kw in ERROR_DIALOG_KEYWORDS):
+                return
+            message = driver.dialog_text(hwnd)
+        except Exception:
+            return
+        # Sem texto ainda: fica para o próximo evento/varredura (nada vai para handled)
+        if not dialogo_tem_texto(title, message):
+            return
+        rules = self.auto.dialog_rules
+        rule = rules.classify(title, message)
+        if rule.fundo:
+            inicio = self.auto.clock.time()
+            self.handled[hwnd] = inicio
+            if driver.post_dismiss(hwnd):
+                self.dispensados += 1
+                rules.record(rule, self.auto.clock.time() - inicio)
+                self.auto.log(f"🛡️ Diálogo '{title}' fechado em segundo plano (regra '{rule.nome}')")
+        elif rule.acao in (DialogRules.ABORTAR, DialogRules.ESCALAR) and self.abort is None:
+            self.abort = (hwnd, title, rule)
+            self.abortos += 1
+            self.auto.log(f"🛑 Diálogo '{title}' (regra '{rule.nome}'): interrompendo espera atual")
+            # Evento relevante acorda quem está esperando no barramento
+            self.auto.event_bus.publish(WindowEvent("abort", hwnd, title, "#32770", self.auto.clock.time()))
+
+    def pending_abort(self) -> bool:
+        """Há diálogo de aborto ainda aberto aguardando o fluxo principal."""
+        if self.abort is None:
+            return False
+        try:
+            if self.auto.driver.window_visible(self.abort[0]):
+                return True
+        except Exception:
+            pass
+        self.abort = None
+        return False
+
+
+class UIState:
+    """Estados do fluxo de uma linha, na ordem em que são alcançados."""
+    IDLE = "IDLE"
+    COMPANY_SELECTED = "COMPANY_SELECTED"
+    REPORT_MANAGER_OPEN = "REPORT_MANAGER_OPEN"
+    PARAMS_FILLED = "PARAMS_FILLED"
+    REPORT_RENDERED = "REPORT_RENDERED"
+    SAVE_DIALOG_OPEN = "SAVE_DIALOG_OPEN"
+    SAVED = "SAVED"
+    ORDEM = (IDLE, COMPANY_SELECTED, REPORT_MANAGER_OPEN, PARAMS_FILLED,
+             REPORT_RENDERED, SAVE_DIALOG_OPEN, SAVED)
+
+    @classmethod
+    def proximo(cls, estado: str) -> str:
+        return cls.ORDEM[cls.ORDEM.index(estado) + 1]
+
+
+class RowStateMachine:
+    """Percorre os estados de uma linha executando a transição de cada um e
+    cronometra as transições por estado de destino."""
+
+    # Retomadas por linha após falhas recuperáveis
+    MAX_RETOMADAS = 2
+
+    def __init__(self, clock: Optional["Clock"] = None):
+        self.clock = clock or REAL_CLOCK
+        self.estado = UIState.IDLE
+        # estado -> [transições, tempo total, falhas]
+        self.tempos: Dict[str, List[float]] = {}
+        # estado de retomada -> quantidade
+        self.retomadas: Dict[str, int] = {}
+
+    def run(self, transicoes: Dict[str, Callable[[], bool]], inicio: str = UIState.IDLE) -> bool:
+        """Avança de inicio até SAVED; para no primeiro passo que falhar
+        (self.estado fica no último estado alcançado)."""
+        self.estado = inicio
+        while self.estado != UIState.SAVED:
+            destino = UIState.proximo(self.estado)
+            t0 = self.clock.time()
+            ok = transicoes[destino]()
+            tempo = self.tempos.setdefault(destino, [0, 0.0, 0])
+            tempo[0] += 1
+            tempo[1] += self.clock.time() - t0
+            if not ok:
+                tempo[2] += 1
+                return False
+            self.estado = destino
+        return True
+
+    def retomada(self, estado: str):
+        self.retomadas[estado] = self.retomadas.get(estado, 0) + 1
+
+    def summary(self) -> List[str]:
+        """Linhas de resumo com o tempo médio de cada transição e as retomadas."""
+        resumo = []
+        for estado in UIState.ORDEM:
+            if estado in self.tempos:
+                qtd, total, falhas = self.tempos[estado]
+                resumo.append(f"→ {estado}: média {total / qtd:.2f}s em {int(qtd)}x, falhas {int(falhas)}")
+        if self.retomadas:
+            resumo.append("Retomadas: " + ", ".join(f"{estado} {qtd}" for estado, qtd in self.retomadas.items()))
+        return resumo
+
+
+class DominioAutomation:
+    # Idade máxima (s) de uma foto de janelas antes de nova enumeração
+    SNAPSHOT_TTL = 0.05
+    # Com eventos ativos, o polling vira rede de segurança com este intervalo (s)
+    EVENT_FALLBACK_POLL = 1.0
+
+    def __init__(self, logger, gui,
+                 window_source: Optional[Callable[[], Iterable[WindowInfo]]] = None,
+                 child_finder: Optional[Callable[[int, str, str], bool]] = None,
+                 event_source: Optional[WindowEventSource] = None,
+                 tracer: Optional[SpanTracer] = None,
+                 driver: Optional[UIDriver] = None,
+                 persistent_session: bool = False):
+        self.logger = logger
+        self.gui = gui
+        # Backend de UI plugável: Domínio real por padrão, simulado em DomBot_Sim.py
+        self.driver = driver or Win32UIDriver()
+        self.clock = self.driver.clock
+        # Fonte de janelas injetável (lista falsa em testes)
+        self.window_source = window_source or self.driver.enumerate_windows
+        self.child_finder = child_finder or self.driver.has_child
+        self._snapshot: Optional[WindowSnapshot] = None
+        # Eventos de janela acordam as esperas; qualquer evento invalida a foto
+        self.event_bus = WindowEventBus(event_source, clock=self.clock)
+        self.event_bus.subscribe(lambda _event: self.invalidate_snapshot())
+        # Teclado com espera verificada (substitui sleeps fixos entre teclas)
+        self.keys = KeystrokeEngine(self)
+        # Spans por passo (sleep/espera/ação); sem caminho, só acumula totais
+        self.tracer = tracer or SpanTracer()
+        self.tracer.clock = self.clock
+        # Classificação de diálogos (regras_dialogos.json, compiladas uma vez)
+        self.dialog_rules = DialogRules.load(log=self.log)
+        # Vigia que fecha diálogos benignos e sinaliza os de aborto durante as esperas
+        self.dialog_watcher = DialogWatcher(self, threaded=self.driver.concurrent)
+        # Empresa carregada no Domínio (None = desconhecida, força F8)
+        self.empresa_ativa: Optional[str] = None
+        # Sessão persistente: Gerenciador de Relatórios fica aberto entre linhas
+        self.persistent_session = persistent_session
+        self.sessao_gerenciador: Optional[int] = None
+        self._gerenciador_atual: Optional[int] = None
+        self._manter_sessao = False
+        self._sessao_reutilizada = False
+        # Fluxo da linha como máquina de estados (retomada após falha recuperável)
+        self.estados = RowStateMachine(self.clock)
+        # Diálogo com regra abortar/escalar: a linha não é retomada
+        self._abortar_linha = False
+
+    def log(self, message):
+        self.logger.info(message)
+
+    def should_stop(self) -> bool:
+        """Verifica se deve parar a execução"""
+        return not self.gui.executando
+
+    def check_pause(self):
+        """Verifica e aguarda se pausado"""
+        while self.gui.pausa_solicitada and self.gui.executando:
+            self.clock.sleep(0.5)
+            self.tracer.add_wait(0.5)
+
+    def _sleep(self, seconds: float):
+        """Sleep fixo contabilizado no span atual."""
+        self.clock.sleep(seconds)
+        self.tracer.add_sleep(seconds)
+
+    def smart_sleep(self, seconds: float):
+        """Sleep interruptível que verifica pausa/parada"""
+        interval = 0.15
+        elapsed = 0.0
+        while elapsed < seconds:
+            if self.should_stop():
+                return False
+            self.check_pause()
+            if self.should_stop():
+                return False
+            sleep_time = min(interval, seconds - elapsed)
+            self._sleep(sleep_time)
+            elapsed += sleep_time
+        return True
+
+    def _wait_tick(self, poll_interval: float, since: int, remaining: Optional[float] = None,
+                   wake_on_events: bool = True):
+        """Aguarda o próximo tick: acorda no primeiro evento de janela relevante
+        após a geração since; sem eventos ativos, dorme poll_interval."""
+        use_events = wake_on_events and self.event_bus.active
+        wait = max(poll_interval, self.EVENT_FALLBACK_POLL) if use_events else poll_interval
+        if remaining is not None:
+            wait = max(0.0, min(wait, remaining))
+        inicio = self.clock.time()
+        if use_events:
+            self.event_bus.wait_for_event(since, wait)
+        else:
+            self.clock.sleep(wait)
+        self.tracer.add_wait(self.clock.time() - inicio)
+
+    def wait_for_condition(self, condition_fn, timeout: float = 30, poll_interval: float = 0.15, description: str = "",
+                           wake_on_events: bool = True) -> bool:
+        """Avalia condition_fn() a cada evento de janela (ou poll) até retornar True, ou timeout.
+        Condições que não dependem de janelas (foco, UI ociosa) usam wake_on_events=False.
+        Retorna True se condição foi atendida, False se timeout ou stop."""
+        start = self.clock.time()
+        while self.clock.time() - start < timeout:
+            if self.should_stop():
+                return False
+            self.check_pause()
+            generation = self.event_bus.generation
+            self.invalidate_snapshot()
+            try:
+                if condition_fn():
+                    if description:
+                        self.log(f"{description} - concluido em {self.clock.time() - start:.1f}s")
+                    return True
+            except Exception:
+                pass
+            if self.dialog_watcher.pending_abort():
+                self.log(f"⚠️ Espera interrompida: diálogo '{self.dialog_watcher.abort[1]}' aberto")
+                return False
+            self._wait_tick(poll_interval, generation, timeout - (self.clock.time() - start), wake_on_events)
+        if description:
+            self.log(f"{description} - timeout apos {timeout}s")
+        return False
+
+    def snapshot(self, refresh: bool = False) -> WindowSnapshot:
+        """Foto atual das janelas; reaproveitada dentro do mesmo tick de polling."""
+        snap = self._snapshot
+        now = self.clock.time()
+        if refresh or snap is None or now - snap.taken_at > self.SNAPSHOT_TTL:
+            try:
+                windows = self.window_source()
+            except Exception:
+                windows = []
+            snap = WindowSnapshot(windows, self.child_finder, taken_at=now)
+            self._snapshot = snap
+        return snap
+
+    def invalidate_snapshot(self):
+        """Descarta a foto atual; a próxima consulta faz nova enumeração."""
+        self._snapshot = None
+
+    def _window_exists(self, title: str, class_name: str) -> bool:
+        """Verifica se janela com título/classe existe (consulta a foto de janelas)."""
+        return self.snapshot().find(title, class_name) is not None
+
+    def _save_dialog_exists(self) -> bool:
+        """Verifica se a janela de salvamento existe procurando pelo elemento 'Salvar em:' (AutomationId 1091)."""
+        return self.snapshot().find_with_child("#32770", "Static", "Salvar em:") is not None
+
+    def _window_exists_partial(self, title_part: str, class_name: str) -> bool:
+        """Verifica se janela com título parcial/classe existe (consulta a foto de janelas)."""
+        return self.snapshot().find_partial(title_part, class_name) is not None
+
+    def _any_error_dialog_visible(self) -> bool:
+        """Verifica se há diálogo de erro visível que o vigia não está fechando (consulta a foto de janelas)."""
+        return self.snapshot().find_error_dialog(exclude=self.dialog_watcher.em_tratamento()) is not None
+
+    def _menu_open(self) -> bool:
+        """Há menu suspenso (#32768) visível."""
+        return bool(self.snapshot().of_class("#32768"))
+
+    def _is_foreground(self) -> bool:
+        """A janela principal do Domínio está em primeiro plano."""
+        return self.driver.is_foreground()
+
+    def _input_idle(self) -> bool:
+        """A UI do Domínio processou a entrada pendente."""
+        return self.driver.input_idle()
+
+    def _is_connection_alive(self) -> bool:
+        """Verifica se a conexão com o Domínio ainda é válida."""
+        return self.driver.is_connected()
+
+    def find_dominio_window(self) -> Optional[int]:
+        """Encontra a janela do Domínio Folha"""
+        try:
+            handle = self.driver.find_main_window(self.log)
+            if not handle:
+                self.log("❌ Nenhuma janela do Domínio Folha encontrada")
+            return handle
         except Exception as e:
             self.log(f"❌ Erro ao procurar janela do Domínio: {str(e)}")
-            import traceback
             self.log(f"Traceback: {traceback.format_exc()}")
             return None
 
@@ -1011,34 +3278,56 @@ class DominioAutomation:
             if not handle:
                 return False
 
-            # Restaura e foca a janela
-            if win32gui.IsIconic(handle):
-                win32gui.ShowWindow(handle, win32con.SW_RESTORE)
-                time.sleep(1)
+            self.driver.connect(handle)
 
-            win32gui.SetForegroundWindow(handle)
-            time.sleep(0.5)
+            # Restaura e foca a janela
+            if self.driver.restore_main():
+                self._sleep(1)
 
-            self.app = Application(backend="uia").connect(handle=handle)
-            self.main_window = self.app.window(handle=handle)
+            self.driver.bring_to_front()
+            self._sleep(0.5)
 
             self.log("✅ Conectado ao Domínio Folha com sucesso")
+            self.start_event_bus()
             return True
 
         except Exception as e:
             self.log(f"❌ Erro ao conectar ao Domínio: {str(e)}")
             return False
 
-    def wait_for_window_close(self, window, window_title: str, timeout: int = 30) -> bool:
+    def start_event_bus(self, restart: bool = False):
+        """Ativa os eventos de janela do processo do Domínio (polling continua como fallback)."""
+        if restart:
+            self.event_bus.stop()
+            # Após reconexão o Domínio pode ter outro processo: recriar o hook
+            if isinstance(self.event_bus.source, WinEventHookSource):
+                self.event_bus.source = None
+        if self.event_bus.active:
+            return
+        if self.event_bus.source is None:
+            self.event_bus.source = self.driver.create_event_source()
+        if self.event_bus.start():
+            self.log("📡 Monitor de eventos de janela ativo")
+        else:
+            self.log("⚠️ Monitor de eventos indisponível, usando polling")
+        self.dialog_watcher.start()
+
+    def close(self):
+        """Libera recursos da sessão (vigia de diálogos e hooks de eventos de janela)."""
+        self.dialog_watcher.stop()
+        self.event_bus.stop()
+
+    def wait_for_window_close(self, hwnd: int, window_title: str, timeout: int = 30) -> bool:
         """Espera até que uma janela seja fechada"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+        start_time = self.clock.time()
+        while self.clock.time() - start_time < timeout:
             if self.should_stop():
                 return False
             self.check_pause()
+            generation = self.event_bus.generation
 
             try:
-                if not window.exists() or not window.is_visible():
+                if not self.driver.window_visible(hwnd):
                     self.log(f"✅ Janela '{window_title}' fechada")
                     return True
             except Exception:
@@ -1047,7 +3336,7 @@ class DominioAutomation:
             # Verificar se há diálogos de erro bloqueando
             self.handle_error_dialogs()
 
-            time.sleep(0.15)
+            self._wait_tick(0.15, generation, timeout - (self.clock.time() - start_time))
 
         self.log(f"⚠️ Timeout aguardando fechamento da janela '{window_title}'")
         return False
@@ -1060,8 +3349,7 @@ class DominioAutomation:
 
             # Enviar F8 para troca de empresas
             self.log("📞 Solicitando troca de empresa (F8)")
-            send_keys('{F8}')
-            if not self.smart_sleep(2):
+            if not self.keys.send_until_window('{F8}', "Troca de empresas", "FNWND3190", timeout=2):
                 return False
 
             # Aguardar janela de troca
@@ -1074,12 +3362,9 @@ class DominioAutomation:
                 self.check_pause()
 
                 try:
-                    troca_window = self.main_window.child_window(
-                        title="Troca de empresas",
-                        class_name="FNWND3190"
-                    )
+                    troca_window = self.driver.find_window("Troca de empresas", "FNWND3190")
 
-                    if troca_window.exists():
+                    if troca_window:
                         break
 
                     # Verificar se há diálogos de erro bloqueando
@@ -1103,11 +3388,10 @@ class DominioAutomation:
             self.log(f"🏢 Alterando para empresa: {empresa_num}")
 
             # Enviar código da empresa
-            send_keys(empresa_num)
-            if not self.smart_sleep(0.5):
+            if not self.keys.send(empresa_num, timeout=0.5):
                 return False
-            send_keys('{ENTER}')
-            if not self.smart_sleep(1.5):
+            if not self.keys.send('{ENTER}', timeout=1.5, event_driven=True, ready=lambda: (
+                    not self._window_exists("Troca de empresas", "FNWND3190") or self._any_error_dialog_visible())):
                 return False
 
             if not self.handle_error_dialogs():
@@ -1117,9 +3401,6 @@ class DominioAutomation:
             # Aguardar fechamento da janela de troca
             self.wait_for_window_close(troca_window, "Troca de empresas")
 
-            # Fechar avisos de vencimento se existirem
-            self.close_avisos_vencimento()
-
             return True
 
         except Exception as e:
@@ -1129,23 +3410,50 @@ class DominioAutomation:
     def close_avisos_vencimento(self):
         """Fecha janela de avisos de vencimento se estiver aberta"""
         try:
-            aviso_window = self.main_window.child_window(
-                title="Avisos de Vencimento",
-                class_name="FNWND3190"
-            )
+            aviso_window = self.driver.find_window("Avisos de Vencimento", "FNWND3190")
 
-            if aviso_window.exists() and aviso_window.is_visible():
+            if aviso_window and self.driver.window_visible(aviso_window):
                 self.log("📋 Fechando 'Avisos de Vencimento'")
-                aviso_window.set_focus()
-                send_keys('{ESC}')
-                time.sleep(0.5)
-                send_keys('{ESC}')
-                time.sleep(0.5)
+                self.driver.focus_window(aviso_window)
+                # Segundo ESC só se o primeiro não fechou (senão fecharia a janela de baixo)
+                for _ in range(2):
+                    self.driver.send_keys('{ESC}')
+                    if self.wait_for_condition(lambda: not self.driver.window_visible(aviso_window),
+                                               timeout=0.5, poll_interval=0.05):
+                        break
         except Exception:
             pass  # Não é crítico se não conseguir fechar
 
-    def processar_linha(self, row, index: int, linha_excel: int) -> bool:
-        """Processa uma linha do Excel"""
+    def processar_linha(self, row, index: int, linha_excel: int, manter_sessao: bool = False) -> bool:
+        """Processa uma linha do Excel (registrada no trace como span 'linha').
+
+        manter_sessao: a próxima linha é da mesma empresa (lote de períodos);
+        o Gerenciador fica aberto mesmo sem sessão persistente."""
+        self._manter_sessao = manter_sessao
+        self._sessao_reutilizada = False
+        try:
+            empresa = str(int(row['Nº']))
+        except Exception:
+            empresa = str(row.get('Nº', ''))
+        self.tracer.set_row(linha_excel, empresa)
+        with self.tracer.span("linha") as sp:
+            success = self._processar_linha(row, index, linha_excel)
+            if success:
+                sp.ok()
+            else:
+                if self.dialog_watcher.pending_abort():
+                    # Espera interrompida pelo vigia: aplicar a regra do diálogo
+                    self.handle_error_dialogs()
+                # Estado do Domínio incerto após falha: próxima linha refaz o F8
+                self.empresa_ativa = None
+                if (self.persistent_session or manter_sessao or self._sessao_reutilizada) and not self.should_stop():
+                    # Com o Gerenciador mantido aberto a limpeza completa só acontece em erro
+                    self.cleanup_windows()
+        return success
+
+    def _processar_linha(self, row, index: int, linha_excel: int) -> bool:
+        """Executa os passos de uma linha do Excel como transições de estado;
+        após falha recuperável, retoma do estado mais avançado ainda válido"""
         try:
             if self.should_stop():
                 return False
@@ -1157,176 +3465,241 @@ class DominioAutomation:
                     self.log("❌ Não foi possível localizar a janela do Domínio")
                     return False
                 try:
-                    self.app = Application(backend="uia").connect(handle=handle)
-                    self.main_window = self.app.window(handle=handle)
+                    self.driver.connect(handle)
                     self.log("✅ Reconectado ao Domínio com sucesso")
+                    self.empresa_ativa = None
+                    self.start_event_bus(restart=True)
                 except Exception as e:
                     self.log(f"❌ Erro ao reconectar: {str(e)}")
                     return False
 
-            handle = self.main_window.handle
-
-            if win32gui.IsIconic(handle):
-                win32gui.ShowWindow(handle, win32con.SW_RESTORE)
+            if self.driver.restore_main():
                 if not self.smart_sleep(0.5):
                     return False
 
-            win32gui.SetForegroundWindow(handle)
-            time.sleep(0.2)
+            self.driver.bring_to_front()
+            self.wait_for_condition(self._is_foreground, timeout=0.2, poll_interval=0.03, wake_on_events=False)
 
-            # Troca de empresa
             empresa_num = str(int(row['Nº']))
-            if not self.handle_empresa_change(empresa_num):
-                return False
-
-            if self.should_stop():
-                return False
-            self.check_pause()
-
-            # Acessar relatórios
-            self.log("📊 Acessando relatórios")
-            self.main_window.set_focus()
-            send_keys('%r')  # ALT+R
-            if not self.smart_sleep(0.5):
-                return False
-            send_keys('i')  # Relatórios Integrados
-            if not self.smart_sleep(0.5):
-                return False
-            send_keys('i')  # Relatórios Integrados
-            if not self.smart_sleep(0.5):
-                return False
-            send_keys('{ENTER}')
-            if not self.smart_sleep(1):
-                return False
+            if empresa_num != self.empresa_ativa and self.sessao_gerenciador and not self.persistent_session:
+                # Lote anterior deixou o Gerenciador aberto (linhas seguintes puladas)
+                self.cleanup_windows()
 
-            # Processar no Gerenciador de Relatórios
-            return self.processar_relatorio_taxa_gms(row, linha_excel)
+            transicoes = {
+                UIState.COMPANY_SELECTED: lambda: self.selecionar_empresa(empresa_num),
+                UIState.REPORT_MANAGER_OPEN: self.abrir_gerenciador,
+                UIState.PARAMS_FILLED: lambda: self.preencher_parametros(row),
+                UIState.REPORT_RENDERED: self.executar_relatorio,
+                UIState.SAVE_DIALOG_OPEN: self.abrir_salvamento,
+                UIState.SAVED: lambda: self.salvar_pdf(row),
+            }
+            self._abortar_linha = False
+            estado = UIState.IDLE
+            for tentativa in range(RowStateMachine.MAX_RETOMADAS + 1):
+                if self.estados.run(transicoes, estado):
+                    self.finalizar_linha()
+                    return True
+                if tentativa == RowStateMachine.MAX_RETOMADAS or self._abortar_linha or self.should_stop():
+                    return False
+                estado = self.retomar_estado(empresa_num)
+                if estado is None:
+                    return False
+                self.estados.retomada(estado)
+                self.log(f"🔁 Linha {linha_excel}: retomando a partir de {estado}")
+            return False
 
         except Exception as e:
             self.log(f"❌ Erro ao processar linha {linha_excel}: {str(e)}")
             return False
 
-    def processar_relatorio_taxa_gms(self, row, linha_excel: int) -> bool:
-        """Processa o relatório de Taxa GMS"""
+    def selecionar_empresa(self, empresa_num: str) -> bool:
+        """IDLE → COMPANY_SELECTED: troca de empresa (dispensada se já carregada)"""
+        if empresa_num == self.empresa_ativa:
+            self.log(f"🏢 Empresa {empresa_num} já ativa - troca dispensada")
+            return True
+
+        with self.tracer.span("troca_empresa") as sp:
+            self.empresa_ativa = None
+            if not self.handle_empresa_change(empresa_num):
+                return False
+            self.empresa_ativa = empresa_num
+            sp.ok()
+
+        # Fechar avisos de vencimento se existirem
+        with self.tracer.span("avisos") as sp:
+            self.close_avisos_vencimento()
+            sp.ok()
+        return True
+
+    def abrir_gerenciador(self) -> bool:
+        """COMPANY_SELECTED → REPORT_MANAGER_OPEN: Gerenciador de Relatórios aberto
+        com Taxa GMS selecionado (reaproveita o da sessão persistente)"""
         try:
             if self.should_stop():
                 return False
+            self.check_pause()
 
-            # Aguardar Gerenciador de Relatórios
-            max_attempts = 10
-            relatorio_window = None
-
-            for attempt in range(max_attempts):
-                if self.should_stop():
+            gerenciador = self.sessao_gerenciador
+            self.sessao_gerenciador = None
+            if gerenciador and self.driver.window_visible(gerenciador):
+                self._sessao_reutilizada = True
+                return self.reentrar_gerenciador(gerenciador)
+
+            # Acessar relatórios e aguardar o Gerenciador de Relatórios
+            with self.tracer.span("abrir_gerenciador") as sp:
+                self.log("📊 Acessando relatórios")
+                self.driver.focus_main()
+                if not self.keys.send('%r', timeout=0.5, ready=self._menu_open):  # ALT+R
+                    return False
+                if not self.keys.send('i', timeout=0.5):  # Relatórios Integrados
+                    return False
+                if not self.keys.send('i', timeout=0.5):  # Relatórios Integrados
+                    return False
+                if not self.keys.send_until_window('{ENTER}', "Gerenciador de Relatórios", "FNWND3190", timeout=1):
                     return False
-                self.check_pause()
 
-                try:
-                    relatorio_window = self.main_window.child_window(
-                        title="Gerenciador de Relatórios",
-                        class_name="FNWND3190"
-                    )
+                max_attempts = 10
+                relatorio_window = None
 
-                    if relatorio_window.exists():
-                        break
-
-                    # Verificar se há diálogos de erro bloqueando
-                    if not self.handle_error_dialogs():
-                        self.cleanup_windows()
+                for attempt in range(max_attempts):
+                    if self.should_stop():
                         return False
+                    self.check_pause()
 
-                    if not self.smart_sleep(1):
-                        return False
-                except Exception:
-                    if attempt == max_attempts - 1:
-                        self.log("❌ Gerenciador de Relatórios não encontrado (timeout)")
-                        return False
+                    try:
+                        relatorio_window = self.driver.find_window("Gerenciador de Relatórios", "FNWND3190")
 
-            if not relatorio_window:
-                self.log("❌ Gerenciador de Relatórios não encontrado")
-                return False
+                        if relatorio_window:
+                            break
 
-            self.log("📋 Gerenciador de Relatórios localizado")
+                        # Verificar se há diálogos de erro bloqueando
+                        if not self.handle_error_dialogs():
+                            self.cleanup_windows()
+                            return False
+
+                        if not self.smart_sleep(1):
+                            return False
+                    except Exception:
+                        if attempt == max_attempts - 1:
+                            self.log("❌ Gerenciador de Relatórios não encontrado (timeout)")
+                            return False
+
+                if not relatorio_window:
+                    self.log("❌ Gerenciador de Relatórios não encontrado")
+                    return False
+
+                self.log("📋 Gerenciador de Relatórios localizado")
+                sp.ok()
 
             if self.should_stop():
                 return False
             self.check_pause()
 
             # Navegar até Taxa GMS
-            self.log("🎯 Navegando para Taxa GMS")
+            with self.tracer.span("navegacao") as sp:
+                self.log("🎯 Navegando para Taxa GMS")
 
-            # Sequência de navegação otimizada
-            navigation_keys = ['d'] * 6  # 6 vezes 'd' para navegar
-            for key in navigation_keys:
-                if self.should_stop():
+                # Sequência de navegação otimizada
+                navigation_keys = ['d'] * 6  # 6 vezes 'd' para navegar
+                if not self.keys.send_sequence(navigation_keys, timeout=0.2):
+                    return False
+
+                if not self.keys.send('{ENTER}', timeout=0.5):
+                    return False
+                if not self.keys.send('c', timeout=0.5):  # Selecionar relatório
                     return False
-                send_keys(key)
-                time.sleep(0.2)
+                # Só um Gerenciador já navegado pode ser reaproveitado/retomado
+                self._gerenciador_atual = relatorio_window
+                sp.ok()
+            return True
 
-            send_keys('{ENTER}')
-            if not self.smart_sleep(0.5):
+        except Exception as e:
+            self.log(f"❌ Erro ao abrir o Gerenciador de Relatórios: {str(e)}")
+            return False
+
+    def reentrar_gerenciador(self, gerenciador: int) -> bool:
+        """Reaproveita um Gerenciador já navegado até Taxa GMS"""
+        self._gerenciador_atual = gerenciador
+        with self.tracer.span("navegacao") as sp:
+            # Só o formulário de parâmetros é reiniciado: reselecionar Taxa GMS
+            self.log("♻️ Reutilizando Gerenciador de Relatórios aberto")
+            self.driver.focus_window(gerenciador)
+            if not self.keys.send('c', timeout=0.5):
                 return False
-            send_keys('c')  # Selecionar relatório
-            if not self.smart_sleep(0.5):
+            sp.ok()
+        return True
+
+    def preencher_parametros(self, row) -> bool:
+        """REPORT_MANAGER_OPEN → PARAMS_FILLED"""
+        try:
+            if self.should_stop():
                 return False
+            self.check_pause()
 
-            # Preencher campos
-            self.log("📝 Preenchendo parâmetros do relatório")
+            with self.tracer.span("parametros") as sp:
+                self.log("📝 Preenchendo parâmetros do relatório")
 
-            # Navegar pelos campos e preencher
-            send_keys('{TAB}')  # Pular primeiro campo
-            time.sleep(0.2)
+                # Navegar pelos campos e preencher
+                if not self.keys.send('{TAB}', timeout=0.2):  # Pular primeiro campo
+                    return False
 
-            send_keys('{TAB}22')  # Campo de código (assumindo valor fixo 22)
-            time.sleep(0.3)
+                if not self.keys.send('{TAB}22', timeout=0.3):  # Campo de código (assumindo valor fixo 22)
+                    return False
 
-            send_keys('{TAB}8')  # Próximo campo
-            time.sleep(0.2)
+                if not self.keys.send('{TAB}8', timeout=0.2):  # Próximo campo
+                    return False
 
-            # Período
-            periodo = str(row['Periodo'])
-            send_keys('{TAB}' + periodo)
-            if not self.smart_sleep(0.5):
-                return False
+                # Período
+                periodo = str(row['Periodo'])
+                if not self.keys.send('{TAB}' + periodo, timeout=0.5):
+                    return False
+                sp.ok()
+            return True
+
+        except Exception as e:
+            self.log(f"❌ Erro ao preencher parâmetros: {str(e)}")
+            return False
 
+    def executar_relatorio(self) -> bool:
+        """PARAMS_FILLED → REPORT_RENDERED: relatório aberto na tela"""
+        try:
             if self.should_stop():
                 return False
             self.check_pause()
 
-            # Executar relatório
-            self.log("⚡ Executando relatório")
-            try:
-                button_executar = relatorio_window.child_window(auto_id="1007", class_name="Button")
-                button_executar.click_input()
-            except Exception as e:
-                self.log(f"⚠️ Erro ao clicar em executar, tentando via teclado: {str(e)}")
-                send_keys('{F5}')  # Alternativa via teclado
-
-            # Aguardar janela do relatório carregar (título contém "Taxa GMS")
-            if not self.wait_for_condition(
-                lambda: self._window_exists_partial("Taxa GMS", "FNWND3190") or self._any_error_dialog_visible(),
-                timeout=30,
-                poll_interval=0.15,
-                description="Aguardando relatório carregar"
-            ):
-                self.log("⚠️ Timeout aguardando relatório carregar")
-                return False
+            with self.tracer.span("executar") as sp:
+                self.log("⚡ Executando relatório")
+                try:
+                    if not self.driver.click_button(self._gerenciador_atual, auto_id="1007"):
+                        raise RuntimeError("botão Executar (1007) não encontrado")
+                except Exception as e:
+                    self.log(f"⚠️ Erro ao clicar em executar, tentando via teclado: {str(e)}")
+                    self.driver.send_keys('{F5}')  # Alternativa via teclado
 
-            # Verificar se não foi um diálogo de erro
-            if self._any_error_dialog_visible():
-                if not self.handle_error_dialogs():
-                    self.cleanup_windows()
+                # Aguardar janela do relatório carregar (título contém "Taxa GMS")
+                if not self.wait_for_condition(
+                    lambda: self._window_exists_partial("Taxa GMS", "FNWND3190") or self._any_error_dialog_visible(),
+                    timeout=30,
+                    poll_interval=0.15,
+                    description="Aguardando relatório carregar"
+                ):
+                    self.log("⚠️ Timeout aguardando relatório carregar")
                     return False
 
-            # Gerar PDF
-            return self.gerar_pdf(row, linha_excel)
+                # Verificar se não foi um diálogo de erro
+                if self._any_error_dialog_visible():
+                    if not self.handle_error_dialogs():
+                        self.cleanup_windows()
+                        return False
+                sp.ok()
+            return True
 
         except Exception as e:
             self.log(f"❌ Erro no processamento do relatório: {str(e)}")
             return False
 
-    def gerar_pdf(self, row, linha_excel: int) -> bool:
-        """Gera e salva o PDF do relatório"""
+    def abrir_salvamento(self) -> bool:
+        """REPORT_RENDERED → SAVE_DIALOG_OPEN: Ctrl+D até a janela de salvamento abrir"""
         try:
             if self.should_stop():
                 return False
@@ -1339,77 +3712,82 @@ class DominioAutomation:
             self.log("📄 Gerando PDF")
 
             # Enviar Ctrl+D em loop aguardando a janela de salvamento
-            self.log("📄 Aguardando janela de salvamento (enviando Ctrl+D periodicamente)...")
-            timeout_total = 60
-            intervalo_ctrl_d = 5
-            inicio = time.time()
-            janela_encontrada = False
-
-            while time.time() - inicio < timeout_total:
-                if self.should_stop():
-                    return False
-
-                # Verificar diálogos de erro/aviso
-                if self._any_error_dialog_visible():
-                    if not self.handle_error_dialogs():
-                        self.cleanup_windows()
+            with self.tracer.span("ctrl_d") as sp:
+                self.log("📄 Aguardando janela de salvamento (enviando Ctrl+D periodicamente)...")
+                timeout_total = 60
+                intervalo_ctrl_d = 5
+                inicio = self.clock.time()
+                janela_encontrada = False
+
+                while self.clock.time() - inicio < timeout_total:
+                    if self.should_stop():
                         return False
-                    # Aviso não crítico tratado, continua aguardando
-                    self.log("🔄 Aviso tratado, continuando aguardo da janela de salvamento...")
-                    time.sleep(0.5)
-                    continue
 
-                if self._window_exists("Salvar em PDF", "#32770") or self._save_dialog_exists():
-                    janela_encontrada = True
-                    break
-
-                # Garantir foco e enviar Ctrl+D
-                try:
-                    self.main_window.set_focus()
-                    time.sleep(0.3)
-                except Exception:
-                    pass
-                send_keys('^d')  # Ctrl+D
+                    # Uma única enumeração de janelas por tick
+                    self.snapshot(refresh=True)
 
-                # Aguardar entre tentativas verificando a cada 0.25s
-                for _ in range(int(intervalo_ctrl_d / 0.25)):
-                    if self.should_stop():
-                        return False
+                    # Verificar diálogos de erro/aviso
                     if self._any_error_dialog_visible():
-                        break
+                        if not self.handle_error_dialogs():
+                            self.cleanup_windows()
+                            return False
+                        # Aviso não crítico tratado, continua aguardando
+                        self.log("🔄 Aviso tratado, continuando aguardo da janela de salvamento...")
+                        self._sleep(0.5)
+                        continue
+
                     if self._window_exists("Salvar em PDF", "#32770") or self._save_dialog_exists():
                         janela_encontrada = True
                         break
-                    time.sleep(0.25)
-                if janela_encontrada:
-                    break
 
-            if not janela_encontrada:
-                self.log("❌ Timeout aguardando janela de salvamento após Ctrl+D")
-                return False
+                    # Garantir foco e enviar Ctrl+D
+                    try:
+                        self.driver.focus_main()
+                        self.wait_for_condition(self._is_foreground, timeout=0.3, poll_interval=0.03, wake_on_events=False)
+                    except Exception:
+                        pass
+                    self.driver.send_keys('^d')  # Ctrl+D
+
+                    # Aguardar entre tentativas: acorda em eventos de janela (ou a cada 0.25s)
+                    limite_ctrl_d = self.clock.time() + intervalo_ctrl_d
+                    while self.clock.time() < limite_ctrl_d:
+                        if self.should_stop():
+                            return False
+                        generation = self.event_bus.generation
+                        self.snapshot(refresh=True)
+                        if self._any_error_dialog_visible():
+                            break
+                        if self._window_exists("Salvar em PDF", "#32770") or self._save_dialog_exists():
+                            janela_encontrada = True
+                            break
+                        self._wait_tick(0.25, generation, limite_ctrl_d - self.clock.time())
+                    if janela_encontrada:
+                        break
+
+                if not janela_encontrada:
+                    self.log("❌ Timeout aguardando janela de salvamento após Ctrl+D")
+                    return False
+                sp.ok()
+            return True
+
+        except Exception as e:
+            self.log(f"❌ Erro na geração do PDF: {str(e)}")
+            return False
 
-            # Localizar janela de salvamento
+    def salvar_pdf(self, row) -> bool:
+        """SAVE_DIALOG_OPEN → SAVED: pasta, nome do arquivo e Salvar"""
+        with self.tracer.span("salvar") as sp:
             self.log("💾 Configurando salvamento do PDF")
 
             try:
-                save_window = self.main_window.child_window(
-                    title="Salvar em PDF",
-                    class_name="#32770"
-                )
+                save_window = self.driver.find_window("Salvar em PDF", "#32770")
 
-                if not save_window.exists():
+                if not save_window:
                     # Fallback: procura janela de salvamento pelo elemento "Salvar em:" (AutomationId 1091)
                     self.log("🔍 Procurando janela de salvamento alternativa...")
                     try:
-                        save_window = self.main_window.child_window(
-                            class_name="#32770",
-                            found_index=0
-                        )
-                        salvar_em_label = save_window.child_window(
-                            auto_id="1091",
-                            class_name="Static"
-                        )
-                        if not salvar_em_label.exists():
+                        save_window = self.driver.find_window_with_control("#32770", "1091", "Static")
+                        if not save_window:
                             self.log("❌ Janela de salvamento não encontrada")
                             return False
                         self.log("✅ Janela de salvamento encontrada via elemento 'Salvar em:'")
@@ -1423,31 +3801,25 @@ class DominioAutomation:
 
                 # Navegar até a árvore de pastas (batch TABs)
                 self.log("📝 Indo até a pasta correta...")
-                send_keys('{TAB}{TAB}{TAB}{TAB}')
-                time.sleep(0.3)
+                if not self.keys.send('{TAB}{TAB}{TAB}{TAB}', timeout=0.3):
+                    return False
 
                 # Selecionar pasta: G > P > G (Drive > Pessoal > GMS)
                 self.log("📝 Acessando a pasta GMS...")
-                send_keys('G')
-                time.sleep(0.15)
-                send_keys('P')
-                time.sleep(0.15)
-                send_keys('G')
-                time.sleep(0.15)
+                if not self.keys.send_sequence(['G', 'P', 'G'], timeout=0.15):
+                    return False
 
                 # Navegar até campo de nome (batch TABs)
                 self.log("📝 Nomeando PDF...")
-                send_keys('{TAB}{TAB}{TAB}{TAB}{TAB}')
-                time.sleep(0.3)
+                if not self.keys.send('{TAB}{TAB}{TAB}{TAB}{TAB}', timeout=0.5):
+                    return False
 
                 nome_pdf = str(row['Salvar Como'])
                 self.log(f"📝 Nome do arquivo: {nome_pdf}")
 
-                # Definir nome do arquivo
-                time.sleep(0.2)
-                name_field = save_window.child_window(auto_id="1148", class_name="Edit")
-                name_field.set_text(nome_pdf)
-                time.sleep(0.3)
+                # Definir nome do arquivo (set_text é síncrono; aguarda só a UI processar)
+                self.driver.set_edit_text(save_window, "1148", nome_pdf)
+                self.wait_for_condition(self._input_idle, timeout=0.3, poll_interval=0.03, wake_on_events=False)
 
                 if self.should_stop():
                     return False
@@ -1455,12 +3827,13 @@ class DominioAutomation:
 
                 # Salvar
                 self.log("💾 Salvando PDF")
-                button_salvar = save_window.child_window(auto_id="1", class_name="Button")
-                button_salvar.click_input()
+                if not self.driver.click_button(save_window, auto_id="1"):
+                    self.log("❌ Botão 'Salvar' não encontrado")
+                    return False
 
                 # Esperar janela de salvamento fechar (em vez de sleep fixo de 10s)
                 if not self.wait_for_condition(
-                    lambda: not save_window.exists() or not save_window.is_visible(),
+                    lambda: not self.driver.window_visible(save_window),
                     timeout=15,
                     poll_interval=0.2,
                     description="Aguardando salvamento do PDF"
@@ -1471,195 +3844,1021 @@ class DominioAutomation:
             except Exception as e:
                 self.log(f"❌ Erro durante salvamento: {str(e)}")
                 return False
+            sp.ok()
+        return True
 
-            # Fechar janelas e limpar
-            self.cleanup_windows()
+    def finalizar_linha(self):
+        """Após SAVED: fecha as janelas (sessão persistente fecha só o relatório)"""
+        if (self.persistent_session or self._manter_sessao) and self._gerenciador_atual:
+            if self.fechar_relatorio():
+                self.sessao_gerenciador = self._gerenciador_atual
+                return
+        self.cleanup_windows()
 
-            return True
+    def retomar_estado(self, empresa_num: str) -> Optional[str]:
+        """Após falha recuperável: trata diálogos pendentes, detecta o estado nas
+        janelas abertas e prepara a reentrada. None = linha não pode ser retomada."""
+        if not self.handle_error_dialogs():
+            return None
+        estado = self.detectar_estado(empresa_num)
+        if estado == UIState.REPORT_MANAGER_OPEN and not self.reentrar_gerenciador(self._gerenciador_atual):
+            return None
+        return estado
+
+    def detectar_estado(self, empresa_num: str) -> Optional[str]:
+        """Estado mais avançado ainda válido, deduzido do conjunto de janelas vivas.
+        Janelas de onde não se continua com segurança (troca pela metade, avisos,
+        Salvar em PDF com foco incerto) são fechadas antes; PARAMS_FILLED não é
+        visível nas janelas e volta a REPORT_MANAGER_OPEN."""
+        for _ in range(self.CLEANUP_MAX_STEPS):
+            snap = self.snapshot(refresh=True)
+            if snap.find_error_dialog(exclude=self.dialog_watcher.em_tratamento()) is not None:
+                return None
+            save = snap.find("Salvar em PDF", "#32770") or snap.find_with_child("#32770", "Static", "Salvar em:")
+            if save is not None:
+                if not self._fechar_janela("Salvar em PDF", save.hwnd):
+                    return None
+                continue
+            troca = self.driver.find_window("Troca de empresas", "FNWND3190")
+            if troca:
+                self.empresa_ativa = None
+                if not self._fechar_janela("Troca de empresas", troca):
+                    return None
+                continue
+            avisos = self.driver.find_window("Avisos de Vencimento", "FNWND3190")
+            if avisos:
+                if not self._fechar_janela("Avisos de Vencimento", avisos):
+                    return None
+                continue
+            break
+        else:
+            return None
 
-        except Exception as e:
-            self.log(f"❌ Erro na geração do PDF: {str(e)}")
-            return False
+        if self.empresa_ativa != empresa_num:
+            # Empresa incerta: recomeçar da troca com o Domínio limpo
+            self.cleanup_windows()
+            return UIState.IDLE
+        if self._gerenciador_atual and not self.driver.window_visible(self._gerenciador_atual):
+            self._gerenciador_atual = None
+        if snap.find_partial("Taxa GMS", "FNWND3190") is not None:
+            return UIState.REPORT_RENDERED
+        if self._gerenciador_atual:
+            return UIState.REPORT_MANAGER_OPEN
+        # Gerenciador com navegação incompleta ou menus abertos
+        if self._janela_a_fechar() is not None:
+            self.cleanup_windows()
+        return UIState.COMPANY_SELECTED
 
-    def handle_error_dialogs(self) -> bool:
+    def handle_error_dialogs(self, tentativas: int = 3) -> bool:
         """Trata diálogos de erro que podem aparecer.
         Retorna True se deve continuar, False se deve abortar.
-        Otimizado: usa win32gui.EnumWindows (uma única passagem) em vez de múltiplas buscas UIA."""
+        Otimizado: consulta a foto de janelas (uma única passagem EnumWindows) em vez de múltiplas buscas UIA;
+        a ação vem da primeira regra de regras_dialogos.json que casa com título/mensagem."""
         try:
-            error_titles_lower = {"erro", "erro léxico", "aviso", "atenção",
-                                  "informação", "alerta", "warning", "error"}
+            # Diálogos que o vigia já está fechando em segundo plano são ignorados
+            dialog = self.snapshot().find_error_dialog(exclude=self.dialog_watcher.em_tratamento())
+            if dialog is None:
+                return True  # Nenhum diálogo de erro, continuar normalmente
+            if self.dialog_watcher.abort and self.dialog_watcher.abort[0] == dialog.hwnd:
+                self.dialog_watcher.abort = None
 
-            # Passagem única: enumerar todas as janelas via Win32 API (rápido)
-            found_hwnd = None
-            found_title = None
+            found_hwnd = dialog.hwnd
+            found_title = dialog.title
+            # O diálogo será fechado: a próxima consulta precisa de foto nova
+            self.invalidate_snapshot()
 
-            def enum_callback(hwnd, _):
-                nonlocal found_hwnd, found_title
-                if not win32gui.IsWindowVisible(hwnd):
-                    return True
-                try:
-                    title = win32gui.GetWindowText(hwnd)
-                    if not title:
-                        return True
-                    title_lower = title.strip().lower()
-                    for err_title in error_titles_lower:
-                        if title_lower == err_title or err_title in title_lower:
-                            if win32gui.GetClassName(hwnd) == "#32770":
-                                found_hwnd = hwnd
-                                found_title = title
-                                return False
-                except Exception:
-                    pass
-                return True
+            # Ler texto da mensagem (apenas desta janela específica)
+            message = self._texto_dialogo(found_hwnd, found_title)
 
-            win32gui.EnumWindows(enum_callback, None)
+            self.log(f"⚠️ Diálogo detectado: '{found_title}' - {message[:100] if message else 'sem mensagem'}")
 
-            if found_hwnd is None:
-                return True  # Nenhum diálogo de erro, continuar normalmente
+            # Classificação por regras (regras_dialogos.json)
+            rule = self.dialog_rules.classify(found_title, message)
+            self.log(f"📋 Regra '{rule.nome}': {rule.acao}")
+            inicio = self.clock.time()
+            self.dismiss_dialog(found_hwnd, rule.teclas)
+            self.dialog_rules.record(rule, self.clock.time() - inicio)
+
+            if rule.acao == DialogRules.ABORTAR:
+                self._abortar_linha = True
+                return False
+            if rule.acao == DialogRules.ESCALAR:
+                self.logger.error(f"🚨 Diálogo '{found_title}' requer atenção: {message[:200]}")
+                self._abortar_linha = True
+                return False
+            if rule.acao == DialogRules.REPETIR and tentativas > 1:
+                # Diálogo transitório: se voltar, tratar de novo
+                if self.wait_for_condition(lambda: self.snapshot().find_error_dialog() is not None,
+                                           timeout=1, poll_interval=0.1):
+                    return self.handle_error_dialogs(tentativas - 1)
+            return True
+
+        except Exception as e:
+            self.log(f"⚠️ Exceção ao verificar diálogos: {str(e)}")
+            return True
+
+
+    def _texto_dialogo(self, hwnd: int, title: str, timeout: float = 1.0) -> str:
+        """Texto do diálogo, aguardando os Static de um diálogo recém-criado
+        (sem eles a regra casaria só pelo título)."""
+        texto = {"valor": ""}
 
-            # Encontrou diálogo — agora usar pywinauto apenas para esta janela específica
+        def ler() -> bool:
             try:
-                error_window = self.app.window(handle=found_hwnd)
+                texto["valor"] = self.driver.dialog_text(hwnd)
             except Exception:
-                win32gui.SetForegroundWindow(found_hwnd)
-                send_keys('{ENTER}')
-                time.sleep(0.3)
                 return True
-
-            # Ler texto da mensagem
-            message = ""
-            try:
-                message = error_window.window_text()
+            return dialogo_tem_texto(title, texto["valor"]) or not self.driver.window_visible(hwnd)
+
+        if not ler():
+            self.wait_for_condition(ler, timeout=timeout, poll_interval=0.05)
+        return texto["valor"]
+
+    def dismiss_dialog(self, hwnd: int, teclas: Iterable[str]):
+        """Envia a sequência de teclas da regra ao diálogo ("OK" clica no botão OK;
+        sem o botão, ENTER). Se o diálogo continuar aberto, ESC."""
+        self.driver.focus_window(hwnd)
+        for tecla in teclas:
+            if tecla.upper() == "OK":
                 try:
-                    static_texts = error_window.children(class_name="Static")
-                    for static in static_texts:
-                        text = static.window_text()
-                        if text:
-                            message += " " + text
+                    clicked = self.driver.click_button(hwnd, title="OK")
                 except Exception:
-                    pass
-            except Exception:
-                pass
-
-            self.log(f"⚠️ Diálogo detectado: '{found_title}' - {message[:100] if message else 'sem mensagem'}")
+                    clicked = False
+                if clicked:
+                    self.wait_for_condition(lambda: not self.driver.window_visible(hwnd),
+                                            timeout=0.5, poll_interval=0.05)
+                    continue
+                tecla = '{ENTER}'
+            if not self.keys.send(tecla, timeout=0.5):
+                return
 
-            message_lower = message.lower()
-
-            # Mensagens de aviso que não impedem o salvamento (fecha e continua o fluxo)
-            mensagens_continuar_salvamento = [
-                "erro na gravação do relatório",
-                "nome do caminho inválido",
-                "caminho inválido",
-                "caminho invalido",
-                "caracteres não permitidos"
-            ]
-
-            for msg in mensagens_continuar_salvamento:
-                if msg in message_lower:
-                    self.log(f"⚠️ Aviso de gravação detectado (não crítico): {msg}")
-                    error_window.set_focus()
-                    send_keys('{ENTER}')
-                    time.sleep(0.5)
-                    return True  # Continua o fluxo — janela de salvamento vai abrir após fechar este aviso
-
-            # Verificar mensagens que abortam a linha (sem dados)
-            mensagens_abortar = [
-                "sem dados para emitir",
-                "nenhum registro encontrado",
-                "não há dados",
-                "registro não encontrado"
-            ]
-
-            for msg in mensagens_abortar:
-                if msg in message_lower:
-                    self.log(f"⚠️ Aviso não crítico: {msg}")
-                    error_window.set_focus()
-                    send_keys('{ENTER}')
-                    time.sleep(0.5)
-                    for _ in range(4):
-                        send_keys('{ESC}')
-                        time.sleep(0.5)
-                    return False
+        try:
+            if self.driver.window_visible(hwnd):
+                self.driver.send_keys('{ESC}')
+                self._sleep(0.3)
+        except Exception:
+            pass
 
-            # Erro léxico — fechar e continuar
-            if "léxico" in found_title.lower():
-                self.log("⚠️ Erro léxico detectado, fechando...")
-                error_window.set_focus()
-                for _ in range(3):
-                    send_keys('{ESC}')
-                    time.sleep(0.5)
+    def fechar_relatorio(self) -> bool:
+        """Fecha só a janela do relatório, mantendo o Gerenciador aberto"""
+        with self.tracer.span("fechar_relatorio") as sp:
+            janela = self.snapshot(refresh=True).find_partial("Taxa GMS", "FNWND3190")
+            if janela is None:
+                sp.ok()
                 return True
+            self.driver.focus_window(janela.hwnd)
+            self.driver.send_keys('{ESC}')
+            if not self.wait_for_condition(
+                lambda: not self.driver.window_visible(janela.hwnd),
+                timeout=3,
+                poll_interval=0.1,
+                description="Aguardando relatório fechar"
+            ):
+                self.log("⚠️ Relatório não fechou; limpeza completa")
+                return False
+            sp.ok()
+            return True
 
-            # Erro genérico: tentar OK, depois ENTER, depois ESC
-            self.log(f"⚠️ Fechando diálogo '{found_title}'...")
-            error_window.set_focus()
-            time.sleep(0.2)
+    def encerrar_sessao(self):
+        """Fecha o Gerenciador mantido aberto pela sessão persistente"""
+        if self.sessao_gerenciador:
+            self.cleanup_windows()
 
-            try:
-                ok_button = error_window.child_window(title="OK", class_name="Button")
-                if ok_button.exists():
-                    ok_button.click_input()
-                    time.sleep(0.5)
-                    if found_title.lower() in ("erro", "aviso"):
-                        return False
-                    return True
-            except Exception:
-                pass
+    def cleanup_windows(self):
+        """Limpa e fecha janelas abertas"""
+        self.sessao_gerenciador = None
+        self._gerenciador_atual = None
+        with self.tracer.span("limpeza") as sp:
+            self._cleanup_windows()
+            sp.ok()
+
+    # Tentativas de fechamento até o Domínio voltar ao estado ocioso
+    CLEANUP_MAX_STEPS = 10
+
+    def _janela_a_fechar(self) -> Optional[Tuple[str, Optional[int]]]:
+        """Janela do fluxo mais acima ainda aberta (nome, hwnd), ou None se ociosa.
+        Ordem: diálogos de erro, Salvar em PDF, relatório, Gerenciador, avisos,
+        troca de empresas e menus."""
+        snap = self.snapshot(refresh=True)
+        dialog = snap.find_error_dialog(exclude=self.dialog_watcher.em_tratamento())
+        if dialog is not None:
+            return f"diálogo '{dialog.title}'", dialog.hwnd
+        save = snap.find("Salvar em PDF", "#32770") or snap.find_with_child("#32770", "Static", "Salvar em:")
+        if save is not None:
+            return "Salvar em PDF", save.hwnd
+        viewer = snap.find_partial("Taxa GMS", "FNWND3190")
+        if viewer is not None:
+            return "relatório Taxa GMS", viewer.hwnd
+        for title in ("Gerenciador de Relatórios", "Avisos de Vencimento", "Troca de empresas"):
+            hwnd = self.driver.find_window(title, "FNWND3190")
+            if hwnd:
+                return title, hwnd
+        if snap.of_class("#32768"):
+            return "menu", None
+        return None
+
+    def _fechar_janela(self, nome: str, hwnd: int) -> bool:
+        """ESC na janela e espera ela sumir (True se fechou)"""
+        self.log(f"🔄 Fechando {nome}")
+        self.driver.focus_window(hwnd)
+        self.driver.send_keys('{ESC}')
+        return self.wait_for_condition(
+            lambda: not self.driver.window_visible(hwnd),
+            timeout=2,
+            poll_interval=0.1
+        )
+
+    def _cleanup_windows(self):
+        try:
+            self.log("🧹 Limpando janelas")
 
-            send_keys('{ENTER}')
-            time.sleep(0.5)
+            # Fechar só o que está aberto, de cima para baixo, conferindo cada fechamento
+            tentativas: Dict[Optional[int], int] = {}
+            for _ in range(self.CLEANUP_MAX_STEPS):
+                if self.should_stop():
+                    return
+                aberta = self._janela_a_fechar()
+                if aberta is None:
+                    break
+                nome, hwnd = aberta
+                tentativas[hwnd] = tentativas.get(hwnd, 0) + 1
+                if tentativas[hwnd] > 2:
+                    self.log(f"⚠️ '{nome}' não fechou com ESC")
+                    break
+
+                if hwnd is None:
+                    # Menu suspenso: ESC vai para o menu ativo
+                    self.driver.send_keys('{ESC}')
+                    self.wait_for_condition(lambda: not self._menu_open(), timeout=1, poll_interval=0.05)
+                    continue
+
+                self._fechar_janela(nome, hwnd)
+            else:
+                self.log("⚠️ Limpeza interrompida: janelas ainda abertas")
+
+            # Domínio ocioso: devolver o foco à janela principal
+            self.driver.focus_main()
 
+        except Exception as e:
+            self.log(f"⚠️ Erro durante limpeza: {str(e)}")
+
+class NotificacaoOutbox:
+    """Caixa de saída das notificações do Discord.
+
+    Cada mensagem vira um arquivo em logs/outbox/ e uma thread envia em ordem,
+    com nova tentativa e espera crescente em falhas de rede, 5xx e 429. O que
+    não saiu (sem webhook, programa fechado antes) fica no disco e é enviado na
+    próxima execução. enviar() só grava o arquivo: nunca bloqueia a automação."""
+
+    TIMEOUT = 10
+    # Espera após a 1ª falha (s), dobrada a cada nova falha até ESPERA_MAXIMA
+    ESPERA_INICIAL = 5.0
+    ESPERA_MAXIMA = 600.0
+    # Limite de caracteres de uma mensagem do Discord
+    LIMITE_CONTEUDO = 2000
+    # Sufixo do arquivo reservado por um processo durante o envio (+ pid)
+    RESERVA = ".enviando-"
+
+    def __init__(self, pasta: str, url: Optional[str] = None,
+                 log: Optional[Callable[..., None]] = None):
+        self.pasta = pasta
+        # Sem url fixa, DISCORD_WEBHOOK_URL é lido a cada envio (a URL não vai para o disco)
+        self.url = url
+        self.log = log or (lambda mensagem, level=logging.INFO, tag=None: None)
+        self.enviadas = 0
+        self._fila: List[str] = []
+        self._proxima = 0.0
+        self._seq = 0
+        self._sem_url = False
+        self._parar = False
+        self._thread: Optional[threading.Thread] = None
+        self._cond = threading.Condition()
+        os.makedirs(pasta, exist_ok=True)
+
+    @property
+    def pendentes(self) -> int:
+        with self._cond:
+            return len(self._fila)
+
+    def iniciar(self):
+        """Recarrega as mensagens deixadas por execuções anteriores e inicia o envio."""
+        # Reservas mais velhas que um envio são de um processo que morreu no meio
+        for nome in os.listdir(self.pasta):
+            if self.RESERVA not in nome:
+                continue
+            reservado = os.path.join(self.pasta, nome)
             try:
-                if error_window.exists():
-                    send_keys('{ESC}')
-                    time.sleep(0.3)
-            except Exception:
+                if time.time() - os.path.getmtime(reservado) > 3 * self.TIMEOUT:
+                    os.replace(reservado, os.path.join(self.pasta, nome.split(self.RESERVA)[0]))
+            except OSError:
                 pass
+        with self._cond:
+            self._fila = sorted(nome for nome in os.listdir(self.pasta) if nome.endswith(".json"))
+            self._proxima = 0.0
+        if self._fila:
+            self.log(f"📨 {len(self._fila)} notificações pendentes de execuções anteriores", logging.INFO, "info")
+        self._thread = threading.Thread(target=self._run, name="NotificacaoOutbox", daemon=True)
+        self._thread.start()
+
+    def enviar(self, conteudo: str) -> str:
+        """Grava a mensagem na caixa de saída e acorda o envio."""
+        if len(conteudo) > self.LIMITE_CONTEUDO:
+            conteudo = conteudo[:self.LIMITE_CONTEUDO - 4] + "\n..."
+        with self._cond:
+            self._seq += 1
+            nome = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}_{self._seq:04d}.json"
+            self._gravar(nome, {'conteudo': conteudo, 'criada_em': datetime.now().isoformat(timespec='seconds'),
+                                'tentativas': 0})
+            self._fila.append(nome)
+            self._cond.notify_all()
+        return os.path.join(self.pasta, nome)
+
+    def esvaziar(self, timeout: float) -> bool:
+        """Espera (até timeout) a caixa de saída ficar vazia. False = ainda há pendentes."""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._fila or self._sem_url or self._thread is None, timeout)
+            return not self._fila
+
+    def parar(self, timeout: float = 1.0):
+        """Encerra a thread de envio; as mensagens pendentes continuam no disco."""
+        with self._cond:
+            self._parar = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _gravar(self, nome: str, mensagem: dict):
+        caminho = os.path.join(self.pasta, nome)
+        with open(f"{caminho}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(mensagem, f, ensure_ascii=False)
+        os.replace(f"{caminho}.tmp", caminho)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._parar:
+                    espera = self._proxima - time.monotonic() if self._fila else None
+                    if espera is not None and espera <= 0:
+                        break
+                    self._cond.wait(espera)
+                if self._parar:
+                    return
+                nome = self._fila[0]
+            try:
+                self._tentar(nome)
+            except Exception as e:
+                self.log(f"⚠️ Erro na caixa de saída de notificações: {str(e)}", logging.WARNING, "aviso")
+                self._adiar(self.ESPERA_MAXIMA)
+
+    def _tentar(self, nome: str):
+        """Uma tentativa de envio da mensagem mais antiga da fila."""
+        url = self.url or os.getenv("DISCORD_WEBHOOK_URL")
+        if not url:
+            if not self._sem_url:
+                self.log("⚠️ DISCORD_WEBHOOK_URL não definido: notificações ficam na caixa de saída",
+                         logging.WARNING, "aviso")
+            with self._cond:
+                self._sem_url = True
+                self._cond.notify_all()
+            self._adiar(self.ESPERA_MAXIMA)
+            return
+        self._sem_url = False
 
-            if found_title.lower() in ("erro", "aviso"):
-                return False
-
-            return True
+        # Interface e --headless podem dividir a pasta: o rename atômico reserva a
+        # mensagem para este processo; se o arquivo sumiu, a outra instância já cuidou dele
+        caminho = os.path.join(self.pasta, nome)
+        reservado = f"{caminho}{self.RESERVA}{os.getpid()}"
+        try:
+            os.replace(caminho, reservado)
+            os.utime(reservado)
+        except FileNotFoundError:
+            self._concluir(nome)
+            return
+        try:
+            with open(reservado, encoding='utf-8') as f:
+                mensagem = json.load(f)
+        except (OSError, ValueError) as e:
+            self.log(f"⚠️ Notificação ilegível descartada ({nome}): {str(e)}", logging.WARNING, "aviso")
+            self._concluir(nome, reservado, f"{caminho}.ilegivel")
+            return
 
+        try:
+            resposta = requests.post(url, json={"content": mensagem['conteudo']}, timeout=self.TIMEOUT)
+            status, erro = resposta.status_code, f"HTTP {resposta.status_code}"
         except Exception as e:
-            self.log(f"⚠️ Exceção ao verificar diálogos: {str(e)}")
-            return True
+            resposta, status, erro = None, None, str(e)[:200]
 
+        if status is not None and 200 <= status < 300:
+            self.enviadas += 1
+            self.log("📨 Notificação enviada ao Discord", logging.INFO, "sucesso")
+            self._concluir(nome, reservado)
+            return
+        if status is not None and 400 <= status < 500 and status != 429:
+            # Payload ou webhook recusado: repetir não adianta
+            self.log(f"❌ Discord recusou a notificação ({erro}); guardada em {nome}.rejeitada",
+                     logging.ERROR, "erro")
+            self._concluir(nome, reservado, f"{caminho}.rejeitada")
+            return
 
-    def cleanup_windows(self):
-        """Limpa e fecha janelas abertas"""
+        # Devolve a mensagem à pasta com a tentativa registrada
+        mensagem['tentativas'] = mensagem.get('tentativas', 0) + 1
+        mensagem['ultimo_erro'] = erro
+        with open(reservado, 'w', encoding='utf-8') as f:
+            json.dump(mensagem, f, ensure_ascii=False)
+        os.replace(reservado, caminho)
+        espera = min(self.ESPERA_INICIAL * 2 ** (mensagem['tentativas'] - 1), self.ESPERA_MAXIMA)
+        if status == 429:
+            espera = max(espera, self._retry_after(resposta))
+        self.log(f"⚠️ Falha ao notificar o Discord ({erro}); nova tentativa em {espera:.1f}s",
+                 logging.WARNING, "aviso")
+        self._adiar(espera)
+
+    @staticmethod
+    def _retry_after(resposta) -> float:
+        """Espera pedida pelo Discord num 429 (corpo JSON ou cabeçalho Retry-After)."""
         try:
-            self.log("🧹 Limpando janelas")
+            return float(resposta.json().get('retry_after'))
+        except Exception:
+            pass
+        try:
+            return float(resposta.headers.get('Retry-After'))
+        except Exception:
+            return 1.0
+
+    def _adiar(self, segundos: float):
+        with self._cond:
+            self._proxima = time.monotonic() + segundos
 
-            # Focar janela principal
-            self.main_window.set_focus()
+    def _concluir(self, nome: str, caminho: Optional[str] = None, destino: Optional[str] = None):
+        """Tira a mensagem da fila; o arquivo (se informado) é apagado ou renomeado para destino."""
+        if caminho:
+            if destino:
+                os.replace(caminho, destino)
+            else:
+                os.remove(caminho)
+        with self._cond:
+            self._fila.remove(nome)
+            self._proxima = 0.0
+            self._cond.notify_all()
 
-            # Enviar ESCs para garantir que todas as janelas sejam fechadas
-            for _ in range(4):
-                send_keys('{ESC}')
-                time.sleep(0.5)
 
-            # Verificar se o Gerenciador de Relatórios ainda está aberto
-            try:
-                relatorio_window = self.main_window.child_window(
-                    title="Gerenciador de Relatórios",
-                    class_name="FNWND3190"
-                )
-
-                if relatorio_window.exists() and relatorio_window.is_visible():
-                    self.log("🔄 Fechando Gerenciador de Relatórios restante")
-                    send_keys('{ESC}')
+class ControleExecucao:
+    """Flags de execução lidas por DominioAutomation (equivalente sem GUI)."""
+
+    def __init__(self):
+        self.executando = True
+        self.pausa_solicitada = False
+
+
+class ExecucaoLote:
+    """Uma execução da lista de trabalho, sem Tk: usada pela interface e pelo modo --headless.
+
+    O controle (executando/pausa_solicitada) é o mesmo objeto lido por
+    DominioAutomation; logs, progresso e estatísticas saem pelos callbacks."""
+
+    # Resultado de executar()
+    CONCLUIDA = "concluida"
+    INTERROMPIDA = "interrompida"
+    SEM_CONEXAO = "sem_conexao"
+    ERRO = "erro"
+    # Intervalo padrão entre resumos parciais no Discord (DOMBOT_DIGEST_MINUTOS; 0 desliga)
+    DIGEST_MINUTOS = 30.0
+
+    def __init__(self, arquivo: str, controle, logger, logs_dir: str, pasta_saida: str,
+                 linha_inicial: int = 2, retomar: bool = False, journal: Optional[RowJournal] = None,
+                 linhas_invalidas: Optional[Dict[object, str]] = None, forcar_regeracao: bool = False,
+                 agrupar_empresas: bool = True, sessao_persistente: bool = False,
+                 planilhas: Optional[WorkbookCache] = None, driver: Optional[UIDriver] = None,
+                 outbox: Optional[NotificacaoOutbox] = None, intervalo_digest: Optional[float] = None,
+                 log: Optional[Callable[..., None]] = None,
+                 ao_progresso: Optional[Callable[[int, int], None]] = None,
+                 ao_estatisticas: Optional[Callable[["ExecucaoLote"], None]] = None,
+                 ao_empresa: Optional[Callable[[str], None]] = None):
+        self.arquivo = arquivo
+        self.controle = controle
+        self.logger = logger
+        self.logs_dir = logs_dir
+        self.pasta_saida = pasta_saida
+        self.linha_inicial = linha_inicial
+        self.retomar = retomar
+        self.journal = journal
+        self.linhas_invalidas = linhas_invalidas or {}
+        self.forcar_regeracao = forcar_regeracao
+        self.agrupar_empresas = agrupar_empresas
+        self.sessao_persistente = sessao_persistente
+        self.planilhas = planilhas or WorkbookCache()
+        self.driver = driver
+        self.outbox = outbox
+        self.log = log or (lambda mensagem, level=logging.INFO, tag=None: logger.log(level, mensagem))
+        self.intervalo_digest = self.intervalo_digest_env() if intervalo_digest is None else intervalo_digest
+        self.ao_progresso = ao_progresso or (lambda atual, total: None)
+        self.ao_estatisticas = ao_estatisticas or (lambda execucao: None)
+        self.ao_empresa = ao_empresa or (lambda numero: None)
+        self.success_logger = logging.getLogger('SuccessLog')
+        self.error_logger = logging.getLogger('ErrorLog')
+
+        self.total_linhas = 0
+        self.linhas_processadas = 0
+        self.linhas_com_erro = 0
+        self.linhas_puladas = 0
+        self.erros_detalhados: List[dict] = []
+        self.resultado: Optional[str] = None
+        # Relógio da automação (virtual no simulador) para taxa e previsão dos resumos
+        self._inicio_execucao = 0.0
+        self._ultimo_digest = 0.0
+
+    def executar(self) -> str:
+        """Processa a planilha do início ao fim (ou até a parada) e retorna o resultado."""
+        linha_inicial = self.linha_inicial
+        automacao = None
+
+        try:
+            self.log("Iniciando automação...", logging.INFO, "processando")
+
+            # Carregar planilha (já lida no preview/validação, salvo se mudou em disco)
+            df = self.planilhas.get(self.arquivo)
+
+            # Ajustar linha inicial para índice do DataFrame (linha 2 = índice 1)
+            inicio_indice = linha_inicial - 2
+            if self.retomar:
+                # Retomada percorre a planilha inteira; linhas concluídas são puladas
+                inicio_indice = 0
+                linha_inicial = 2
+            df_processar = df.iloc[inicio_indice:]
+            if self.linhas_invalidas:
+                # Reprovadas na validação não chegam ao Domínio
+                invalidas = df_processar.index.isin(list(self.linhas_invalidas))
+                for indice in df_processar.index[invalidas]:
+                    self.log(f"Linha {indice + 2} inválida ({self.linhas_invalidas[indice]}) - pulando",
+                             logging.WARNING, "aviso")
+                self.linhas_puladas += int(invalidas.sum())
+                self.ao_estatisticas(self)
+                df_processar = df_processar[~invalidas]
+            total_planilha = len(df_processar)
+            df_processar = expandir_periodos(df_processar)
+            if len(df_processar) != total_planilha:
+                self.log(f"Lotes de períodos: {total_planilha} linhas expandidas em {len(df_processar)} relatórios",
+                         logging.INFO, "info")
+            if self.agrupar_empresas:
+                df_processar = agendar_por_empresa(df_processar)
+                self.log("Fila ordenada por empresa (Nº)", logging.INFO, "info")
+
+            self.total_linhas = len(df_processar)
+            self.log(f"Arquivo carregado: {self.total_linhas} linhas para processar", logging.INFO, "info")
+            self.log(f"Iniciando da linha {linha_inicial} (índice {inicio_indice})", logging.INFO, "info")
+            if self.retomar:
+                self.log("Retomando execução: linhas concluídas no diário serão puladas", logging.INFO, "info")
+            # Total e progresso zerado
+            self.ao_progresso(0, self.total_linhas)
+
+            # Índice da pasta de saída (uma varredura só) para pular PDFs já gerados
+            indice_saida = None
+            if self.forcar_regeracao:
+                self.log("Regeração forçada: PDFs existentes serão sobrescritos", logging.INFO, "aviso")
+            elif not self.pasta_saida:
+                # O Domínio grava na pasta GMS do diálogo de salvamento, não na da planilha
+                self.log("Pasta dos PDFs não informada (DOMBOT_PASTA_PDF ou --pasta-pdf): "
+                         "PDFs já gerados não serão pulados", logging.WARNING, "aviso")
+            else:
+                indice_saida = OutputIndex(self.pasta_saida)
+                try:
+                    inicio_scan = time.perf_counter()
+                    total_pdfs = indice_saida.scan()
+                    self.log(f"Pasta de saída: {total_pdfs} PDFs indexados em {time.perf_counter() - inicio_scan:.2f}s",
+                             logging.INFO, "info")
+                except OSError as e:
+                    self.log(f"Não foi possível indexar a pasta de saída: {str(e)}", logging.WARNING, "aviso")
+                    indice_saida = None
+
+            # Iniciar automação (trace de spans por execução em logs/)
+            trace_path = os.path.join(self.logs_dir, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+            automacao = DominioAutomation(self.logger, self.controle, tracer=SpanTracer(trace_path),
+                                          driver=self.driver, persistent_session=self.sessao_persistente)
+
+            # Conectar ao Domínio
+            if not automacao.connect_to_dominio():
+                self.log("Não foi possível conectar ao Domínio", logging.ERROR, "erro")
+                self.resultado = self.SEM_CONEXAO
+                return self.resultado
+
+            # Linhas consecutivas da mesma empresa mantêm o Gerenciador aberto
+            numeros = df_processar['Nº'].tolist()
+            self._inicio_execucao = self._ultimo_digest = automacao.clock.time()
+
+            # Processar linhas
+            for idx, (original_index, row) in enumerate(df_processar.iterrows()):
+                # Verificar se deve parar
+                if not self.controle.executando:
+                    self.log("Automação interrompida pelo usuário", logging.INFO, "aviso")
+                    break
+
+                # Verificar pausa
+                while self.controle.pausa_solicitada and self.controle.executando:
                     time.sleep(0.5)
-            except Exception:
-                pass
+
+                if not self.controle.executando:
+                    break
+
+                # Atualizar progresso
+                self.ao_progresso(idx + 1, self.total_linhas)
+                self.digest_progresso(automacao.clock, idx)
+
+                linha_excel = original_index + 2  # +2 porque: +1 para base 1, +1 para cabeçalho
+
+                chave = RowJournal.row_key(row)
+                if self.retomar and self.journal and self.journal.is_done(chave):
+                    self.linhas_puladas += 1
+                    self.log(f"Linha {linha_excel} já concluída anteriormente - pulando", logging.INFO, "info")
+                    self.ao_estatisticas(self)
+                    continue
+
+                if indice_saida and indice_saida.exists(row['Salvar Como']):
+                    self.linhas_puladas += 1
+                    self.log(f"Linha {linha_excel} - PDF '{row['Salvar Como']}' já existe - pulando", logging.INFO, "info")
+                    if self.journal:
+                        self.journal.record(chave, RowJournal.OK, linha_excel, "PDF já existente")
+                    self.ao_estatisticas(self)
+                    continue
+
+                # Atualizar empresa atual
+                self.ao_empresa(str(int(row['Nº'])))
+
+                try:
+                    self.log(f"Processando linha {linha_excel} - Empresa {row['Nº']} - {row.get('EMPRESAS', 'N/A')}",
+                             logging.INFO, "processando")
+
+                    if self.journal:
+                        self.journal.record(chave, RowJournal.INICIADA, linha_excel)
+                    mesma_empresa = idx + 1 < len(numeros) and numeros[idx + 1] == numeros[idx]
+                    success = automacao.processar_linha(row, original_index, linha_excel, manter_sessao=mesma_empresa)
+                    if self.journal:
+                        self.journal.record(chave, RowJournal.OK if success else RowJournal.FALHA, linha_excel,
+                                            "" if success else "Erro no processamento")
+
+                    if success:
+                        self.linhas_processadas += 1
+                        if indice_saida:
+                            indice_saida.add(row['Salvar Como'])
+                        self.success_logger.info(f"Linha {linha_excel} - Empresa {row['Nº']} - processada com sucesso")
+                        self.log(f"Linha {linha_excel} processada com sucesso", logging.INFO, "sucesso")
+                    else:
+                        self.linhas_com_erro += 1
+                        self.error_logger.error(f"Linha {linha_excel} - Empresa {row['Nº']} - erro no processamento")
+                        self.log(f"Erro na linha {linha_excel}", logging.ERROR, "erro")
+                        self.erros_detalhados.append({
+                            'empresa': row.get('EMPRESAS', 'N/A'),
+                            'numero': row['Nº'],
+                            'motivo': 'Erro no processamento'
+                        })
+
+                    self.ao_estatisticas(self)
+
+                except Exception as e:
+                    self.linhas_com_erro += 1
+                    if self.journal:
+                        self.journal.record(chave, RowJournal.FALHA, linha_excel, str(e)[:200])
+                    erro_msg = f"Linha {linha_excel} - Erro: {str(e)}"
+                    self.error_logger.error(erro_msg)
+                    self.log(erro_msg, logging.ERROR, "erro")
+                    self.erros_detalhados.append({
+                        'empresa': row.get('EMPRESAS', 'N/A'),
+                        'numero': row['Nº'],
+                        'motivo': str(e)[:80]
+                    })
+                    self.ao_estatisticas(self)
+
+            # Fechar o Gerenciador mantido aberto pela sessão persistente
+            automacao.encerrar_sessao()
+
+            if not self.controle.executando:
+                self.resultado = self.INTERROMPIDA
+                return self.resultado
+
+            self.resultado = self.CONCLUIDA
+            self.log("Automação concluída!", logging.INFO, "sucesso")
+            self.resumo(automacao)
 
         except Exception as e:
-            self.log(f"⚠️ Erro durante limpeza: {str(e)}")
+            erro_msg = f"Erro crítico: {str(e)}"
+            self.error_logger.error(erro_msg)
+            self.log(erro_msg, logging.ERROR, "erro")
+            self.resultado = self.ERRO
+        finally:
+            if automacao is not None:
+                automacao.close()
+                automacao.tracer.close()
+            if self.journal is not None:
+                self.journal.close()
+        return self.resultado
+
+    def resumo(self, automacao: DominioAutomation):
+        """Resumo do fim da execução: contagens, teclado, spans, estados e diálogos."""
+        self.log(f"Resumo: {self.linhas_processadas} processadas, {self.linhas_com_erro} com erro, "
+                 f"{self.linhas_puladas} puladas", logging.INFO, "info")
+        self.log(f"Teclado: {automacao.keys.sent} envios, {automacao.keys.saved:.1f}s economizados "
+                 f"em esperas fixas, {automacao.keys.timeouts} por timeout", logging.INFO, "info")
+        self.log("Maiores consumidores de tempo:", logging.INFO, "info")
+        for linha_resumo in automacao.tracer.summary():
+            self.log(f"  {linha_resumo}", logging.INFO, "info")
+        self.log("Transições de estado:", logging.INFO, "info")
+        for linha_resumo in automacao.estados.summary():
+            self.log(f"  {linha_resumo}", logging.INFO, "info")
+        resumo_dialogos = automacao.dialog_rules.summary()
+        if resumo_dialogos:
+            self.log("Diálogos tratados:", logging.INFO, "info")
+            for linha_resumo in resumo_dialogos:
+                self.log(f"  {linha_resumo}", logging.INFO, "info")
+            self.log(f"  Vigia: {automacao.dialog_watcher.dispensados} fechados em segundo plano, "
+                     f"{automacao.dialog_watcher.abortos} esperas interrompidas", logging.INFO, "info")
+        localizacao = automacao.driver.lookup_stats()
+        if localizacao:
+            self.log("Localizadores: " + ", ".join(f"{nome} {qtd}" for nome, qtd in localizacao.items()),
+                     logging.INFO, "info")
+        self.log(f"Trace salvo em: {automacao.tracer.path}", logging.INFO, "info")
+        if self.journal:
+            self.log(f"Diário de linhas: {self.journal.path}", logging.INFO, "info")
+
+    def intervalo_digest_env(self) -> float:
+        """DOMBOT_DIGEST_MINUTOS em segundos; valor inválido cai no padrão com aviso."""
+        valor = os.getenv("DOMBOT_DIGEST_MINUTOS", "").strip()
+        if not valor:
+            return self.DIGEST_MINUTOS * 60
+        try:
+            minutos = float(valor.replace(",", "."))
+            if minutos < 0:
+                raise ValueError(valor)
+        except ValueError:
+            self.log(f"DOMBOT_DIGEST_MINUTOS inválido ('{valor}'): usando {self.DIGEST_MINUTOS:.0f} minutos",
+                     logging.WARNING, "aviso")
+            minutos = self.DIGEST_MINUTOS
+        return minutos * 60
+
+    def digest_progresso(self, clock: Clock, feitas: int):
+        """Resumo parcial no Discord a cada intervalo_digest (execuções longas)."""
+        if self.outbox is None or not self.intervalo_digest or not feitas:
+            return
+        agora = clock.time()
+        if agora - self._ultimo_digest < self.intervalo_digest:
+            return
+        self._ultimo_digest = agora
+        decorrido = agora - self._inicio_execucao
+        # Taxa pelas linhas que foram ao Domínio; puladas não custam tempo
+        trabalhadas = self.linhas_processadas + self.linhas_com_erro
+        taxa = trabalhadas / decorrido * 3600 if decorrido > 0 else 0.0
+        restantes = self.total_linhas - feitas
+        mensagem = (
+            f"⏳ **Emissão de Taxa GMS em andamento**\n\n"
+            f"📊 **Progresso:** {feitas}/{self.total_linhas} ({feitas / self.total_linhas * 100:.0f}%)\n"
+            f"✅ **Emitidas:** {self.linhas_processadas}  ❌ **Com erro:** {self.linhas_com_erro}  "
+            f"⏭️ **Puladas:** {self.linhas_puladas}\n"
+            f"⚡ **Ritmo:** {taxa:.0f} linhas/h"
+        )
+        if taxa > 0:
+            restante = restantes / taxa * 3600
+            termino = datetime.now() + timedelta(seconds=restante)
+            horas, minutos = divmod(int(restante) // 60, 60)
+            mensagem += f"\n🕒 **Previsão de término:** {termino.strftime('%H:%M')} (em {horas}h{minutos:02d})"
+        if self.erros_detalhados:
+            ultimos = "\n".join(f"{erro['numero']} - {str(erro['empresa'])[:30]}: {str(erro['motivo'])[:40]}"
+                                for erro in self.erros_detalhados[-5:])
+            mensagem += f"\n\n❌ **Últimas falhas:**\n```\n{ultimos}\n```"
+        self.outbox.enviar(mensagem)
+
+    def notificar_resumo(self):
+        """Põe o resumo da emissão na caixa de saída do Discord (envio em segundo plano)"""
+        if self.outbox is None:
+            return
+        mensagem = (
+            f"📋 **Emissão de Taxa GMS Finalizada**\n\n"
+            f"📊 **Quantidade emitida:** {self.linhas_processadas}\n"
+            f"❌ **Com erro:** {self.linhas_com_erro}\n"
+            f"⏭️ **Puladas:** {self.linhas_puladas}\n"
+            f"📂 **Diretório dos PDFs:** `{self.pasta_saida or 'pasta GMS do Domínio'}`\n\n"
+            f"✅ Emissão finalizada com sucesso!\n\n"
+            f"<@&1299044385899548752>"
+        )
+        if self.erros_detalhados:
+            tabela = "```\n"
+            tabela += f"{'Nº':<6} {'Empresa':<35} {'Motivo'}\n"
+            tabela += "-" * 80 + "\n"
+            # A tabela inteira precisa caber numa mensagem do Discord
+            espaco = NotificacaoOutbox.LIMITE_CONTEUDO - len(mensagem) - 80
+            for indice, erro in enumerate(self.erros_detalhados):
+                num = str(erro['numero'])[:5]
+                empresa = str(erro['empresa'])[:34]
+                motivo = str(erro['motivo'])[:38]
+                linha = f"{num:<6} {empresa:<35} {motivo}\n"
+                if len(tabela) + len(linha) > espaco:
+                    tabela += f"... e mais {len(self.erros_detalhados) - indice}\n"
+                    break
+                tabela += linha
+            tabela += "```"
+            mensagem += f"\n\n❌ **Empresas com erro:**\n{tabela}"
+        self.outbox.enviar(mensagem)
+
+
+class StatusArquivo:
+    """Estado da execução headless em JSON, regravado por inteiro a cada mudança
+    (arquivo temporário + os.replace: quem lê nunca vê um JSON pela metade)."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.campos: Dict[str, object] = {}
+
+    def update(self, **campos):
+        self.campos.update(campos)
+        if not self.path:
+            return
+        self.campos['atualizado_em'] = datetime.now().isoformat(timespec='seconds')
+        temporario = f"{self.path}.tmp"
+        try:
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(self.campos, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(temporario, self.path)
+        except OSError:
+            pass
+
+
+# Códigos de saída do modo --headless
+SAIDA_OK = 0
+SAIDA_COM_ERROS = 1
+SAIDA_ENTRADA_INVALIDA = 2
+SAIDA_SEM_CONEXAO = 3
+SAIDA_INTERROMPIDA = 4
+SAIDA_ERRO = 5
+
+
+def main_headless(argv: Optional[List[str]] = None, driver: Optional[UIDriver] = None) -> int:
+    """Execução sem interface (agendador de tarefas, CI): mesmas opções da tela,
+    progresso no stdout e/ou num arquivo de status, código de saída significativo."""
+    parser = argparse.ArgumentParser(prog="DomBot_GMS.py --headless",
+                                     description="Executa a lista de trabalho sem interface gráfica")
+    parser.add_argument("arquivo", help="planilha/lista de trabalho (xlsx, csv, parquet, json, jsonl)")
+    parser.add_argument("--linha-inicial", type=int, default=2,
+                        help="primeira linha da planilha a processar (padrão: 2)")
+    parser.add_argument("--retomar", action="store_true",
+                        help="percorre a planilha inteira pulando as linhas concluídas no diário")
+    parser.add_argument("--pular-invalidas", action="store_true",
+                        help="pula as linhas reprovadas na validação (sem a opção, elas abortam a execução)")
+    parser.add_argument("--forcar-regeracao", action="store_true",
+                        help="sobrescreve PDFs que já existem na pasta de saída")
+    parser.add_argument("--sem-agrupar", action="store_true",
+                        help="mantém a ordem da planilha em vez de agrupar por empresa")
+    parser.add_argument("--sessao-persistente", action="store_true",
+                        help="mantém o Gerenciador de Relatórios aberto entre linhas")
+    parser.add_argument("--pasta-pdf", default=os.getenv("DOMBOT_PASTA_PDF", ""),
+                        help="pasta GMS onde o Domínio grava os PDFs (sem ela, PDFs existentes não são pulados)")
+    parser.add_argument("--status", metavar="ARQUIVO_JSON",
+                        help="grava o progresso neste arquivo JSON a cada linha")
+    parser.add_argument("--sem-notificacao", action="store_true",
+                        help="não envia o resumo ao Discord")
+    parser.add_argument("--webhook", default=None,
+                        help="URL do webhook do Discord (padrão: DISCORD_WEBHOOK_URL; obrigatória com --simulado)")
+    parser.add_argument("--digest-minutos", type=float, default=None,
+                        help="intervalo dos resumos parciais no Discord (padrão: DOMBOT_DIGEST_MINUTOS ou 30; 0 desliga)")
+    parser.add_argument("--simulado", action="store_true",
+                        help="usa o Domínio simulado de DomBot_Sim.py (teste sem Windows)")
+    args = parser.parse_args(argv)
+
+    logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    if args.simulado or driver is not None:
+        # Diário e trace de testes não se misturam com os da produção
+        logs_dir = os.path.join(logs_dir, "simulado")
+        if driver is None:
+            driver = importlib.import_module("DomBot_Sim").SimulatedDominio()
+    os.makedirs(logs_dir, exist_ok=True)
+    configurar_logs_arquivo(logs_dir)
+
+    status = StatusArquivo(args.status)
+    status.update(estado="validando", arquivo=os.path.abspath(args.arquivo),
+                  inicio=datetime.now().isoformat(timespec='seconds'))
+    posicao = {'atual': 0, 'total': 0}
+
+    def log(mensagem, level=logging.INFO, tag=None):
+        progresso = f"[{posicao['atual']}/{posicao['total']}] " if posicao['total'] else ""
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {progresso}{mensagem}", flush=True)
+
+    def sair(codigo: int, estado: str, mensagem: str = "") -> int:
+        if mensagem:
+            log(mensagem, logging.ERROR)
+        status.update(estado=estado, codigo_saida=codigo, mensagem=mensagem)
+        return codigo
+
+    # Mesmas verificações da tela, sem perguntas: o que pediria confirmação vem das opções
+    if not os.path.exists(args.arquivo):
+        return sair(SAIDA_ENTRADA_INVALIDA, "entrada_invalida", f"Arquivo não encontrado: {args.arquivo}")
+    planilhas = WorkbookCache()
+    try:
+        df = planilhas.get(args.arquivo)
+    except Exception as e:
+        return sair(SAIDA_ENTRADA_INVALIDA, "entrada_invalida", f"Erro ao ler arquivo: {str(e)}")
+    colunas_faltando = [col for col in ('Nº', 'Periodo', 'Salvar Como') if col not in df.columns]
+    if colunas_faltando:
+        return sair(SAIDA_ENTRADA_INVALIDA, "entrada_invalida",
+                    f"Colunas obrigatórias não encontradas: {', '.join(colunas_faltando)}")
+    if len(df) == 0 or not 2 <= args.linha_inicial <= len(df) + 1:
+        return sair(SAIDA_ENTRADA_INVALIDA, "entrada_invalida",
+                    f"Linha inicial ({args.linha_inicial}) fora da planilha (linhas 2 a {len(df) + 1})")
+
+    motivos = validar_linhas(df)
+    linhas_invalidas = motivos[motivos != ""].to_dict()
+    invalidas = motivos.iloc[0 if args.retomar else args.linha_inicial - 2:]
+    invalidas = invalidas[invalidas != ""]
+    for indice, motivo in invalidas.items():
+        log(f"Linha {indice + 2}: {motivo}", logging.WARNING)
+    if len(invalidas) and not args.pular_invalidas:
+        return sair(SAIDA_ENTRADA_INVALIDA, "entrada_invalida",
+                    f"{len(invalidas)} linhas inválidas (use --pular-invalidas para seguir sem elas)")
+
+    try:
+        journal = RowJournal.for_workbook(logs_dir, args.arquivo)
+    except Exception as e:
+        journal = None
+        log(f"Diário de execução indisponível: {str(e)}", logging.WARNING)
+
+    # Saída no stdout: logs da automação passo a passo junto com os da execução
+    logger = logging.getLogger('AutomacaoDominio')
+    logger.setLevel(logging.INFO)
+    logger.handlers = []
+    logger.propagate = False
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s', '%H:%M:%S'))
+    logger.addHandler(handler)
+
+    def ao_progresso(atual, total):
+        posicao.update(atual=atual, total=total)
+        status.update(estado="executando", atual=atual, total=total)
+
+    def ao_estatisticas(execucao: ExecucaoLote):
+        status.update(sucesso=execucao.linhas_processadas, erros=execucao.linhas_com_erro,
+                      puladas=execucao.linhas_puladas)
+
+    # Execução simulada só notifica um webhook passado explicitamente
+    outbox = None
+    if not args.sem_notificacao and (args.webhook or driver is None):
+        outbox = NotificacaoOutbox(os.path.join(logs_dir, "outbox"), url=args.webhook, log=log)
+        outbox.iniciar()
+
+    controle = ControleExecucao()
+    execucao = ExecucaoLote(
+        args.arquivo, controle, logger, logs_dir,
+        args.pasta_pdf.strip(),
+        linha_inicial=args.linha_inicial, retomar=args.retomar, journal=journal,
+        linhas_invalidas=linhas_invalidas, forcar_regeracao=args.forcar_regeracao,
+        agrupar_empresas=not args.sem_agrupar, sessao_persistente=args.sessao_persistente,
+        planilhas=planilhas, driver=driver, outbox=outbox,
+        intervalo_digest=None if args.digest_minutos is None else args.digest_minutos * 60,
+        log=log, ao_progresso=ao_progresso,
+        ao_estatisticas=ao_estatisticas, ao_empresa=lambda numero: status.update(empresa=numero))
+
+    # Ctrl+C / SIGTERM: termina a linha atual e sai (o diário permite --retomar)
+    def parar(_signum, _frame):
+        if controle.executando:
+            log("Solicitação de parada recebida. Aguardando conclusão da linha atual...", logging.WARNING)
+        controle.executando = False
+
+    handlers_anteriores = {}
+    if threading.current_thread() is threading.main_thread():
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            handlers_anteriores[sinal] = signal.signal(sinal, parar)
+    try:
+        resultado = execucao.executar()
+    finally:
+        for sinal, anterior in handlers_anteriores.items():
+            signal.signal(sinal, anterior)
+
+    ao_estatisticas(execucao)
+    status.update(erros_detalhados=execucao.erros_detalhados)
+    if resultado == ExecucaoLote.CONCLUIDA:
+        execucao.notificar_resumo()
+    if outbox is not None:
+        # O processo vai sair: dá um tempo ao envio; o que sobrar fica para a próxima execução
+        if not outbox.esvaziar(timeout=30):
+            log(f"📨 {outbox.pendentes} notificações ficaram na caixa de saída ({outbox.pasta})", logging.WARNING)
+        outbox.parar()
+    if resultado == ExecucaoLote.SEM_CONEXAO:
+        return sair(SAIDA_SEM_CONEXAO, resultado)
+    if resultado == ExecucaoLote.INTERROMPIDA:
+        return sair(SAIDA_INTERROMPIDA, resultado)
+    if resultado == ExecucaoLote.ERRO:
+        return sair(SAIDA_ERRO, resultado)
+    return sair(SAIDA_COM_ERROS if execucao.linhas_com_erro else SAIDA_OK, resultado)
+
 
 def main():
     """Função principal"""
+    if "--headless" in sys.argv[1:]:
+        argv = [arg for arg in sys.argv[1:] if arg != "--headless"]
+        sys.exit(main_headless(argv))
     try:
         gui = AutomacaoGUI()
+        if "--medir-inicializacao" in sys.argv:
+            # Imprime o relatório de inicialização e sai (medição em thin clients)
+            def medir():
+                for linha_resumo in STARTUP.summary():
+                    print(linha_resumo)
+                gui.window.destroy()
+            gui.window.after(200, medir)
         gui.executar()
     except Exception as e:
         print(f"Erro crítico na aplicação: {str(e)}")
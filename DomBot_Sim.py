@@ -0,0 +1,607 @@
+"""Domínio Folha simulado e benchmark de throughput do DomBot GMS.
+
+Executa o fluxo real de DominioAutomation contra uma máquina de estados que
+imita o Domínio (F8, ALT+R, Ctrl+D, ESC, Troca de empresas, Gerenciador de
+Relatórios, Taxa GMS, Salvar em PDF e diálogos de erro), com latências
+configuráveis e relógio virtual. Roda em Linux e não depende do Windows.
+
+Uso:
+    python DomBot_Sim.py --linhas 10 100 1000
+    python DomBot_Sim.py --linhas 100 --latencia relatorio=6 --taxa-sem-dados 0.05
+"""
+import argparse
+import heapq
+import json
+import logging
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from DomBot_GMS import (
+    Clock, ControleExecucao, DominioAutomation, SpanTracer, SyntheticEventSource, UIDriver,
+    WindowEventSource, WindowInfo, agendar_por_empresa, expandir_periodos,
+)
+
+
+class VirtualClock(Clock):
+    """Relógio virtual: sleep/wait avançam o tempo instantaneamente, executando
+    os eventos agendados pelo simulador na ordem em que venceriam."""
+
+    # Menor avanço de sleep/wait: restos de timeout como 1e-14 somados a um
+    # tempo grande não mudariam o float, e a espera nunca terminaria
+    MIN_STEP = 1e-6
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        self._queue = []
+        self._seq = 0
+
+    def time(self) -> float:
+        return self.now
+
+    def schedule(self, delay: float, callback: Callable[[], None]):
+        self._seq += 1
+        heapq.heappush(self._queue, (self.now + max(0.0, delay), self._seq, callback))
+
+    def _run_next(self):
+        due, _, callback = heapq.heappop(self._queue)
+        self.now = max(self.now, due)
+        callback()
+
+    def sleep(self, seconds: float):
+        target = self.now + max(self.MIN_STEP, seconds)
+        while self._queue and self._queue[0][0] <= target:
+            self._run_next()
+        self.now = max(self.now, target)
+
+    def wait(self, condition, predicate: Callable[[], bool], timeout: float) -> bool:
+        deadline = self.now + max(self.MIN_STEP, timeout)
+        while not predicate():
+            if not self._queue or self._queue[0][0] > deadline:
+                self.now = max(self.now, deadline)
+                return predicate()
+            self._run_next()
+        return True
+
+
+# Latências (s) do Domínio simulado; ajustáveis via --latencia nome=valor
+LATENCIAS_PADRAO = {
+    "envio": 0.005,          # chamada de envio de cada tecla (síncrona)
+    "tecla": 0.03,           # processamento de cada tecla pela UI
+    "troca_abrir": 0.8,      # F8 -> "Troca de empresas"
+    "troca_fechar": 1.2,     # ENTER -> empresa carregada
+    "menu": 0.1,             # ALT+R -> menu
+    "gerenciador": 0.9,      # ENTER no menu -> "Gerenciador de Relatórios"
+    "relatorio": 4.0,        # Executar -> janela "Taxa GMS"
+    "salvar_dialogo": 1.5,   # Ctrl+D -> "Salvar em PDF"
+    "gravar": 1.0,           # Salvar -> diálogo fecha
+    "fechar": 0.1,           # ESC/OK -> janela fecha
+    "dialogo_texto": 0.05,   # diálogo criado -> textos Static (com texto_atrasado)
+}
+
+MAIN_TITLE = "Domínio Folha - Versão Simulada"
+MAIN_CLASS = "FNWND3190"
+
+
+class SimWindow:
+    """Janela do Domínio simulado."""
+
+    def __init__(self, hwnd: int, title: str, class_name: str, kind: str,
+                 controls: Optional[Dict[str, str]] = None, statics: Optional[List[str]] = None):
+        self.hwnd = hwnd
+        self.title = title
+        self.class_name = class_name
+        self.kind = kind
+        # auto_id -> classe do controle
+        self.controls = controls or {}
+        self.statics = statics or []
+        self.texts: Dict[str, str] = {}
+
+
+class SimulatedDominio(UIDriver):
+    """Máquina de estados que reage às teclas e cliques como o Domínio Folha.
+
+    Erros injetáveis: taxa_sem_dados abre "Atenção - Sem dados para emitir"
+    após Executar; taxa_atencao abre um aviso benigno durante o Ctrl+D;
+    taxa_ctrl_d_ignorado descarta o primeiro Ctrl+D (relatório ainda renderizando);
+    taxa_salvar_travado ignora o clique em Salvar (a janela de salvamento não fecha).
+    texto_atrasado: diálogos de erro aparecem ("create") antes dos textos Static,
+    que chegam depois com o evento "show", como no Windows."""
+
+    ERROR_TITLES = ("Atenção", "Aviso", "Erro")
+    # Relógio virtual não admite threads: vigia de diálogos roda inline
+    concurrent = False
+
+    def __init__(self, latencias: Optional[Dict[str, float]] = None, seed: int = 0,
+                 taxa_avisos: float = 0.2, taxa_sem_dados: float = 0.0,
+                 taxa_atencao: float = 0.0, taxa_ctrl_d_ignorado: float = 0.1,
+                 taxa_salvar_travado: float = 0.0, texto_atrasado: bool = False):
+        self.clock = VirtualClock()
+        self.latencias = dict(LATENCIAS_PADRAO)
+        self.latencias.update(latencias or {})
+        self.random = random.Random(seed)
+        self.taxa_avisos = taxa_avisos
+        self.taxa_sem_dados = taxa_sem_dados
+        self.taxa_atencao = taxa_atencao
+        self.taxa_ctrl_d_ignorado = taxa_ctrl_d_ignorado
+        self.taxa_salvar_travado = taxa_salvar_travado
+        self.texto_atrasado = texto_atrasado
+        self.events = SyntheticEventSource(self.clock)
+
+        self.windows: Dict[int, SimWindow] = {}
+        self.stack: List[int] = []
+        self._next_hwnd = 1000
+        self.connected = False
+        self.busy_until = 0.0
+
+        # Estado do fluxo
+        self.empresa = None
+        self.buffer_empresa = ""
+        self.menu_nivel = 0
+        self.navegacao = 0
+        self.parametros_abertos = False
+        self.campo = 0
+        self.valores: Dict[int, str] = {}
+        self.pdfs_salvos: List[str] = []
+        self.contadores = {"teclas": 0, "trocas": 0, "relatorios": 0, "erros_injetados": 0}
+
+        self.main = self._open(MAIN_TITLE, MAIN_CLASS, "main", emit=False)
+
+    # ------------------------------------------------------------ janelas
+    def _open(self, title: str, class_name: str, kind: str, emit: bool = True, **kwargs) -> SimWindow:
+        self._next_hwnd += 1
+        window = SimWindow(self._next_hwnd, title, class_name, kind, **kwargs)
+        self.windows[window.hwnd] = window
+        self.stack.append(window.hwnd)
+        if emit:
+            self.events.emit("show", window.hwnd, title, class_name)
+        return window
+
+    def _close(self, hwnd: int):
+        window = self.windows.pop(hwnd, None)
+        if window is None:
+            return
+        if hwnd in self.stack:
+            self.stack.remove(hwnd)
+        if window.kind == "gerenciador":
+            self.navegacao = 0
+            self.parametros_abertos = False
+        self.events.emit("destroy", hwnd)
+
+    def _later(self, latencia: str, callback: Callable[[], None]):
+        self.clock.schedule(self.latencias[latencia], callback)
+
+    def _top(self) -> SimWindow:
+        for hwnd in reversed(self.stack):
+            if hwnd != self.main.hwnd:
+                return self.windows[hwnd]
+        return self.main
+
+    def _find_kind(self, kind: str) -> Optional[SimWindow]:
+        for window in self.windows.values():
+            if window.kind == kind:
+                return window
+        return None
+
+    def _open_error(self, title: str, message: str):
+        self.contadores["erros_injetados"] += 1
+        if not self.texto_atrasado:
+            self._open(title, "#32770", "erro", controls={"2": "Button"}, statics=[message])
+            return
+        window = self._open(title, "#32770", "erro", emit=False, controls={"2": "Button"})
+        self.events.emit("create", window.hwnd, title, "#32770")
+
+        def mostrar_texto():
+            if window.hwnd in self.windows:
+                window.statics.append(message)
+                self.events.emit("show", window.hwnd, title, "#32770")
+        self._later("dialogo_texto", mostrar_texto)
+
+    # ------------------------------------------------------------ teclado
+    TOKEN_RE = re.compile(r"([+^%]*)(\{[^}]+\}|.)")
+
+    def _parse(self, keys: str) -> List[str]:
+        tokens = []
+        for modifiers, key in self.TOKEN_RE.findall(keys):
+            if key.startswith("{"):
+                name = key[1:-1].split(" ")
+                count = int(name[1]) if len(name) > 1 and name[1].isdigit() else 1
+                tokens.extend([modifiers + name[0].upper()] * count)
+            elif key == "~":
+                tokens.append(modifiers + "ENTER")
+            else:
+                tokens.append(modifiers + key)
+        return tokens
+
+    def _handle_key(self, token: str):
+        top = self._top()
+        if token == "F8" and top.kind in ("gerenciador", "relatorio"):
+            # F8 é acelerador global da janela principal
+            top = self.main
+        handler = getattr(self, f"_key_{top.kind}", None)
+        if handler is not None:
+            handler(top, token)
+
+    def _key_main(self, window: SimWindow, token: str):
+        if token == "F8":
+            self.contadores["trocas"] += 1
+            self.buffer_empresa = ""
+            self._later("troca_abrir", lambda: self._open("Troca de empresas", "FNWND3190", "troca"))
+        elif token == "%r":
+            self.menu_nivel = 0
+            self._later("menu", lambda: self._open("", "#32768", "menu"))
+
+    def _key_troca(self, window: SimWindow, token: str):
+        if token == "ENTER":
+            codigo = self.buffer_empresa
+
+            def carregar():
+                # "Avisos de Vencimento" já está aberto quando a troca fecha
+                if self.random.random() < self.taxa_avisos:
+                    self._open("Avisos de Vencimento", "FNWND3190", "avisos")
+                self._close(window.hwnd)
+                self.empresa = codigo
+            self._later("troca_fechar", carregar)
+        elif token == "ESC":
+            self._later("fechar", lambda: self._close(window.hwnd))
+        elif len(token) == 1:
+            self.buffer_empresa += token
+
+    def _key_avisos(self, window: SimWindow, token: str):
+        if token in ("ESC", "ENTER"):
+            self._later("fechar", lambda: self._close(window.hwnd))
+
+    def _key_menu(self, window: SimWindow, token: str):
+        if token.lower() == "i":
+            self.menu_nivel += 1
+        elif token == "ENTER" and self.menu_nivel >= 2:
+            self._close(window.hwnd)
+            self._later("gerenciador", lambda: self._open(
+                "Gerenciador de Relatórios", "FNWND3190", "gerenciador", controls={"1007": "Button"}))
+        elif token == "ESC":
+            self._close(window.hwnd)
+
+    def _key_gerenciador(self, window: SimWindow, token: str):
+        if token == "ESC":
+            self._later("fechar", lambda: self._close(window.hwnd))
+        elif token == "F5":
+            self._executar(window)
+        elif token == "c" and self.navegacao == 6:
+            # (Re)seleciona Taxa GMS: formulário de parâmetros volta ao padrão
+            self.parametros_abertos = True
+            self.campo = 0
+            self.valores = {}
+        elif not self.parametros_abertos:
+            if token == "d":
+                self.navegacao += 1
+        elif token == "TAB":
+            self.campo += 1
+        elif len(token) == 1:
+            self.valores[self.campo] = self.valores.get(self.campo, "") + token
+
+    def _key_relatorio(self, window: SimWindow, token: str):
+        if token == "^d":
+            if self.random.random() < self.taxa_ctrl_d_ignorado:
+                return
+            if self.random.random() < self.taxa_atencao:
+                self._later("fechar", lambda: self._open_error("Atenção", "Relatório gerado com avisos"))
+                return
+            self._later("salvar_dialogo", lambda: self._open(
+                "Salvar em PDF", "#32770", "salvar",
+                controls={"1148": "Edit", "1": "Button", "1091": "Static"}, statics=["Salvar em:"]))
+        elif token == "ESC":
+            self._later("fechar", lambda: self._close(window.hwnd))
+
+    def _key_salvar(self, window: SimWindow, token: str):
+        if token == "ESC":
+            self._later("fechar", lambda: self._close(window.hwnd))
+
+    def _key_erro(self, window: SimWindow, token: str):
+        if token in ("ENTER", "ESC"):
+            self._later("fechar", lambda: self._close(window.hwnd))
+
+    def _executar(self, gerenciador: SimWindow):
+        if not self.parametros_abertos or not self.valores.get(4):
+            self._later("fechar", lambda: self._open_error("Erro", "Parâmetros inválidos"))
+            return
+        self.contadores["relatorios"] += 1
+        if self.random.random() < self.taxa_sem_dados:
+            self._later("relatorio", lambda: self._open_error("Atenção", "Sem dados para emitir"))
+            return
+        periodo = self.valores.get(4, "")
+        self._later("relatorio", lambda: self._open(
+            f"Relatório - Taxa GMS - {self.empresa} - {periodo}", "FNWND3190", "relatorio"))
+
+    # ------------------------------------------------------------ UIDriver
+    def find_main_window(self, log: Callable[[str], None]) -> Optional[int]:
+        log(f"🪟 Janela simulada: '{self.main.title}'")
+        return self.main.hwnd
+
+    def connect(self, handle: int):
+        if handle != self.main.hwnd:
+            raise RuntimeError("janela desconhecida")
+        self.connected = True
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    @property
+    def main_handle(self) -> Optional[int]:
+        return self.main.hwnd
+
+    def create_event_source(self) -> Optional[WindowEventSource]:
+        return self.events
+
+    def enumerate_windows(self) -> List[WindowInfo]:
+        return [WindowInfo(w.hwnd, w.title, w.class_name) for w in self.windows.values()]
+
+    def has_child(self, hwnd: int, class_name: str, title: str) -> bool:
+        window = self.windows.get(hwnd)
+        return bool(window and class_name == "Static" and title in window.statics)
+
+    def restore_main(self) -> bool:
+        return False
+
+    def bring_to_front(self):
+        pass
+
+    def is_foreground(self) -> bool:
+        return True
+
+    def focus_main(self):
+        pass
+
+    def send_keys(self, keys: str):
+        tokens = self._parse(keys)
+        # O envio é síncrono, como o SendInput do pywinauto: o tempo passa antes da UI reagir
+        self.clock.sleep(self.latencias["envio"] * len(tokens))
+        for token in tokens:
+            self.contadores["teclas"] += 1
+            self._handle_key(token)
+        self.busy_until = max(self.busy_until, self.clock.time()) + self.latencias["tecla"]
+
+    def focused_class(self) -> str:
+        top = self._top()
+        return "Edit" if top.kind == "salvar" else top.class_name
+
+    def input_idle(self) -> bool:
+        return self.clock.time() >= self.busy_until
+
+    def find_window(self, title: str, class_name: str) -> Optional[int]:
+        for window in self.windows.values():
+            if window.title == title and window.class_name == class_name:
+                return window.hwnd
+        return None
+
+    def find_window_with_control(self, class_name: str, auto_id: str, control_class: str) -> Optional[int]:
+        for window in self.windows.values():
+            if window.class_name == class_name and window.controls.get(auto_id) == control_class:
+                return window.hwnd
+        return None
+
+    def window_visible(self, hwnd: int) -> bool:
+        return hwnd in self.windows
+
+    def focus_window(self, hwnd: int):
+        if hwnd in self.stack:
+            self.stack.remove(hwnd)
+            self.stack.append(hwnd)
+
+    def click_button(self, hwnd: int, auto_id: Optional[str] = None, title: Optional[str] = None) -> bool:
+        window = self.windows.get(hwnd)
+        if window is None:
+            return False
+        if title == "OK" and window.kind == "erro":
+            self._later("fechar", lambda: self._close(hwnd))
+            return True
+        if auto_id == "1007" and window.kind == "gerenciador":
+            self._executar(window)
+            return True
+        if auto_id == "1" and window.kind == "salvar":
+            nome = window.texts.get("1148", "")
+            if self.random.random() < self.taxa_salvar_travado:
+                self.contadores["erros_injetados"] += 1
+                return True
+
+            def gravar():
+                self.pdfs_salvos.append(nome)
+                self._close(hwnd)
+            self._later("gravar", gravar)
+            return True
+        return False
+
+    def set_edit_text(self, hwnd: int, auto_id: str, text: str):
+        window = self.windows.get(hwnd)
+        if window is None or window.controls.get(auto_id) != "Edit":
+            raise RuntimeError(f"campo {auto_id} não encontrado")
+        window.texts[auto_id] = text
+
+    def dialog_text(self, hwnd: int) -> str:
+        window = self.windows[hwnd]
+        return " ".join([window.title] + window.statics)
+
+    def window_title(self, hwnd: int) -> str:
+        return self.windows[hwnd].title
+
+    def owns_window(self, hwnd: int) -> bool:
+        return hwnd in self.windows
+
+    def post_dismiss(self, hwnd: int) -> bool:
+        window = self.windows.get(hwnd)
+        if window is None or window.kind != "erro":
+            return False
+        self._later("fechar", lambda: self._close(hwnd))
+        return True
+
+
+def gerar_planilha_sintetica(total: int, seed: int = 0, periodos: int = 1, lote: int = 1) -> pd.DataFrame:
+    """Planilha no formato de entrada (Nº, EMPRESAS, Periodo, Salvar Como).
+
+    Com periodos > 1 cada empresa aparece em vários períodos, espalhados pela
+    planilha como costuma acontecer na prática. Com lote > 1 cada linha pede
+    um intervalo de meses (01/2025-MM/2025) e total conta relatórios."""
+    rng = random.Random(seed)
+    if lote > 1:
+        linhas = []
+        for numero in rng.sample(range(1, total * 3 + 1), max(1, -(-total // lote))):
+            nome = f"EMPRESA SIMULADA {numero}"
+            linhas.append({
+                "Nº": numero,
+                "EMPRESAS": nome,
+                "Periodo": f"01/2025-{lote:02d}/2025",
+                "Salvar Como": f"{numero}-{nome}",
+            })
+        return pd.DataFrame(linhas)
+    empresas = rng.sample(range(1, total * 3 + 1), max(1, -(-total // periodos)))
+    linhas = []
+    for i in range(total):
+        numero = empresas[i % len(empresas)]
+        mes = i // len(empresas) % 12 + 1
+        nome = f"EMPRESA SIMULADA {numero}"
+        linhas.append({
+            "Nº": numero,
+            "EMPRESAS": nome,
+            "Periodo": f"{mes:02d}/2025",
+            "Salvar Como": f"{numero}-{nome}-{mes:02d}2025",
+        })
+    return pd.DataFrame(linhas)
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * (len(ordenados) - 1)))))
+    return ordenados[indice]
+
+
+def executar_benchmark(total_linhas: int, seed: int = 0, latencias: Optional[Dict[str, float]] = None,
+                       periodos: int = 1, lote: int = 1, agrupar: bool = True, sessao_persistente: bool = False,
+                       **taxas) -> dict:
+    """Processa uma planilha sintética no Domínio simulado e retorna as métricas."""
+    sim = SimulatedDominio(latencias, seed=seed, **taxas)
+    logger = logging.getLogger("DomBotSim")
+    logger.handlers = [logging.NullHandler()]
+    logger.propagate = False
+    tracer = SpanTracer(keep_durations=True)
+    automacao = DominioAutomation(logger, ControleExecucao(), tracer=tracer, driver=sim,
+                                  persistent_session=sessao_persistente)
+    if not automacao.connect_to_dominio():
+        raise RuntimeError("falha ao conectar ao Domínio simulado")
+
+    df = expandir_periodos(gerar_planilha_sintetica(total_linhas, seed, periodos, lote))
+    if agrupar:
+        df = agendar_por_empresa(df)
+    numeros = df['Nº'].tolist()
+    inicio_virtual = sim.clock.time()
+    inicio_cpu = time.process_time()
+    inicio_real = time.perf_counter()
+    sucesso = 0
+    for posicao, (indice, row) in enumerate(df.iterrows()):
+        mesma_empresa = posicao + 1 < len(numeros) and numeros[posicao + 1] == numeros[posicao]
+        if automacao.processar_linha(row, indice, indice + 2, manter_sessao=mesma_empresa):
+            sucesso += 1
+    automacao.encerrar_sessao()
+    duracao = sim.clock.time() - inicio_virtual
+    automacao.close()
+
+    passos = {}
+    for step, duracoes in (tracer.durations or {}).items():
+        qtd, total, sleep, wait, falhas = tracer.totais[step]
+        passos[step] = {
+            "quantidade": int(qtd),
+            "media": total / qtd if qtd else 0.0,
+            "p95": percentil(duracoes, 95),
+            "sleep": sleep,
+            "espera": wait,
+            "acao": max(0.0, total - sleep - wait),
+            "falhas": int(falhas),
+        }
+    return {
+        "linhas": len(df),
+        "sucesso": sucesso,
+        "pdfs_salvos": len(sim.pdfs_salvos),
+        "tempo_simulado": duracao,
+        "linhas_hora": len(df) / duracao * 3600 if duracao else 0.0,
+        "cpu": time.process_time() - inicio_cpu,
+        "tempo_real": time.perf_counter() - inicio_real,
+        "teclas": sim.contadores["teclas"],
+        "trocas_empresa": sim.contadores["trocas"],
+        "erros_injetados": sim.contadores["erros_injetados"],
+        "passos": passos,
+        "estados": automacao.estados.summary(),
+    }
+
+
+def imprimir_relatorio(resultados: List[dict]):
+    print(f"{'Linhas':>7} {'Sucesso':>8} {'Trocas':>7} {'Simulado':>10} {'Linhas/h':>9} {'CPU (s)':>8} {'Real (s)':>9}")
+    for r in resultados:
+        print(f"{r['linhas']:>7} {r['sucesso']:>8} {r['trocas_empresa']:>7} {r['tempo_simulado']:>9.0f}s "
+              f"{r['linhas_hora']:>9.1f} {r['cpu']:>8.2f} {r['tempo_real']:>9.2f}")
+    for r in resultados:
+        print(f"\nLatência por passo ({r['linhas']} linhas):")
+        print(f"  {'Passo':<18} {'Qtd':>6} {'Média':>8} {'p95':>8} {'Sleep':>8} {'Espera':>8} {'Ação':>8} {'Falhas':>7}")
+        for step, m in sorted(r["passos"].items(), key=lambda item: item[1]["media"] * item[1]["quantidade"], reverse=True):
+            print(f"  {step:<18} {m['quantidade']:>6} {m['media']:>7.2f}s {m['p95']:>7.2f}s "
+                  f"{m['sleep']:>7.0f}s {m['espera']:>7.0f}s {m['acao']:>7.0f}s {m['falhas']:>7}")
+        print("  Transições de estado:")
+        for linha in r["estados"]:
+            print(f"    {linha}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do DomBot GMS contra um Domínio simulado")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10, 100, 1000],
+                        help="tamanhos das planilhas sintéticas (padrão: 10 100 1000)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--periodos", type=int, default=1,
+                        help="períodos por empresa na planilha sintética (padrão: 1)")
+    parser.add_argument("--lote", type=int, default=1,
+                        help="meses por linha da planilha (intervalo 01/2025-MM/2025)")
+    parser.add_argument("--sem-agrupar", action="store_true",
+                        help="mantém a ordem da planilha em vez de agrupar por empresa")
+    parser.add_argument("--sessao-persistente", action="store_true",
+                        help="mantém o Gerenciador de Relatórios aberto entre linhas")
+    parser.add_argument("--latencia", action="append", default=[], metavar="NOME=SEGUNDOS",
+                        help=f"sobrescreve latências: {', '.join(LATENCIAS_PADRAO)}")
+    parser.add_argument("--taxa-avisos", type=float, default=0.2)
+    parser.add_argument("--taxa-sem-dados", type=float, default=0.0)
+    parser.add_argument("--taxa-atencao", type=float, default=0.0)
+    parser.add_argument("--taxa-ctrl-d-ignorado", type=float, default=0.1)
+    parser.add_argument("--taxa-salvar-travado", type=float, default=0.0)
+    parser.add_argument("--texto-atrasado", action="store_true",
+                        help="diálogos de erro aparecem antes dos seus textos (evento create sem Static)")
+    parser.add_argument("--json", help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    latencias = {}
+    for item in args.latencia:
+        nome, _, valor = item.partition("=")
+        if nome not in LATENCIAS_PADRAO:
+            parser.error(f"latência desconhecida: {nome}")
+        latencias[nome] = float(valor)
+
+    resultados = [
+        executar_benchmark(
+            total, seed=args.semente, latencias=latencias,
+            periodos=args.periodos, lote=args.lote, agrupar=not args.sem_agrupar,
+            sessao_persistente=args.sessao_persistente,
+            taxa_avisos=args.taxa_avisos, taxa_sem_dados=args.taxa_sem_dados,
+            taxa_atencao=args.taxa_atencao, taxa_ctrl_d_ignorado=args.taxa_ctrl_d_ignorado,
+            taxa_salvar_travado=args.taxa_salvar_travado, texto_atrasado=args.texto_atrasado,
+        )
+        for total in args.linhas
+    ]
+    imprimir_relatorio(resultados)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())